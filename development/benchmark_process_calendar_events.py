@@ -0,0 +1,12 @@
+import timeit
+
+from event_tracking.components.calendar import process_calendar_events, process_calendar_events_rowwise
+from event_tracking.components.synthetic import generate_calendar_events
+
+if __name__ == "__main__":
+    for n_events in [1_000, 10_000, 100_000]:
+        events = generate_calendar_events(n_events)
+
+        for func in [process_calendar_events_rowwise, process_calendar_events]:
+            seconds = min(timeit.repeat(lambda: func(events), number=1, repeat=3))
+            print(f'{func.__name__:<35} {n_events:>8} eventi: {seconds:.3f}s ({n_events / seconds:,.0f} eventi/s)')
@@ -1,19 +1,54 @@
 import os
-import datetime
+import glob
 
-
-from event_tracking.components.calendar import fetch_calendar_events, process_calendar_events, \
-    categorize_calendar_events
-from event_tracking.config import RAW_DATA_DIR
+from event_tracking.components.arrow_events import export_events_ipc
+from event_tracking.components.event_store import open_event_store, load_store_sync_tokens, import_parquet_snapshot
+from event_tracking.components.parquet_dataset import export_store_partitions
+from event_tracking.components.streaming import ingest_calendar_events
+from event_tracking.components.refresh import refresh_lock, publish_snapshot, run_incremental_update
+from event_tracking.components.instrumentation import pipeline_run
+from event_tracking.config import RAW_DATA_DIR, PATH_PIPELINE_METRICS_PROM
 
 if __name__ == "__main__":
     days=150
-    today_date = datetime.datetime.now().strftime("%Y%m%d")
+    incremental = True
+    # Esporta anche il dataset parquet partizionato per year / month / calendar_name
+    export_dataset = False
+    # Esporta anche il file Arrow IPC letto dalla dashboard con DATA_SOURCE = "ipc"
+    export_ipc = False
+    # Scarica, classifica e scrive gli eventi a blocchi con memoria limitata (per lo scaricamento di anni di storico)
+    streaming = False
+
+    # Lo stesso lock del servizio di refresh (development/refresh_daemon.py): un solo processo scrive alla volta
+    with refresh_lock() as acquired:
+        if not acquired:
+            raise SystemExit("Aggiornamento già in corso in un altro processo")
+
+        # Durata e righe di ogni fase, pagine API, chiamate LLM e cache in data/interim/pipeline_metrics.jsonl
+        # (profilazione di una fase con EVENT_TRACKING_PROFILE=categorize, vedi config.py)
+        with pipeline_run("create_calendar_db", prometheus_path=PATH_PIPELINE_METRICS_PROM):
+            conn = open_event_store()
+
+            # Primo avvio: importa l'ultimo snapshot parquet creato dalla versione precedente dello script
+            snapshots = sorted(glob.glob(os.path.join(RAW_DATA_DIR, 'my_calendar_db_*.parquet')))
+            if snapshots and conn.execute("SELECT COUNT(*) FROM events").fetchone()[0] == 0:
+                print(f"Importazione dello snapshot {snapshots[-1]}")
+                import_parquet_snapshot(conn, snapshots[-1])
+
+            if streaming:
+                # Esportazione completa del dataset: le partizioni toccate non vengono tracciate blocco per blocco
+                ingest_calendar_events(conn, load_store_sync_tokens(conn) if incremental else {}, days)
+                if export_dataset:
+                    export_store_partitions(conn)
+                if export_ipc:
+                    export_events_ipc(conn)
+            else:
+                # Scarica solo le modifiche dall'ultima esecuzione (o tutto il periodo per i calendari senza token):
+                # la stessa pipeline del servizio di refresh
+                run_incremental_update(conn, days, incremental=incremental, export_dataset=export_dataset,
+                                       export_ipc=export_ipc)
 
-    events = fetch_calendar_events(days)
-    events_df = process_calendar_events(events)
-    events_df_categorized = categorize_calendar_events(events_df)
+            conn.close()
 
-    file_name = f'my_calendar_db_{today_date}.parquet'
-    file_path = os.path.join(RAW_DATA_DIR, file_name)
-    events_df_categorized.to_parquet(file_path)
\ No newline at end of file
+            # La dashboard legge lo snapshot, sostituito in modo atomico
+            publish_snapshot()
@@ -7,9 +7,16 @@ import calendar
 from datetime import datetime, timedelta
 
 from event_tracking.components.dashboard import *
-from event_tracking.config import RAW_DATA_DIR
-
-file_path = os.path.join(RAW_DATA_DIR, 'my_calendar_db_20250508.parquet')
+from event_tracking.components.event_store import open_event_store, query_events, query_events_page, list_years, \
+    list_calendars, store_data_version, store_identity, published_store_path, EVENT_COLUMNS, EVENTS_PAGE_SIZE
+from event_tracking.components.queries import contribution_matrix, event_metrics
+from event_tracking.components.parquet_dataset import open_events_dataset_view, dataset_version
+from event_tracking.components.arrow_events import open_events_ipc_view, ipc_version
+from event_tracking.components.event_analyzer import build_time_context, stream_time_analysis, \
+    analyze_event_categories_from_store
+from event_tracking.components.llm_backends import create_llm_backend
+from event_tracking.components.instrumentation import pipeline_run, stage
+from event_tracking.config import LOCAL_TIMEZONE, DASHBOARD_METRICS, PATH_PIPELINE_METRICS
 
 # Configurazione pagina
 st.set_page_config(
@@ -19,90 +26,205 @@ st.set_page_config(
 )
 
 
-# Funzione per caricare i dati
-@st.cache_data
-def load_data():
+# Sorgente dati: "duckdb" (database eventi), "parquet" (dataset partizionato esportato da create_calendar_db.py)
+# oppure "ipc" (file Arrow esportato da create_calendar_db.py o dal servizio di refresh)
+DATA_SOURCE = "duckdb"
+
+
+def open_data_connection():
+    # Con il dataset parquet DuckDB legge solo le partizioni che soddisfano i filtri della sidebar
+    if DATA_SOURCE == "parquet":
+        return open_events_dataset_view()
+    # File Arrow mappato in memoria: DuckDB legge i buffer senza copiarli
+    if DATA_SOURCE == "ipc":
+        return open_events_ipc_view()
+    # Snapshot pubblicato dal servizio di refresh: la lettura non attende mai l'aggiornamento in corso
+    return open_event_store(published_store_path(), read_only=True)
+
+
+# Cache a più livelli (dati filtrati, aggregazioni, figure), con chiave versione dei dati + filtri.
+# Quando create_calendar_db.py scrive nuovi dati la versione cambia e le voci vecchie non vengono più usate;
+# max_entries limita ogni livello eliminando le voci usate meno di recente.
+DATA_VERSION_TTL_SECONDS = 5
+CACHE_MAX_ENTRIES_DATA = 4
+CACHE_MAX_ENTRIES_AGGREGATES = 64
+CACHE_MAX_ENTRIES_FIGURES = 32
+
+# Limiti di ciò che viene inviato al browser: periodi (colonne) della heatmap, righe per pagina dell'esplorazione
+HEATMAP_MAX_PERIODS = 60
+EXPLORER_DEFAULT_COLUMNS = ['start_time', 'summary', 'calendar_name', 'duration_minutes', 'event_category']
+
+
+@st.cache_data(ttl=DATA_VERSION_TTL_SECONDS)
+def current_data_version():
+    # Letta al massimo ogni DATA_VERSION_TTL_SECONDS secondi, non a ogni interazione con i widget
+    try:
+        if DATA_SOURCE == "parquet":
+            return dataset_version()
+        if DATA_SOURCE == "ipc":
+            return ipc_version()
+        # Un database ricreato riparte dalla versione 0: la chiave include la sua identità
+        with open_event_store(published_store_path(), read_only=True) as conn:
+            return store_identity(conn), store_data_version(conn)
+    except Exception:
+        return None
+
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES_AGGREGATES)
+def load_filter_options(data_version):
     try:
-        df = pd.read_parquet(file_path)
-
-        df['year_only'] = df['start_time'].dt.year.astype(str)
-        df['year_month'] = df['start_time'].dt.strftime('%Y-%m')
-        df['year_month_week'] = df['start_time'].dt.strftime('%Y-%m-') + df['week_number'].astype(str).str.zfill(2)
-
-        # Conversione delle colonne di data/ora se necessario
-        if pd.api.types.is_object_dtype(df['start_time']):
-            df['start_time'] = pd.to_datetime(df['start_time'])
-        if pd.api.types.is_object_dtype(df['end_time']):
-            df['end_time'] = pd.to_datetime(df['end_time'])
-        return df
+        with open_data_connection() as conn:
+            return list_years(conn), list_calendars(conn)
     except Exception as e:
-        st.error(f"Errore nel caricamento del file parquet: {e}")
+        st.error(f"Errore nell'apertura del database eventi: {e}")
         return None
 
-header_display()
 
-# Caricamento dati
-df = load_data()
+# Funzioni per caricare i dati: vengono letti solo gli eventi selezionati
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES_DATA)
+def load_data(data_version, year=None, calendars=None, columns=None):
+    with open_data_connection() as conn:
+        df = query_events(conn, year=year, calendars=calendars, columns=columns)
+
+    # Gli orari sono salvati in UTC: si riportano all'ora locale per le colonne della multiscale review
+    for column in ['start_time', 'end_time']:
+        if column in df:
+            df[column] = df[column].dt.tz_convert(LOCAL_TIMEZONE)
+    return df
+
+
+# Aggregazioni lette dalle tabelle di rollup (o calcolate nel database): alla dashboard arrivano solo tabelle piccole
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES_AGGREGATES)
+def load_contribution_matrix(data_version, time_scale, year, calendars, value):
+    # Su più anni i periodi consecutivi vengono raggruppati: la heatmap ha al più HEATMAP_MAX_PERIODS colonne
+    with open_data_connection() as conn:
+        return contribution_matrix(conn, time_scale, year=year, calendars=calendars, value=value,
+                                   max_periods=HEATMAP_MAX_PERIODS)
+
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES_AGGREGATES)
+def load_metrics(data_version, year, calendars):
+    with open_data_connection() as conn:
+        return event_metrics(conn, year=year, calendars=calendars)
+
+
+# Una pagina dell'esplorazione dei dati: filtri, ordinamento e colonne sono applicati nel database
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES_AGGREGATES)
+def load_events_page(data_version, year, calendars, columns, sort_by, descending, page):
+    with open_data_connection() as conn:
+        df, total = query_events_page(conn, year=year, calendars=calendars, columns=columns, sort_by=sort_by,
+                                      descending=descending, offset=page * EVENTS_PAGE_SIZE)
+
+    for column in ['start_time', 'end_time']:
+        if column in df:
+            df[column] = df[column].dt.tz_convert(LOCAL_TIMEZONE)
+    return df, total
+
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES_FIGURES)
+def load_contribution_figure(data_version, time_scale, year, calendars, value):
+    return get_contribution_figure(load_contribution_matrix(data_version, time_scale, year, calendars, value))
+
+
+# Contesto della chat: statistiche compatte degli eventi filtrati, calcolate una volta per versione e filtri.
+# Il tempo per categoria viene dalle tabelle di rollup, non dal DataFrame degli eventi
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES_AGGREGATES)
+def load_time_context(data_version, year, calendars):
+    with open_data_connection() as conn:
+        categories = analyze_event_categories_from_store(conn, year=year, calendars=calendars, timed_only=True)
+    return build_time_context(load_data(data_version, year, calendars), categories=categories)
 
-if df is not None:
-    dict_sidebar = sidebar_display(df)
-    selected_year = dict_sidebar["selected_year"]
-    selected_calendars = dict_sidebar["selected_calendars"]
-    selected_time_scale = dict_sidebar["selected_time_scale"]
 
-    # Applicazione filtri
-    filtered_df = df[(df['year'] == selected_year) &
-                     (df['calendar_name'].isin(selected_calendars))]
+@st.cache_resource
+def load_analysis_llm():
+    # Backend configurato con EVENT_TRACKING_LLM_BACKEND: "openai", "local" (Ollama / llama.cpp) o "fake"
+    return create_llm_backend()
 
-    # Layout principale a due colonne
-    col1, col2 = st.columns([2, 1])
 
-    with col1:
-        st.subheader("Distribuzione attività lavorative")
+# Tempo di ogni esecuzione dello script e delle sue sezioni (con EVENT_TRACKING_DASHBOARD_METRICS=1)
+with pipeline_run("dashboard", metrics_path=PATH_PIPELINE_METRICS if DASHBOARD_METRICS else None):
+    header_display()
 
-        fig_contribution = get_contribution_plot(df, view=selected_time_scale)
+    # Caricamento dati
+    data_version = current_data_version()
+    filter_options = load_filter_options(data_version)
 
-        st.plotly_chart(fig_contribution, use_container_width=True)
+    if filter_options is not None and filter_options[0]:
+        years, calendars = filter_options
+        dict_sidebar = sidebar_filters(years, calendars)
+        selected_year = dict_sidebar["selected_year"]
+        selected_calendars = dict_sidebar["selected_calendars"]
+        selected_time_scale = dict_sidebar["selected_time_scale"]
+        selected_value = dict_sidebar["selected_value"]
 
+        # Layout principale a due colonne
+        col1, col2 = st.columns([2, 1])
 
-    with col2:
-        st.subheader("Statistiche")
+        with col1:
+            st.subheader("Distribuzione attività lavorative")
 
-        # Calcolo metriche
-        total_events = len(filtered_df)
-        avg_duration = filtered_df['duration_minutes'].mean()
-        all_day_events = filtered_df['all_day'].sum()
+            with stage("dashboard_figure"):
+                fig_contribution = load_contribution_figure(data_version, selected_time_scale, selected_year,
+                                                            tuple(selected_calendars), selected_value)
 
-        # Display delle metriche
-        st.metric("Totale eventi", f"{total_events}")
-        st.metric("Durata media", f"{avg_duration:.1f} min")
-        st.metric("Eventi giornalieri", f"{all_day_events}")
+                st.plotly_chart(fig_contribution, use_container_width=True)
 
 
-    # Sezione per analisi futura con LLM
-    st.subheader("🤖 Chat Analisi Tempo")
-    st.info("""
-    Questa sezione permetterà di discutere con un LLM su come hai speso il tuo tempo rispetto agli obiettivi.
-    Funzionalità in fase di sviluppo.
-    """)
+        with col2:
+            st.subheader("Statistiche")
+
+            # Calcolo metriche
+            with stage("dashboard_metrics"):
+                metrics = load_metrics(data_version, selected_year, tuple(selected_calendars))
+            total_events = metrics["total_events"]
+            avg_duration = metrics["avg_duration"]
+            all_day_events = metrics["all_day_events"]
+
+            # Display delle metriche
+            st.metric("Totale eventi", f"{total_events}")
+            st.metric("Durata media", f"{avg_duration:.1f} min")
+            st.metric("Eventi giornalieri", f"{all_day_events}")
 
-    # Placeholder per implementazione futura
-    user_input = st.text_area("Fai una domanda sulla tua gestione del tempo:", "")
-    if st.button("Analizza"):
-        st.write("Funzionalità non ancora implementata. Sarà disponibile nelle prossime versioni.")
 
-        # Placeholder per future risposte
-        with st.chat_message("assistant"):
-            st.write("Qui apparirà l'analisi del tuo tempo basata sui dati del calendario.")
+        # Chat con l'LLM: riceve solo il contesto compatto (dimensione limitata), non gli eventi
+        st.subheader("🤖 Chat Analisi Tempo")
+
+        user_input = st.text_area("Fai una domanda sulla tua gestione del tempo:", "")
+        if st.button("Analizza") and user_input.strip():
+            context = load_time_context(data_version, selected_year, tuple(selected_calendars))
+            with st.expander("Dati inviati all'LLM"):
+                st.text(context)
+
+            with st.chat_message("assistant"), stage("dashboard_chat"):
+                try:
+                    st.write_stream(stream_time_analysis(load_analysis_llm(), context, user_input))
+                except Exception as e:
+                    st.error(f"Errore nell'analisi: {e}")
 
-    # Esplorazione dati
-    with st.expander("Esplora i dati grezzi"):
-        st.dataframe(filtered_df)
+        # Esplorazione dati: al browser arriva solo la pagina selezionata, con le colonne scelte
+        with st.expander("Esplora i dati grezzi"):
+            explorer_columns = st.multiselect("Colonne", list(EVENT_COLUMNS), default=EXPLORER_DEFAULT_COLUMNS)
+            sort_col, order_col, page_col = st.columns(3)
+            sort_by = sort_col.selectbox("Ordina per", list(EVENT_COLUMNS),
+                                         index=list(EVENT_COLUMNS).index('start_time'))
+            descending = order_col.radio("Ordine", ["Crescente", "Decrescente"], horizontal=True) == "Decrescente"
+            page = page_col.number_input("Pagina", min_value=1, value=1, step=1) - 1
+
+            with stage("dashboard_data"):
+                page_df, total_rows = load_events_page(data_version, selected_year, tuple(selected_calendars),
+                                                       tuple(explorer_columns), sort_by, descending, page)
 
-else:
-    st.error(
-        "Impossibile caricare i dati. Assicurati che il file 'my_calendar_db.parquet' sia disponibile nella directory corrente.")
+            n_pages = max(1, -(-total_rows // EVENTS_PAGE_SIZE))
+            first_row = min(page * EVENTS_PAGE_SIZE + 1, total_rows)
+            st.caption(f"Righe {first_row}–{page * EVENTS_PAGE_SIZE + len(page_df)} di {total_rows} "
+                       f"(pagina {page + 1} di {n_pages})")
+            st.dataframe(page_df, hide_index=True)
 
-    # Demo mode
-    if st.button("Carica dati di esempio"):
-        st.info("Questa funzionalità sarà implementata in una versione futura.")
\ No newline at end of file
+    else:
+        st.error(
+            "Impossibile caricare i dati. "
+            "Assicurati di aver creato il database eventi con development/create_calendar_db.py.")
+
+        # Demo mode
+        if st.button("Carica dati di esempio"):
+            st.info("Questa funzionalità sarà implementata in una versione futura.")
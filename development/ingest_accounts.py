@@ -0,0 +1,22 @@
+from event_tracking.components.accounts import load_accounts, ingest_accounts
+from event_tracking.components.refresh import refresh_lock
+from event_tracking.components.instrumentation import pipeline_run
+from event_tracking.config import PATH_ACCOUNTS, PATH_PIPELINE_METRICS_PROM
+
+if __name__ == "__main__":
+    days = 150
+    # Richieste contemporanee verso l'API Calendar e l'LLM, in totale per tutti gli account
+    max_workers = 8
+
+    # Account del team in accounts.json (token in tokens/<nome>.json, al primo avvio si apre il browser)
+    accounts = load_accounts(PATH_ACCOUNTS)
+
+    with refresh_lock() as acquired:
+        if not acquired:
+            raise SystemExit("Aggiornamento già in corso in un altro processo")
+
+        with pipeline_run("ingest_accounts", prometheus_path=PATH_PIPELINE_METRICS_PROM):
+            results = ingest_accounts(accounts, days, max_workers)
+
+    for name, result in results.items():
+        print(f"{name}: {result['changed_events']} eventi modificati, {result['cancelled_events']} cancellati")
@@ -0,0 +1,30 @@
+from event_tracking.components.event_store import open_event_store
+from event_tracking.components.reclassification import reclassify_store_events
+from event_tracking.components.parquet_dataset import export_store_partitions
+from event_tracking.components.refresh import refresh_lock, publish_snapshot
+from event_tracking.components.instrumentation import pipeline_run
+from event_tracking.config import PATH_PIPELINE_METRICS_PROM
+
+if __name__ == "__main__":
+    # Riesporta il dataset parquet partizionato con le nuove categorie
+    export_dataset = False
+    # Elimina dalla cache le classificazioni della tassonomia precedente (se nessun altro account la usa)
+    drop_previous_taxonomy = True
+
+    # Dopo aver modificato `categories` (ed eventualmente `category_renames`) in calendar.py:
+    # solo i titoli con categorie eliminate o con 'other' vengono inviati all'LLM
+    with refresh_lock() as acquired:
+        if not acquired:
+            raise SystemExit("Aggiornamento già in corso in un altro processo")
+
+        with pipeline_run("reclassify_events", prometheus_path=PATH_PIPELINE_METRICS_PROM):
+            with open_event_store() as conn:
+                result = reclassify_store_events(conn, drop_previous_taxonomy=drop_previous_taxonomy)
+                if export_dataset:
+                    export_store_partitions(conn)
+                conn.execute("CHECKPOINT")
+
+            publish_snapshot()
+
+    print(f"{result['renamed_summaries']} titoli rinominati, {result['reclassified_summaries']} riclassificati, "
+          f"{result['updated_events']} eventi aggiornati")
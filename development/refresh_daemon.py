@@ -0,0 +1,13 @@
+from event_tracking.components.refresh import run_refresh_daemon
+
+if __name__ == "__main__":
+    days = 150
+    interval_minutes = 30
+    # Esporta anche il dataset parquet partizionato (solo le partizioni toccate da ogni aggiornamento)
+    export_dataset = False
+    # Riscrive anche il file Arrow IPC letto dalla dashboard con DATA_SOURCE = "ipc"
+    export_ipc = False
+
+    # Aggiornamenti incrementali periodici: la dashboard legge lo snapshot pubblicato a fine aggiornamento
+    run_refresh_daemon(interval_minutes, time_period_days=days, export_dataset=export_dataset,
+                       export_ipc=export_ipc)
@@ -0,0 +1,132 @@
+import json
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+from event_tracking.components.calendar import FETCH_MAX_WORKERS, WORK_CALENDARS, categories, \
+    fetch_calendar_events_incremental, process_calendar_events, work_event_summaries, classify_event_summaries, \
+    apply_event_categories
+from event_tracking.components.event_store import open_event_store, upsert_events, load_store_sync_tokens
+from event_tracking.components.instrumentation import stage, in_current_context
+from event_tracking.config import PATH_ACCOUNTS, ACCOUNT_TOKENS_DIR, ACCOUNT_STORES_DIR, PATH_CLASSIFICATION_CACHE
+
+# Ingestione degli eventi di più account (ad esempio i membri di un team). Ogni account ha il proprio token,
+# i propri calendari, la propria tassonomia e il proprio database eventi; il pool di thread che scarica
+# e classifica e la cache delle classificazioni sono condivisi, così un titolo presente in più account
+# viene classificato una volta sola.
+
+
+def account_settings(name, token_path=None, calendars=None, work_calendars=WORK_CALENDARS, taxonomy=None,
+                     store_path=None):
+    """
+    Impostazioni di un account, con i valori di default per quelle non indicate
+
+    :param name: nome dell'account (usato per i percorsi di default del token e del database)
+    :param calendars: nomi dei calendari da scaricare (None: tutti)
+    :param work_calendars: calendari i cui eventi vengono classificati
+    :param taxonomy: categorie della classificazione (di default `categories`)
+    """
+    return {
+        "name": name,
+        "token_path": Path(token_path) if token_path else ACCOUNT_TOKENS_DIR / f"{name}.json",
+        "calendars": list(calendars) if calendars is not None else None,
+        "work_calendars": tuple(work_calendars),
+        "taxonomy": list(taxonomy) if taxonomy is not None else list(categories),
+        "store_path": Path(store_path) if store_path else ACCOUNT_STORES_DIR / f"{name}.duckdb",
+    }
+
+
+def load_accounts(path=PATH_ACCOUNTS):
+    """
+    Legge la configurazione degli account: un file JSON con una lista di oggetti con i parametri
+    di account_settings, ad esempio
+    [{"name": "mario", "calendars": ["Lavoro"], "work_calendars": ["Lavoro"]}, {"name": "anna"}]
+    """
+    with open(path) as f:
+        accounts = [account_settings(**account) for account in json.load(f)]
+
+    names = [account["name"] for account in accounts]
+    if len(set(names)) < len(names):
+        raise ValueError(f"Nomi degli account duplicati in {path}")
+    return accounts
+
+
+def _fetch_accounts(accounts, sync_tokens, time_period_days, executor, services):
+    def fetch_account(account):
+        return fetch_calendar_events_incremental(
+            sync_tokens[account["name"]], time_period_days, service=services.get(account["name"]),
+            token_path=account["token_path"], calendars_to_include=account["calendars"], executor=executor,
+        )
+
+    # Un thread per account si limita a elencare i calendari e ad attendere: i calendari sono scaricati
+    # tutti nel pool condiviso `executor`, che limita le richieste contemporanee verso l'API
+    with ThreadPoolExecutor(max_workers=max(1, len(accounts))) as coordinators:
+        return dict(zip([account["name"] for account in accounts],
+                        coordinators.map(in_current_context(fetch_account), accounts)))
+
+
+def ingest_accounts(accounts, time_period_days=150, max_workers=FETCH_MAX_WORKERS, llm=None,
+                    cache_path=PATH_CLASSIFICATION_CACHE, services=None, **classify_kwargs):
+    """
+    Aggiornamento incrementale di tutti gli account (vedi load_accounts):
+    1. scarica le modifiche dall'ultimo sync token di ogni account, in parallelo in un unico pool
+       di `max_workers` thread;
+    2. classifica insieme i titoli di tutti gli account con la stessa tassonomia: ogni titolo distinto
+       è letto dalla cache condivisa `cache_path` o inviato all'LLM una sola volta, nello stesso pool;
+    3. salva gli eventi di ogni account nel suo database.
+
+    :param services: dizionario nome account -> servizio Calendar già costruito (ad es. per i test)
+    :return: dizionario nome account -> numero di eventi modificati e cancellati
+    """
+    services = services or {}
+
+    sync_tokens = {}
+    for account in accounts:
+        account["store_path"].parent.mkdir(parents=True, exist_ok=True)
+        with open_event_store(account["store_path"]) as conn:
+            sync_tokens[account["name"]] = load_store_sync_tokens(conn)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        syncs = _fetch_accounts(accounts, sync_tokens, time_period_days, executor, services)
+
+        active_events = {
+            name: [event for event in sync["events"] if event.get('status') != 'cancelled']
+            for name, sync in syncs.items()
+        }
+        events = {name: process_calendar_events(events) if events else None for name, events in active_events.items()}
+
+        # Titoli dei calendari di lavoro di tutti gli account, raggruppati per tassonomia
+        summaries_by_taxonomy = {}
+        for account in accounts:
+            if events[account["name"]] is not None:
+                summaries = summaries_by_taxonomy.setdefault(tuple(account["taxonomy"]), {})
+                summaries.update(dict.fromkeys(work_event_summaries(events[account["name"]],
+                                                                    account["work_calendars"])))
+
+        summary_categories = {}
+        with stage("categorize"):
+            for taxonomy, summaries in summaries_by_taxonomy.items():
+                summary_categories[taxonomy] = classify_event_summaries(
+                    list(summaries), list(taxonomy), llm=llm, cache_path=cache_path, executor=executor,
+                    **classify_kwargs
+                )
+
+    results = {}
+    for account in accounts:
+        sync = syncs[account["name"]]
+        events_df = events[account["name"]]
+        if events_df is not None:
+            events_df = apply_event_categories(events_df, summary_categories[tuple(account["taxonomy"])],
+                                               account["work_calendars"])
+        cancelled_keys = [(event['calendar_name'], event['id'])
+                          for event in sync["events"] if event.get('status') == 'cancelled']
+
+        with open_event_store(account["store_path"]) as conn:
+            upsert_events(conn, events_df, deleted_keys=cancelled_keys,
+                          replace_calendars=sync["full_sync_calendars"], replace_time_min=sync["full_sync_time_min"],
+                          sync_tokens=sync["sync_tokens"], taxonomy=account["taxonomy"])
+            conn.execute("CHECKPOINT")
+
+        results[account["name"]] = {"changed_events": len(active_events[account["name"]]),
+                                    "cancelled_events": len(cancelled_keys)}
+
+    return results
@@ -0,0 +1,99 @@
+import os
+
+import duckdb
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.ipc as ipc
+
+from event_tracking.components.calendar import WORK_CALENDARS, categories, classify_event_summaries
+from event_tracking.components.event_parsing import calendar_events_table, null_where
+from event_tracking.components.event_schema import EVENT_ARROW_SCHEMA
+from event_tracking.components.instrumentation import instrumented_stage, add_rows
+from event_tracking.components.similarity import SIMILARITY_THRESHOLD
+from event_tracking.config import PATH_CLASSIFICATION_CACHE, PATH_EVENTS_IPC
+
+
+@instrumented_stage("process")
+def process_calendar_events_arrow(events):
+    """
+    Elabora gli eventi del calendario (ad es. una pagina dell'API) direttamente in una tabella Arrow
+    con lo schema STORE_ARROW_SCHEMA (vedi event_parsing.calendar_events_table).
+    process_calendar_events restituisce la stessa tabella convertita in pandas.
+    """
+    add_rows(len(events))
+    return calendar_events_table(events)
+
+
+@instrumented_stage("categorize")
+def categorize_calendar_events_arrow(table, batch_size=None, llm=None,
+                                     cache_path=PATH_CLASSIFICATION_CACHE, similarity_threshold=SIMILARITY_THRESHOLD,
+                                     taxonomy=None, work_calendars=WORK_CALENDARS, **classify_kwargs):
+    """
+    Come categorize_calendar_events, su una tabella di process_calendar_events_arrow:
+    i titoli distinti dei calendari di lavoro vengono classificati con classify_event_summaries
+    e le categorie riportate sulla colonna event_category senza convertire la tabella in pandas.
+    """
+    add_rows(table.num_rows)
+    taxonomy = categories if taxonomy is None else taxonomy
+
+    is_work = pc.is_in(table['calendar_name'], value_set=pa.array(list(work_calendars), pa.string()))
+    counts = pc.value_counts(pc.drop_null(pc.filter(table['summary'], is_work)))
+    # Titoli dal più frequente, come work_event_summaries
+    summaries = pc.take(counts.field('values'), pc.array_sort_indices(counts.field('counts'), order='descending'))
+
+    summary_categories = classify_event_summaries(
+        summaries.to_pylist(), taxonomy, batch_size=batch_size, llm=llm, cache_path=cache_path,
+        similarity_threshold=similarity_threshold, **classify_kwargs
+    )
+
+    classified = pa.array(list(summary_categories), pa.string())
+    event_category = pc.take(pa.array(list(summary_categories.values()), pa.string()),
+                             pc.index_in(table['summary'], value_set=classified))
+    return table.set_column(table.schema.get_field_index('event_category'), 'event_category',
+                            null_where(event_category, pc.invert(is_work)))
+
+
+@instrumented_stage("export")
+def export_events_ipc(conn, path=PATH_EVENTS_IPC):
+    """
+    Scrive gli eventi del database in un file Arrow IPC non compresso, letto dalla dashboard con
+    open_events_ipc_view: prima in un file temporaneo nella stessa cartella, poi con una rinomina atomica.
+    I record batch di DuckDB sono scritti uno alla volta, senza materializzare tutti gli eventi.
+
+    :return: numero di eventi scritti
+    """
+    result = conn.execute(f"SELECT {', '.join(EVENT_ARROW_SCHEMA.names)} FROM events ORDER BY start_time").arrow()
+    # Le versioni recenti di DuckDB restituiscono un RecordBatchReader, le precedenti una tabella
+    reader = (result.to_reader() if isinstance(result, pa.Table) else result).cast(EVENT_ARROW_SCHEMA)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    n_events = 0
+    with pa.OSFile(str(tmp_path), 'wb') as sink, ipc.new_file(sink, EVENT_ARROW_SCHEMA) as writer:
+        for batch in reader:
+            writer.write_batch(batch)
+            n_events += batch.num_rows
+    os.replace(tmp_path, path)
+    add_rows(n_events)
+    return n_events
+
+
+def open_events_ipc_view(path=PATH_EVENTS_IPC):
+    """
+    Connessione DuckDB in memoria con una vista `events` sul file di export_events_ipc, mappato in memoria:
+    i buffer Arrow vengono letti da DuckDB senza copie e senza conversioni in pandas, e le funzioni
+    di event_store e queries funzionano senza modifiche (aggregando sugli eventi, senza tabelle di rollup)
+    """
+    table = ipc.open_file(pa.memory_map(str(path), 'r')).read_all()
+    conn = duckdb.connect()
+    conn.execute("SET TimeZone = 'UTC'")
+    conn.register('events', table)
+    return conn
+
+
+def ipc_version(path=PATH_EVENTS_IPC):
+    """
+    Impronta del file Arrow (dimensione e data di modifica): cambia a ogni esportazione
+    """
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
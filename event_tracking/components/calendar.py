@@ -1,29 +1,44 @@
 import os
 import json
+import time
+import random
 import datetime
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import pandas as pd
 
 from dotenv import load_dotenv, find_dotenv
 
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
-
-from event_tracking.config import PATH_TOKEN, PATH_CREDENTIALS
-
-from dotenv import load_dotenv, find_dotenv
+from googleapiclient.errors import HttpError
 
-from langchain_openai import ChatOpenAI
-from langchain.chains import LLMChain
-import openai
+from event_tracking.config import PATH_TOKEN, PATH_CREDENTIALS, PATH_CLASSIFICATION_CACHE, LLM_BACKEND
+from event_tracking.components.classification_cache import open_classification_cache, get_cached_categories, \
+    get_all_cached_categories, store_categories, evict_classification_cache, normalize_summary
+from event_tracking.components.classification import CLASSIFICATION_PROMPT_VERSION, classify_batch_openai_api, \
+    classify_summaries
+from event_tracking.components.llm_backends import LLM_BACKENDS, create_llm_backend, print_llm_metrics
+from event_tracking.components.event_parsing import calendar_events_table
+from event_tracking.components.event_schema import apply_event_schema
+from event_tracking.components.instrumentation import instrumented_stage, increment, add_rows, in_current_context
+from event_tracking.components.similarity import SIMILARITY_THRESHOLD, cached_similarity_index, predict_from_index
 
-_ = load_dotenv(find_dotenv())  # read local .env file
-openai.api_key = os.environ['OPENAI_API_KEY']
+# Le librerie Google (discovery, oauth) e langchain_openai sono importate solo dentro le funzioni
+# che le usano: importare il modulo non legge .env né richiede OPENAI_API_KEY
 
 # Configurazione dell'autenticazione Google
 SCOPES = ['https://www.googleapis.com/auth/calendar.readonly']
 
+# Parametri per lo scaricamento parallelo degli eventi
+FETCH_MAX_WORKERS = 8
+FETCH_MAX_RETRIES = 5
+FETCH_BACKOFF_SECONDS = 1.0
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Calendari i cui eventi vengono classificati (per più account vedi accounts.py)
+WORK_CALENDARS = ("Pozz Work",)
+
 WORK_CATEGORIES = ["avm-property-value", "avm-meetings", "avm-genertel-poc",
                    "finbox-meetings", "finbox-gara-mcc", "finbox-privati",
                    "finbox-deploy-affordability",
@@ -32,12 +47,20 @@ WORK_CATEGORIES = ["avm-property-value", "avm-meetings", "avm-genertel-poc",
                    "other"]
 
 
-def get_google_calendar_credentials():
+def get_google_calendar_credentials(token_path=PATH_TOKEN, credentials_path=PATH_CREDENTIALS):
+    """
+    Credenziali Google dell'account il cui token è salvato in `token_path`
+    (al primo accesso viene aperto il browser con il client OAuth di `credentials_path`)
+    """
+    from google.oauth2.credentials import Credentials
+    from google_auth_oauthlib.flow import InstalledAppFlow
+    from google.auth.transport.requests import Request
+
     creds = None
 
     # Il file token.json memorizza i token di accesso e aggiornamento dell'utente
-    if os.path.exists(PATH_TOKEN):
-        creds = Credentials.from_authorized_user_info(json.load(open(PATH_TOKEN)))
+    if os.path.exists(token_path):
+        creds = Credentials.from_authorized_user_info(json.load(open(token_path)))
 
     # Se non ci sono credenziali valide, l'utente deve accedere
     if not creds or not creds.valid:
@@ -46,12 +69,13 @@ def get_google_calendar_credentials():
         else:
             flow = (
                 InstalledAppFlow
-                .from_client_secrets_file(PATH_CREDENTIALS, SCOPES)
+                .from_client_secrets_file(credentials_path, SCOPES)
             )
             creds = flow.run_local_server(port=63576)
 
         # Salva le credenziali per la prossima esecuzione
-        with open(PATH_TOKEN, 'w') as token:
+        os.makedirs(os.path.dirname(token_path), exist_ok=True)
+        with open(token_path, 'w') as token:
             token.write(creds.to_json())
 
     return creds
@@ -76,15 +100,16 @@ def get_calendars_to_include():
     return [cal.strip() for cal in calendars_str.split(',')]
 
 
-def fetch_all_calendars(service):
+def fetch_all_calendars(service, calendars_to_include=get_calendars_to_include):
     """
     Recupera tutti i calendari disponibili per l'utente
-    e filtra in base alla variabile d'ambiente
+    e filtra in base alla variabile d'ambiente (o ai nomi in `calendars_to_include`, None: tutti)
     """
     calendar_list = service.calendarList().list().execute()
     all_calendars = calendar_list.get('items', [])
 
-    calendars_to_include = get_calendars_to_include()
+    if callable(calendars_to_include):
+        calendars_to_include = calendars_to_include()
 
     if calendars_to_include is None:
         # Includi tutti i calendari
@@ -103,12 +128,104 @@ def fetch_all_calendars(service):
     return filtered_calendars
 
 
-def fetch_calendar_events(time_period_days=30):
+def get_calendar_service(token_path=PATH_TOKEN):
+    from googleapiclient.discovery import build
+
+    creds = get_google_calendar_credentials(token_path)
+    return build('calendar', 'v3', credentials=creds)
+
+
+def _thread_local_service_factory(service=None, token_path=PATH_TOKEN):
     """
-    Recupera gli eventi da tutti i calendari dell'utente per un determinato periodo di tempo
+    Restituisce una funzione che fornisce il `service` da usare nel thread corrente.
+    I client di googleapiclient non sono thread-safe, quindi ogni worker costruisce il proprio
+    a partire dalle stesse credenziali. Un `service` passato esplicitamente viene condiviso.
     """
-    creds = get_google_calendar_credentials()
-    service = build('calendar', 'v3', credentials=creds)
+    if service is not None:
+        return lambda: service
+
+    from googleapiclient.discovery import build
+
+    creds = get_google_calendar_credentials(token_path)
+    local = threading.local()
+
+    def get_service():
+        if not hasattr(local, 'service'):
+            local.service = build('calendar', 'v3', credentials=creds)
+        return local.service
+
+    return get_service
+
+
+def _execute_with_retry(request, max_retries=FETCH_MAX_RETRIES, backoff_seconds=FETCH_BACKOFF_SECONDS):
+    """
+    Esegue una richiesta API ritentando con backoff esponenziale (più jitter) su 429 e 5xx
+    """
+    for attempt in range(max_retries + 1):
+        increment("api_requests")
+        try:
+            return request.execute()
+        except HttpError as e:
+            if e.resp.status not in RETRY_STATUS_CODES or attempt == max_retries:
+                raise
+            increment("api_retries")
+            delay = backoff_seconds * 2 ** attempt * (1 + random.random())
+            print(f'  - Errore HTTP {e.resp.status}, nuovo tentativo tra {delay:.1f}s')
+            time.sleep(delay)
+
+
+def _iter_events_pages(service, **kwargs):
+    """
+    Scarica una alla volta le pagine di events().list, restituendo (eventi della pagina, nextSyncToken).
+    Il nextSyncToken è presente solo nell'ultima pagina (None nelle altre).
+    """
+    page_token = None
+
+    while True:
+        result = _execute_with_retry(service.events().list(pageToken=page_token, **kwargs))
+        increment("api_pages")
+        page_token = result.get('nextPageToken')
+        yield result.get('items', []), None if page_token else result.get('nextSyncToken')
+
+        if not page_token:
+            return
+
+
+def _list_events_pages(service, **kwargs):
+    """
+    Scarica tutte le pagine di events().list e restituisce (eventi, nextSyncToken).
+    """
+    events = []
+    next_sync_token = None
+
+    for items, next_sync_token in _iter_events_pages(service, **kwargs):
+        events.extend(items)
+
+    return events, next_sync_token
+
+
+def _map_calendars(fetch_calendar, calendars, max_workers, executor=None):
+    """
+    Applica `fetch_calendar` a tutti i calendari in parallelo, mantenendo l'ordine dei calendari.
+    Con `executor` usa quel pool (condiviso ad esempio tra più account) invece di crearne uno.
+    """
+    fetch_calendar = in_current_context(fetch_calendar)
+    if executor is not None:
+        return list(executor.map(fetch_calendar, calendars))
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(calendars) or 1))) as executor:
+        return list(executor.map(fetch_calendar, calendars))
+
+
+@instrumented_stage("fetch")
+def fetch_calendar_events(time_period_days=30, service=None, max_workers=FETCH_MAX_WORKERS, token_path=PATH_TOKEN,
+                          calendars_to_include=get_calendars_to_include, executor=None):
+    """
+    Recupera gli eventi da tutti i calendari dell'utente per un determinato periodo di tempo.
+    I calendari vengono scaricati in parallelo (`max_workers` thread, o nel pool `executor`),
+    seguendo tutte le pagine.
+    """
+    get_service = _thread_local_service_factory(service, token_path)
 
     # Calcola l'intervallo di date
     now = datetime.datetime.utcnow()
@@ -121,42 +238,184 @@ def fetch_calendar_events(time_period_days=30):
     print(f'Recupero eventi dal {start_date.strftime("%Y-%m-%d")} a oggi')
 
     # Recupera tutti i calendari
-    calendars = fetch_all_calendars(service)
+    calendars = fetch_all_calendars(get_service(), calendars_to_include)
     print(f'Trovati {len(calendars)} calendari')
 
-    all_events = []
-
-    # Per ogni calendario, recupera gli eventi
-    for calendar in calendars:
+    def fetch_calendar(calendar):
         calendar_id = calendar['id']
         calendar_name = calendar['summary']
-        print(f'Recupero eventi dal calendario: {calendar_name}')
 
-        events_result = service.events().list(
+        events, _ = _list_events_pages(
+            get_service(),
             calendarId=calendar_id,
             timeMin=start_date_str,
             timeMax=now_str,
             singleEvents=True,
             orderBy='startTime'
-        ).execute()
-
-        events = events_result.get('items', [])
+        )
 
         # Aggiungi il nome del calendario a ogni evento
         for event in events:
             event['calendar_name'] = calendar_name
             event['calendar_id'] = calendar_id
 
+        print(f'  - Trovati {len(events)} eventi nel calendario: {calendar_name}')
+        return events
+
+    all_events = []
+    for events in _map_calendars(fetch_calendar, calendars, max_workers, executor):
         all_events.extend(events)
-        print(f'  - Trovati {len(events)} eventi in questo calendario')
 
     print(f'Totale eventi recuperati: {len(all_events)}')
+    add_rows(len(all_events))
     return all_events
 
 
+@instrumented_stage("fetch")
+def fetch_calendar_events_incremental(sync_tokens, time_period_days=30, service=None,
+                                      max_workers=FETCH_MAX_WORKERS, token_path=PATH_TOKEN,
+                                      calendars_to_include=get_calendars_to_include, executor=None):
+    """
+    Recupera solo gli eventi modificati dall'ultima esecuzione usando il nextSyncToken di ogni calendario.
+    I calendari senza token, o con token scaduto (HTTP 410), vengono risincronizzati
+    completamente sugli ultimi `time_period_days` giorni.
+
+    :param sync_tokens: dizionario calendar_id -> nextSyncToken dell'ultima sincronizzazione
+    :param token_path: token dell'account (vedi get_google_calendar_credentials)
+    :param executor: pool in cui scaricare i calendari, al posto di uno nuovo con `max_workers` thread
+    :return: dizionario con gli eventi modificati (le cancellazioni hanno status 'cancelled'),
+             i nuovi sync token, i calendari risincronizzati da zero e l'inizio della finestra
+             risincronizzata (timeMin, in UTC)
+    """
+    get_service = _thread_local_service_factory(service, token_path)
+
+    start_date = datetime.datetime.utcnow() - datetime.timedelta(days=time_period_days)
+    start_date_str = start_date.isoformat() + 'Z'
+
+    calendars = fetch_all_calendars(get_service(), calendars_to_include)
+
+    def sync_calendar(calendar):
+        calendar_id = calendar['id']
+        calendar_name = calendar['summary']
+        sync_token = sync_tokens.get(calendar_id)
+
+        if sync_token:
+            try:
+                events, next_sync_token = _list_events_pages(
+                    get_service(), calendarId=calendar_id, singleEvents=True, syncToken=sync_token
+                )
+                print(f'Calendario {calendar_name}: {len(events)} eventi modificati')
+                return calendar, events, next_sync_token, False
+            except HttpError as e:
+                if e.resp.status != 410:
+                    raise
+                print(f'Calendario {calendar_name}: sync token scaduto, sincronizzazione completa')
+
+        # timeMin è ammesso solo nella sincronizzazione iniziale, non insieme al syncToken
+        events, next_sync_token = _list_events_pages(
+            get_service(), calendarId=calendar_id, singleEvents=True, timeMin=start_date_str
+        )
+        print(f'Calendario {calendar_name}: sincronizzazione completa, {len(events)} eventi')
+        return calendar, events, next_sync_token, True
+
+    all_events = []
+    new_sync_tokens = {}
+    full_sync_calendars = []
+
+    for calendar, events, next_sync_token, full_sync in _map_calendars(sync_calendar, calendars, max_workers,
+                                                                         executor):
+        for event in events:
+            event['calendar_name'] = calendar['summary']
+            event['calendar_id'] = calendar['id']
+
+        all_events.extend(events)
+        new_sync_tokens[calendar['id']] = next_sync_token
+        if full_sync:
+            full_sync_calendars.append(calendar['summary'])
+
+    add_rows(len(all_events))
+    return {
+        "events": all_events,
+        "sync_tokens": new_sync_tokens,
+        "full_sync_calendars": full_sync_calendars,
+        "full_sync_time_min": start_date_str
+    }
+
+
+def iter_calendar_event_pages(sync_tokens=None, time_period_days=30, service=None, token_path=PATH_TOKEN,
+                              calendars_to_include=get_calendars_to_include):
+    """
+    Versione in streaming di fetch_calendar_events_incremental: i calendari vengono scaricati
+    uno alla volta e ogni pagina è restituita appena scaricata, così in memoria c'è una sola pagina.
+    Con `sync_tokens` vuoto (o None) tutti i calendari vengono sincronizzati da zero.
+
+    :return: generatore di dizionari con il calendario, gli eventi della pagina, se è una
+             sincronizzazione completa (e l'inizio della finestra risincronizzata, time_min),
+             se è la prima pagina del calendario e il nextSyncToken (solo nell'ultima pagina)
+    """
+    sync_tokens = sync_tokens or {}
+    get_service = _thread_local_service_factory(service, token_path)
+
+    start_date = datetime.datetime.utcnow() - datetime.timedelta(days=time_period_days)
+    start_date_str = start_date.isoformat() + 'Z'
+
+    for calendar in fetch_all_calendars(get_service(), calendars_to_include):
+        sync_token = sync_tokens.get(calendar['id'])
+        pages = None
+
+        if sync_token:
+            pages = _iter_events_pages(get_service(), calendarId=calendar['id'], singleEvents=True,
+                                       syncToken=sync_token)
+            try:
+                # Il token scaduto (HTTP 410) viene segnalato già alla prima pagina
+                first_page = next(pages)
+            except HttpError as e:
+                if e.resp.status != 410:
+                    raise
+                print(f'Calendario {calendar["summary"]}: sync token scaduto, sincronizzazione completa')
+                pages = None
+
+        full_sync = pages is None
+        if full_sync:
+            pages = _iter_events_pages(get_service(), calendarId=calendar['id'], singleEvents=True,
+                                       timeMin=start_date_str)
+            first_page = next(pages)
+
+        for page_number, (events, next_sync_token) in enumerate(itertools.chain([first_page], pages)):
+            for event in events:
+                event['calendar_name'] = calendar['summary']
+                event['calendar_id'] = calendar['id']
+
+            yield {
+                "calendar": calendar,
+                "events": events,
+                "full_sync": full_sync,
+                "time_min": start_date_str,
+                "first_page": page_number == 0,
+                "next_sync_token": next_sync_token,
+            }
+
+
+@instrumented_stage("process")
 def process_calendar_events(events):
     """
-    Elabora gli eventi del calendario e li trasforma in un DataFrame
+    Elabora gli eventi del calendario e li trasforma in un DataFrame con lo schema compatto di event_schema:
+    la stessa tabella Arrow di process_calendar_events_arrow (event_parsing.calendar_events_table),
+    convertita in pandas, senza la colonna event_category (aggiunta da categorize_calendar_events).
+    Orari in UTC; le colonne recurring_event_id e utc_offset_minutes servono a upsert_events
+    per comprimere le serie ricorrenti.
+    I valori coincidono con `process_calendar_events_rowwise` allineato con to_store_frame.
+    """
+    add_rows(len(events))
+    events_df = apply_event_schema(calendar_events_table(events).to_pandas()).drop(columns='event_category')
+    events_df['utc_offset_minutes'] = events_df['utc_offset_minutes'].astype('Int16')
+    return events_df
+
+
+def process_calendar_events_rowwise(events):
+    """
+    Elabora gli eventi del calendario e li trasforma in un DataFrame, un evento alla volta.
+    Implementazione di riferimento per `process_calendar_events`.
     """
     processed_events = []
 
@@ -217,7 +476,9 @@ def process_calendar_events(events):
             'day': start_time.day,
             'month': start_time.strftime('%B'),
             'year': start_time.year,
-            'hour_of_day': start_time.hour if not all_day else None
+            'hour_of_day': start_time.hour if not all_day else None,
+            # Serie a cui appartiene l'occorrenza di un evento ricorrente (None per gli eventi singoli)
+            'recurring_event_id': event.get('recurringEventId')
         }
 
         processed_events.append(event_data)
@@ -225,69 +486,142 @@ def process_calendar_events(events):
     return pd.DataFrame(processed_events)
 
 
-def categorize_calendar_events(events_df, batch_size=10):
+def classification_model(llm=None):
+    """
+    Nome del modello con cui sono salvate in cache le classificazioni fatte da `llm`
+    (senza `llm`: il modello del backend LLM_BACKEND)
+    """
+    return LLM_BACKENDS[LLM_BACKEND]["model"] if llm is None else getattr(llm, "model_name", type(llm).__name__)
+
+
+def classify_event_summaries(summaries, taxonomy, batch_size=None, llm=None, cache_path=PATH_CLASSIFICATION_CACHE,
+                             similarity_threshold=SIMILARITY_THRESHOLD, **classify_kwargs):
+    """
+    Classifica i titoli nelle categorie di `taxonomy`.
+    I titoli già classificati (stessa tassonomia, modello e versione del prompt) vengono letti
+    dalla cache su disco in `cache_path`. Ai nuovi titoli molto simili (similarità coseno
+    >= `similarity_threshold`) a uno già classificato viene assegnata localmente la stessa categoria;
+    solo i restanti vengono inviati all'LLM, in batch paralleli
+    (vedi `classify_summaries`, a cui sono passati `classify_kwargs` oltre ai parametri del backend).
+    Senza `llm` viene creato il backend LLM_BACKEND (vedi create_llm_backend).
+    Con `cache_path=None` la cache è disattivata. La cache è condivisa tra tassonomie (ad esempio di account
+    diversi): oltre CACHE_MAX_ENTRIES si eliminano solo le classificazioni usate meno di recente.
+
+    :return: dizionario titolo -> categoria (i titoli non classificati non sono presenti)
+    """
+    model = classification_model(llm)
+
+    cache = open_classification_cache(cache_path) if cache_path is not None else None
+    try:
+        known = get_cached_categories(cache, summaries, taxonomy, model, CLASSIFICATION_PROMPT_VERSION) \
+            if cache is not None else {}
+
+        # Un solo titolo per chiave normalizzata tra quelli non ancora classificati
+        to_classify = list({
+            normalize_summary(summary): summary for summary in summaries if summary not in known
+        }.values())
+        print(f"Classificazione: {len(summaries) - len(to_classify)} titoli in cache, "
+              f"{len(to_classify)} da classificare")
+        increment("classification_titles", len(summaries))
+        increment("classification_cache_hits", len(summaries) - len(to_classify))
+
+        if to_classify and similarity_threshold is not None:
+            labelled = get_all_cached_categories(cache, taxonomy, model, CLASSIFICATION_PROMPT_VERSION) \
+                if cache is not None else {}
+            labelled.update(known)
+
+            if labelled:
+                # L'indice resta in memoria tra le chiamate finché i titoli classificati non cambiano
+                index_key = (str(cache_path), tuple(taxonomy), model, CLASSIFICATION_PROMPT_VERSION)
+                index = cached_similarity_index(index_key, labelled)
+                local = predict_from_index(index, to_classify, similarity_threshold)
+                known.update({summary: category for summary, (category, _) in local.items()})
+                to_classify = [summary for summary in to_classify if summary not in local]
+                print(f"  - {len(local)} titoli classificati per similarità, {len(to_classify)} inviati all'LLM")
+                increment("classification_similarity_hits", len(local))
+
+        if to_classify:
+            if llm is None:
+                llm = create_llm_backend()
+
+            classify_kwargs = {**getattr(llm, "classify_kwargs", {}), **classify_kwargs}
+            if batch_size is not None:
+                classify_kwargs["max_batch_size"] = batch_size
+
+            increment("classification_llm_titles", len(to_classify))
+            new_categories = classify_summaries(llm, to_classify, taxonomy, **classify_kwargs)
+            print_llm_metrics(llm)
+            if len(new_categories) < len(to_classify):
+                print(f"Attenzione: {len(to_classify) - len(new_categories)} titoli non classificati")
+
+            if cache is not None:
+                store_categories(cache, new_categories, taxonomy, model, CLASSIFICATION_PROMPT_VERSION)
+                evict_classification_cache(cache)
+
+            known.update(new_categories)
+    finally:
+        if cache is not None:
+            cache.close()
+
+    by_key = {normalize_summary(summary): category for summary, category in known.items()}
+    return {summary: by_key[normalize_summary(summary)] for summary in summaries
+            if normalize_summary(summary) in by_key}
+
+
+def work_event_summaries(events_df, work_calendars=WORK_CALENDARS):
+    """
+    Titoli degli eventi dei calendari di lavoro, dal più frequente
+    """
+    work = events_df.loc[events_df["calendar_name"].isin(list(work_calendars)), "summary"]
+    # Come stringhe: su una colonna categorica value_counts riporterebbe anche i titoli degli altri calendari
+    return work.astype("object").value_counts(sort=True).index.tolist()
+
+
+def apply_event_categories(events_df, summary_categories, work_calendars=WORK_CALENDARS):
+    """
+    Aggiunge la colonna event_category (e il numero di occorrenze del titolo, count) agli eventi
+    dei calendari di lavoro, a partire dal dizionario titolo -> categoria
+    """
     events_df_work = (
         events_df
-        .loc[(events_df["calendar_name"] == "Pozz Work"), :]
-        # .head()
-        .groupby(["summary"])
+        .loc[events_df["calendar_name"].isin(list(work_calendars)), :]
+        .groupby(["calendar_name", "summary"], observed=True)
         .size()
         .to_frame("count")
         .sort_values("count", ascending=False)
-        .fillna(0)
         .reset_index()
     )
+    events_df_work["event_category"] = [summary_categories.get(summary) for summary in events_df_work["summary"]]
 
-    # batch_size = 70  # puoi aumentare finché non superi i limiti di token
-    llm = ChatOpenAI(model="gpt-3.5-turbo", temperature=0)
+    return events_df.merge(events_df_work, on=["calendar_name", "summary"], how="left")
 
-    results = []
-    for i in range(0, len(events_df_work), batch_size):
-        batch = events_df_work.iloc[i:i + batch_size]
-        batch_categories = classify_batch_openai_api(llm, batch["summary"].tolist(), categories)
-        results.extend(batch_categories)
 
-    # Verifica che lunghezze corrispondano
-    if len(results) != len(events_df_work):
-        raise ValueError(f"Mismatch: {len(results)} results vs {len(events_df)} rows")
-
-    events_df_work["event_category"] = results
-    events_df_work["calendar_name"] = "Pozz Work"
+@instrumented_stage("categorize")
+def categorize_calendar_events(events_df, batch_size=None, llm=None,
+                               cache_path=PATH_CLASSIFICATION_CACHE, similarity_threshold=SIMILARITY_THRESHOLD,
+                               taxonomy=None, work_calendars=WORK_CALENDARS, **classify_kwargs):
+    """
+    Classifica i titoli degli eventi dei calendari di lavoro (`work_calendars`) nelle categorie
+    di `taxonomy` (di default `categories`), con la cache e l'LLM di classify_event_summaries.
+    I titoli che non è stato possibile classificare restano senza categoria e verranno ritentati
+    all'esecuzione successiva.
+    """
+    add_rows(len(events_df))
+    taxonomy = categories if taxonomy is None else taxonomy
 
-    events_df_categorized = (
-        events_df
-        # .head()
-        .merge(events_df_work, on=["calendar_name", "summary"], how="left")
+    summary_categories = classify_event_summaries(
+        work_event_summaries(events_df, work_calendars), taxonomy, batch_size=batch_size, llm=llm,
+        cache_path=cache_path, similarity_threshold=similarity_threshold, **classify_kwargs
     )
+    return apply_event_categories(events_df, summary_categories, work_calendars)
 
-    return events_df_categorized
-
-
-
-def classify_batch_openai_api(llm_app, summaries, categories):
-    joined = "\n".join([f"{i+1}. {text}" for i, text in enumerate(summaries)])
-    prompt = f"""
-Classifica ciascun testo nella seguente lista in **una sola** delle categorie seguenti:
-{", ".join(categories)}
-
-Ecco i testi da classificare (uno per riga, preceduto dal numero):
-
-{joined}
-
-Rispondi fornendo solo una lista nel formato:
-
-1. categoria
-2. categoria
-...
-"""
-    response = llm_app.invoke(prompt)
-    lines = response.content.strip().split("\n")
-    # Rimuove numerazione e tiene solo le categorie
-    return [line.split(". ", 1)[1].strip() for line in lines if ". " in line]
 
 # Parametri
 categories = [ "avm-property-value", "avm-meetings", "avm-genertel-poc",
     "finbox-meetings", "finbox-gara-mcc", "finbox-privati",
     "finbox-deploy-affordability", "smart-lending-suite-meetings",
     "side-project-tools-n-pipeline", "dss-best-practices", "other"
-]
\ No newline at end of file
+]
+# Categorie rinominate (vecchio nome -> nuovo nome) rispetto alla tassonomia con cui sono classificati
+# gli eventi salvati: gli eventi vengono aggiornati senza riclassificarli (vedi reclassify_store_events)
+category_renames = {}
\ No newline at end of file
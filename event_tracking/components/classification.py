@@ -0,0 +1,185 @@
+import re
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from event_tracking.components.instrumentation import in_current_context
+
+# Modello e versione del prompt usati per classificare i titoli (fanno parte della chiave di cache):
+# incrementare CLASSIFICATION_PROMPT_VERSION quando si modifica classify_batch_openai_api
+CLASSIFICATION_MODEL = "gpt-3.5-turbo"
+CLASSIFICATION_PROMPT_VERSION = 1
+
+# Parametri del motore di classificazione
+CLASSIFICATION_MAX_WORKERS = 8
+CLASSIFICATION_REQUESTS_PER_MINUTE = 500
+CLASSIFICATION_MAX_BATCH_SIZE = 50
+CLASSIFICATION_MAX_BATCH_TOKENS = 1000
+CLASSIFICATION_MAX_RETRIES = 2
+CLASSIFICATION_BACKOFF_SECONDS = 1.0
+
+# Una riga di risposta: "3. categoria", "3) categoria", "- 3: **categoria**", ...
+RESPONSE_LINE = re.compile(r'^[\s*\-]*(\d+)\s*[.):\-]\s*(.+?)\s*$')
+
+
+def estimate_tokens(text):
+    """
+    Stima approssimativa dei token di un testo (circa 4 caratteri per token, più la numerazione)
+    """
+    return len(text) // 4 + 3
+
+
+def build_classification_batches(summaries, max_batch_size=CLASSIFICATION_MAX_BATCH_SIZE,
+                                 max_batch_tokens=CLASSIFICATION_MAX_BATCH_TOKENS):
+    """
+    Divide i titoli in batch che rispettano sia il numero massimo di titoli
+    sia il budget di token stimato, così titoli lunghi producono batch più piccoli
+    """
+    batches = []
+    batch = []
+    batch_tokens = 0
+
+    for summary in summaries:
+        tokens = estimate_tokens(summary)
+        if batch and (len(batch) >= max_batch_size or batch_tokens + tokens > max_batch_tokens):
+            batches.append(batch)
+            batch = []
+            batch_tokens = 0
+
+        batch.append(summary)
+        batch_tokens += tokens
+
+    if batch:
+        batches.append(batch)
+
+    return batches
+
+
+def build_classification_prompt(summaries, categories):
+    joined = "\n".join([f"{i+1}. {text}" for i, text in enumerate(summaries)])
+    return f"""
+Classifica ciascun testo nella seguente lista in **una sola** delle categorie seguenti:
+{", ".join(categories)}
+
+Ecco i testi da classificare (uno per riga, preceduto dal numero):
+
+{joined}
+
+Rispondi fornendo solo una lista nel formato:
+
+1. categoria
+2. categoria
+...
+"""
+
+
+def parse_classification_response(content, n_items, categories):
+    """
+    Interpreta la risposta dell'LLM associando le categorie ai testi tramite il loro numero.
+    Righe non numerate, numeri fuori intervallo e categorie inesistenti vengono ignorati:
+    le posizioni senza una categoria valida restano None.
+    """
+    lookup = {category.lower(): category for category in categories}
+    labels = [None] * n_items
+
+    for line in content.splitlines():
+        match = RESPONSE_LINE.match(line)
+        if not match:
+            continue
+
+        index = int(match.group(1)) - 1
+        label = match.group(2).strip(' *`"\'.').lower()
+        if 0 <= index < n_items and label in lookup:
+            labels[index] = lookup[label]
+
+    return labels
+
+
+def classify_batch_openai_api(llm_app, summaries, categories):
+    """
+    Classifica un batch di titoli con una sola chiamata all'LLM.
+
+    :return: lista allineata a `summaries`, con None per i titoli senza una categoria valida
+    """
+    response = llm_app.invoke(build_classification_prompt(summaries, categories))
+    return parse_classification_response(response.content, len(summaries), categories)
+
+
+class RateLimiter:
+    """
+    Limita le chiamate a `requests_per_minute`, distanziandole in modo uniforme tra i thread
+    """
+
+    def __init__(self, requests_per_minute):
+        self.interval = 60.0 / requests_per_minute
+        self._next_time = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_time - now
+            self._next_time = max(now, self._next_time) + self.interval
+
+        if wait > 0:
+            time.sleep(wait)
+
+
+def classify_summaries(llm, summaries, categories,
+                       max_batch_size=CLASSIFICATION_MAX_BATCH_SIZE,
+                       max_batch_tokens=CLASSIFICATION_MAX_BATCH_TOKENS,
+                       max_workers=CLASSIFICATION_MAX_WORKERS,
+                       requests_per_minute=CLASSIFICATION_REQUESTS_PER_MINUTE,
+                       max_retries=CLASSIFICATION_MAX_RETRIES,
+                       backoff_seconds=CLASSIFICATION_BACKOFF_SECONDS,
+                       executor=None):
+    """
+    Classifica i titoli inviando i batch in parallelo all'LLM nel rispetto del rate limit.
+    Un errore o una risposta incompleta non invalida gli altri batch: solo i titoli rimasti
+    senza categoria vengono ritentati (con backoff) e, se continuano a fallire, il batch
+    viene diviso a metà finché ogni titolo non è stato provato da solo.
+
+    :param executor: pool in cui inviare i batch (condiviso ad esempio tra più account),
+                     al posto di uno nuovo con `max_workers` thread
+    :return: dizionario titolo -> categoria per i titoli classificati con successo
+    """
+    limiter = RateLimiter(requests_per_minute)
+
+    def classify_batch(batch, attempt=0):
+        limiter.acquire()
+        try:
+            labels = classify_batch_openai_api(llm, batch, categories)
+        except Exception as e:
+            print(f"Errore nella classificazione di un batch di {len(batch)} titoli: {e}")
+            labels = [None] * len(batch)
+
+        classified = {summary: label for summary, label in zip(batch, labels) if label is not None}
+        failed = [summary for summary, label in zip(batch, labels) if label is None]
+        if not failed:
+            return classified
+
+        if attempt < max_retries:
+            time.sleep(backoff_seconds * 2 ** attempt)
+            classified.update(classify_batch(failed, attempt + 1))
+        elif len(failed) > 1:
+            middle = len(failed) // 2
+            classified.update(classify_batch(failed[:middle]))
+            classified.update(classify_batch(failed[middle:]))
+        else:
+            print(f"Impossibile classificare il titolo: {failed[0]!r}")
+
+        return classified
+
+    batches = build_classification_batches(summaries, max_batch_size, max_batch_tokens)
+
+    results = {}
+    classify_batch = in_current_context(classify_batch)
+    if batches and executor is not None:
+        for classified in executor.map(classify_batch, batches):
+            results.update(classified)
+    elif batches:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(batches)))) as executor:
+            for classified in executor.map(classify_batch, batches):
+                results.update(classified)
+
+    return results
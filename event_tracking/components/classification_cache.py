@@ -0,0 +1,171 @@
+import re
+import time
+import sqlite3
+import hashlib
+
+from event_tracking.config import PATH_CLASSIFICATION_CACHE
+
+# Numero massimo di classificazioni conservate (le meno usate di recente vengono eliminate)
+CACHE_MAX_ENTRIES = 50_000
+
+# Categoria dei titoli che non rientrano nelle altre: va rivista quando si aggiungono categorie
+OTHER_CATEGORY = "other"
+
+
+def normalize_summary(summary):
+    """
+    Normalizza il titolo di un evento per l'uso come chiave di cache
+    (minuscolo, senza spazi iniziali/finali e con spazi multipli compressi)
+    """
+    return re.sub(r'\s+', ' ', str(summary)).strip().lower()
+
+
+def taxonomy_key(categories):
+    """
+    Impronta della lista di categorie: cambia quando la tassonomia viene modificata
+    """
+    return hashlib.sha1("\n".join(sorted(categories)).encode()).hexdigest()
+
+
+def taxonomy_changes(old_categories, new_categories, renames=None):
+    """
+    Differenze tra due versioni della tassonomia. Una categoria divisa in più categorie
+    si indica eliminandola e aggiungendo le nuove; una rinominata (o unita a un'altra) con `renames`.
+
+    :param renames: dizionario vecchia categoria -> nuova categoria
+    :return: dizionario con le categorie aggiunte, eliminate e rinominate (vecchia -> nuova) e le etichette
+             i cui titoli vanno riclassificati (`reclassify`): le categorie eliminate e, se ne sono state
+             aggiunte, 'other'
+    """
+    old, new = set(old_categories), set(new_categories)
+    renamed = {source: target for source, target in (renames or {}).items()
+               if source in old and source not in new and target in new}
+
+    added = sorted(new - old - set(renamed.values()))
+    removed = sorted(old - new - set(renamed))
+    reclassify = set(removed)
+    if added and OTHER_CATEGORY in new:
+        reclassify.add(OTHER_CATEGORY)
+
+    return {"added": added, "removed": removed, "renamed": renamed, "reclassify": reclassify}
+
+
+def open_classification_cache(path=PATH_CLASSIFICATION_CACHE):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS classification_cache (
+            summary_key TEXT NOT NULL,
+            taxonomy TEXT NOT NULL,
+            model TEXT NOT NULL,
+            prompt_version INTEGER NOT NULL,
+            category TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            last_used_at REAL NOT NULL,
+            PRIMARY KEY (summary_key, taxonomy, model, prompt_version)
+        )
+    """)
+    return conn
+
+
+def get_cached_categories(conn, summaries, categories, model, prompt_version):
+    """
+    Restituisce le categorie già note per i titoli indicati (titolo -> categoria)
+    e aggiorna il loro istante di ultimo utilizzo
+    """
+    keys = {summary: normalize_summary(summary) for summary in summaries}
+    taxonomy = taxonomy_key(categories)
+
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS lookup_keys (summary_key TEXT PRIMARY KEY)")
+    conn.execute("DELETE FROM lookup_keys")
+    conn.executemany("INSERT OR IGNORE INTO lookup_keys VALUES (?)", [(key,) for key in keys.values()])
+
+    where = """
+        summary_key IN (SELECT summary_key FROM lookup_keys)
+        AND taxonomy = ? AND model = ? AND prompt_version = ?
+    """
+    params = (taxonomy, model, prompt_version)
+
+    with conn:
+        found = dict(conn.execute(f"SELECT summary_key, category FROM classification_cache WHERE {where}", params))
+        conn.execute(f"UPDATE classification_cache SET last_used_at = ? WHERE {where}", (time.time(), *params))
+
+    return {summary: found[key] for summary, key in keys.items() if key in found}
+
+
+def get_all_cached_categories(conn, categories, model, prompt_version):
+    """
+    Tutte le classificazioni note per tassonomia, modello e versione del prompt indicati
+    (titolo normalizzato -> categoria)
+    """
+    return dict(conn.execute(
+        "SELECT summary_key, category FROM classification_cache "
+        "WHERE taxonomy = ? AND model = ? AND prompt_version = ?",
+        (taxonomy_key(categories), model, prompt_version)
+    ))
+
+
+def store_categories(conn, summary_categories, categories, model, prompt_version):
+    """
+    Salva le nuove classificazioni (titolo -> categoria)
+    """
+    taxonomy = taxonomy_key(categories)
+    now = time.time()
+
+    with conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO classification_cache VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(normalize_summary(summary), taxonomy, model, prompt_version, category, now, now)
+             for summary, category in summary_categories.items()]
+        )
+
+
+def migrate_classification_cache(conn, old_categories, new_categories, renames=None):
+    """
+    Copia nella nuova tassonomia le classificazioni fatte con quella precedente che restano valide
+    (vedi taxonomy_changes): le categorie rinominate vengono aggiornate, i titoli da riclassificare
+    non vengono copiati. Le classificazioni già presenti per la nuova tassonomia non vengono toccate.
+
+    :return: numero di classificazioni copiate
+    """
+    changes = taxonomy_changes(old_categories, new_categories, renames)
+    rows = conn.execute(
+        "SELECT * FROM classification_cache WHERE taxonomy = ?", (taxonomy_key(old_categories),)
+    ).fetchall()
+
+    migrated = [
+        (summary_key, taxonomy_key(new_categories), model, prompt_version,
+         changes["renamed"].get(category, category), created_at, last_used_at)
+        for summary_key, _, model, prompt_version, category, created_at, last_used_at in rows
+        if category not in changes["reclassify"]
+    ]
+    with conn:
+        return conn.executemany("INSERT OR IGNORE INTO classification_cache VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                migrated).rowcount
+
+
+def drop_taxonomy_classifications(conn, categories):
+    """
+    Elimina le classificazioni fatte con la tassonomia `categories`. Va chiamata solo in una migrazione
+    esplicita (vedi reclassify_store_events): la cache è condivisa tra account con tassonomie diverse.
+
+    :return: numero di righe eliminate
+    """
+    with conn:
+        return conn.execute(
+            "DELETE FROM classification_cache WHERE taxonomy = ?", (taxonomy_key(categories),)
+        ).rowcount
+
+
+def evict_classification_cache(conn, max_entries=CACHE_MAX_ENTRIES):
+    """
+    Elimina, oltre `max_entries`, le classificazioni usate meno di recente (di qualsiasi tassonomia)
+
+    :return: numero di righe eliminate
+    """
+    with conn:
+        return conn.execute("""
+            DELETE FROM classification_cache WHERE rowid IN (
+                SELECT rowid FROM classification_cache ORDER BY last_used_at DESC LIMIT -1 OFFSET ?
+            )
+        """, (max_entries,)).rowcount
@@ -26,29 +26,43 @@ def header_display():
     """)
 
 def sidebar_display(df):
+    return sidebar_filters(sorted(df['year'].unique()), sorted(df['calendar_name'].unique()))
+
+def sidebar_filters(years, calendars):
     # Preparazione della sidebar per i filtri
     st.sidebar.header("Filtri")
 
-    # Filtro per anno
-    years = sorted(df['year'].unique())
-    selected_year = st.sidebar.selectbox("Anno", years, index=len(years) - 1)
+    # Filtro per anno (None: tutti gli anni)
+    selected_year = st.sidebar.selectbox("Anno", [*years, None], index=len(years) - 1,
+                                         format_func=lambda year: "Tutti gli anni" if year is None else str(year))
 
     # Filtro per calendario
-    calendars = sorted(df['calendar_name'].unique())
     selected_calendars = st.sidebar.multiselect("Calendari", calendars, default=calendars)
 
     # Filtro per multiscale review
     multi_scale_list = ['yearly', 'monthly', 'weekly']
     selected_time_scale = st.sidebar.selectbox("Time Scale", multi_scale_list, index=len(years) - 1)
 
+    # Valore mostrato nella heatmap: numero di eventi o minuti
+    dict_values = {"Numero eventi": "count", "Minuti": "minutes"}
+    selected_value = dict_values[st.sidebar.radio("Valore heatmap", list(dict_values))]
+
     dict_out = {
         "selected_year": selected_year,
         "selected_calendars": selected_calendars,
-        "selected_time_scale": selected_time_scale
+        "selected_time_scale": selected_time_scale,
+        "selected_value": selected_value
     }
 
     return dict_out
 
+def add_time_scale_columns(df):
+    # Colonne per la multiscale review usate da get_contribution_plot
+    df['year_only'] = df['start_time'].dt.year.astype(str)
+    df['year_month'] = df['start_time'].dt.strftime('%Y-%m')
+    df['year_month_week'] = df['start_time'].dt.strftime('%Y-%m-') + df['week_number'].astype(str).str.zfill(2)
+    return df
+
 def get_contribution_plot(df, view = "monthly"):
     dict_view_available = {
         'yearly': 'year_only',
@@ -60,15 +74,18 @@ def get_contribution_plot(df, view = "monthly"):
         df
         .loc[(df["calendar_name"] == "Pozz Work"), :]
         # .head()
-        .groupby([dict_view_available[view], "event_category"])
+        .groupby([dict_view_available[view], "event_category"], observed=True)
         .size()
         .to_frame("count")
         .sort_values("count", ascending=False)
-        .pivot_table(index="event_category", columns=dict_view_available[view], values="count")
+        .pivot_table(index="event_category", columns=dict_view_available[view], values="count", observed=True)
         .fillna(0)
     )
 
-    # Creazione della heatmap
+    return get_contribution_figure(df_pivot_cat)
+
+def get_contribution_figure(df_pivot_cat):
+    # Creazione della heatmap da una tabella categoria x periodo già aggregata
     fig = px.imshow(df_pivot_cat,
                     labels=dict(x="Time", y="Summary", color="Valore"),
                     x=df_pivot_cat.columns,
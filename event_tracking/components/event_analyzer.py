@@ -1,5 +1,15 @@
-from langchain.prompts import PromptTemplate
-from langchain.chains import LLMChain
+import pandas as pd
+
+from event_tracking.components.classification import estimate_tokens
+from event_tracking.components.interval_analyzer import busy_time
+from event_tracking.components.queries import category_totals
+from event_tracking.config import LOCAL_TIMEZONE
+
+# Contesto della chat di analisi del tempo: budget di token stimato e numero di titoli più frequenti inclusi.
+# Il prompt ha dimensione limitata qualunque sia il numero di eventi selezionati.
+CHAT_CONTEXT_MAX_TOKENS = 1500
+CHAT_TOP_SUMMARIES = 15
+CHAT_TREND_MONTHS = 12
 
 # Analisi delle categorie degli eventi
 def analyze_event_categories(df):
@@ -10,11 +20,28 @@ def analyze_event_categories(df):
     :return: Dizionario con statistiche delle categorie
     """
     # Conteggio degli eventi per categoria
-    category_counts = df['event_category'].value_counts()
+    # (observed=True: con lo schema compatto le categorie senza eventi non compaiono)
+    category_counts = df.groupby('event_category', observed=True).size().sort_values(ascending=False)
 
     # Calcolo del tempo totale per categoria
-    category_duration = df.groupby('event_category')['duration_minutes'].sum()
+    category_duration = df.groupby('event_category', observed=True)['duration_minutes'].sum()
+
+    return _category_summary(category_counts, category_duration)
+
+def analyze_event_categories_from_store(conn, year=None, calendars=None, timed_only=False):
+    """
+    Come analyze_event_categories, ma a partire dalle tabelle di rollup del database eventi
+    invece che dal DataFrame completo.
+
+    :param conn: connessione al database eventi
+    :param timed_only: conta solo gli eventi con orario, come build_time_context
+    :return: Dizionario con statistiche delle categorie
+    """
+    totals = category_totals(conn, year=year, calendars=calendars, timed_only=timed_only)
+
+    return _category_summary(totals['count'].sort_values(ascending=False), totals['total_minutes'])
 
+def _category_summary(category_counts, category_duration):
     # Percentuale di tempo per categoria
     total_time = category_duration.sum()
     category_percentage = (category_duration / total_time * 100).round(2)
@@ -25,26 +52,119 @@ def analyze_event_categories(df):
         'percentage': category_percentage.to_dict()
     }
 
-# Interfaccia con Ollama per analisi approfondita
-def create_ollama_analyzer(llm_initialized):
+# Contesto compatto per la chat di analisi del tempo
+def build_time_context(df, max_tokens=CHAT_CONTEXT_MAX_TOKENS, top_n=CHAT_TOP_SUMMARIES,
+                       trend_months=CHAT_TREND_MONTHS, categories=None):
     """
-    Crea un analizzatore basato su Ollama per interpretazioni più dettagliate.
+    Riassume gli eventi selezionati in statistiche testuali da inviare all'LLM al posto degli eventi:
+    panoramica, categorie, andamento mensile, calendari e titoli più frequenti, in quest'ordine di priorità.
+    Le sezioni vengono aggiunte finché il testo rientra in `max_tokens` token stimati
+    (le righe meno importanti di ogni sezione sono le ultime e vengono tagliate per prime).
 
-    :return: Catena LLM per l'analisi
+    :param df: DataFrame degli eventi
+    :param categories: statistiche delle categorie degli eventi con orario, se già calcolate
+                       (ad es. con analyze_event_categories_from_store(..., timed_only=True));
+                       altrimenti vengono calcolate da `df`
+    :return: Testo del contesto
     """
+    if df.empty:
+        return "Nessun evento nel periodo selezionato."
+
+    local_start = pd.to_datetime(df['start_time'], utc=True).dt.tz_convert(LOCAL_TIMEZONE)
+    timed = df.loc[~df['all_day'].fillna(False).astype(bool)]
+    months = local_start.dt.strftime('%Y-%m').rename('month')
+
+    busy = busy_time(df, period='week')
+    if categories is None:
+        categories = analyze_event_categories(timed)
+    overview = [
+        f"Periodo: dal {local_start.min():%Y-%m-%d} al {local_start.max():%Y-%m-%d}",
+        f"Eventi: {len(df)} ({len(df) - len(timed)} di tutto il giorno)",
+        f"Tempo pianificato: {timed['duration_minutes'].sum() / 60:.1f} ore, "
+        f"tempo realmente occupato (sovrapposizioni contate una volta): {busy['busy_minutes'].sum() / 60:.1f} ore",
+    ]
+    # Solo eventi di tutto il giorno: nessuna settimana con tempo occupato di cui fare la media
+    if len(busy):
+        overview.append(f"Media settimanale di tempo occupato: {busy['busy_minutes'].mean() / 60:.1f} ore "
+                        f"su {len(busy)} settimane")
+
+    category_lines = [
+        f"{category}: {categories['counts'][category]} eventi, "
+        f"{categories['total_duration'][category] / 60:.1f} ore ({categories['percentage'][category]}%)"
+        for category in categories['counts']
+    ]
+
+    trend = timed.groupby([months.loc[timed.index], 'event_category'], observed=True)['duration_minutes'].sum()
+    trend_lines = [
+        f"{month}: " + ", ".join(f"{category} {minutes / 60:.1f}h"
+                                 for category, minutes in trend.loc[month].sort_values(ascending=False).items())
+        for month in sorted(trend.index.get_level_values('month').unique(), reverse=True)[:trend_months]
+    ]
 
-    prompt_template = PromptTemplate(
-        input_variables=["categories", "total_time", "top_categories"],
-        template="""
-        Analizza il seguente profilo temporale degli eventi:
-        - Categorie degli eventi: {categories}
-        - Tempo totale analizzato: {total_time} minuti
-        - Categorie principali: {top_categories}
+    calendar_minutes = timed.groupby('calendar_name', observed=True)['duration_minutes'].agg(['count', 'sum'])
+    calendar_lines = [
+        f"{calendar}: {row['count']} eventi, {row['sum'] / 60:.1f} ore"
+        for calendar, row in calendar_minutes.sort_values('sum', ascending=False).iterrows()
+    ]
 
-        Fornisci un'interpretazione dettagliata di come il tempo è stato distribuito,
-        evidenziando i pattern più significativi e fornendo eventuali suggerimenti
-        per un migliore utilizzo del tempo.
-        """
-    )
+    summaries = timed.groupby(['summary', 'event_category'], observed=True, dropna=False)['duration_minutes'] \
+        .agg(['count', 'sum']).sort_values('sum', ascending=False).head(top_n)
+    summary_lines = [
+        f"\"{summary}\" ({category}): {row['count']} volte, {row['sum'] / 60:.1f} ore"
+        for (summary, category), row in summaries.iterrows()
+    ]
 
-    return LLMChain(llm=llm_initialized, prompt=prompt_template)
+    return _fit_to_budget([
+        ("Panoramica", overview),
+        ("Tempo per categoria", category_lines),
+        ("Andamento mensile (ore per categoria, dal mese più recente)", trend_lines),
+        ("Tempo per calendario", calendar_lines),
+        (f"Eventi che occupano più tempo (primi {top_n})", summary_lines),
+    ], max_tokens)
+
+def _fit_to_budget(sections, max_tokens):
+    lines = []
+    tokens = 0
+    for title, section_lines in sections:
+        header = f"{title}:"
+        if not section_lines:
+            continue
+        if tokens + estimate_tokens(header) + estimate_tokens(f"- {section_lines[0]}") > max_tokens:
+            continue
+
+        lines.append(header)
+        tokens += estimate_tokens(header)
+        for line in section_lines:
+            line = f"- {line}"
+            if tokens + estimate_tokens(line) > max_tokens:
+                break
+            lines.append(line)
+            tokens += estimate_tokens(line)
+
+    return "\n".join(lines)
+
+# Prompt per l'analisi con l'LLM (backend "openai" o "local", vedi create_llm_backend)
+def build_analysis_prompt(context, question):
+    """
+    Prompt della chat di analisi: il contesto di build_time_context e la domanda dell'utente
+    """
+    return f"""
+Analizza il seguente profilo temporale degli eventi del calendario:
+
+{context}
+
+Rispondi alla domanda dell'utente sulla sua gestione del tempo, evidenziando
+i pattern più significativi e fornendo eventuali suggerimenti per un migliore
+utilizzo del tempo. Usa solo i dati riportati sopra.
+
+Domanda: {question}
+"""
+
+def stream_time_analysis(llm, context, question):
+    """
+    Risposta dell'LLM un pezzo alla volta, man mano che viene generata
+
+    :return: generatore di stringhe (ad esempio per st.write_stream)
+    """
+    for chunk in llm.stream(build_analysis_prompt(context, question)):
+        yield getattr(chunk, "content", chunk)
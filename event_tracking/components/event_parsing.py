@@ -0,0 +1,118 @@
+import re
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from event_tracking.components.event_schema import DAYS_OF_WEEK, MONTHS, EVENT_ARROW_SCHEMA
+
+# Schema delle tabelle Arrow passate a upsert_events: le colonne della tabella eventi più quelle
+# con cui vengono riconosciute le serie ricorrenti (come il DataFrame di event_store.to_store_frame)
+STORE_ARROW_SCHEMA = EVENT_ARROW_SCHEMA.append(pa.field('recurring_event_id', pa.string())) \
+    .append(pa.field('utc_offset_minutes', pa.int16()))
+
+MICROSECONDS_PER_MINUTE = 60_000_000
+
+
+def calendar_events_table(events):
+    """
+    Converte gli eventi dell'API (ad es. una pagina) in una tabella Arrow con lo schema STORE_ARROW_SCHEMA,
+    senza passare da colonne object di pandas: orari in UTC, parti del calendario calcolate con
+    pyarrow.compute sull'orario locale riportato dall'API, categoria vuota.
+    Unica implementazione usata da process_calendar_events e process_calendar_events_arrow.
+    """
+    start_raw = pa.array([event['start'].get('dateTime') or event['start']['date'] for event in events], pa.string())
+    end_raw = pa.array([event['end'].get('dateTime') or event['end']['date'] for event in events], pa.string())
+    all_day = pa.array(['dateTime' not in event['start'] for event in events], pa.bool_())
+    recurring_event_id = pa.array([event.get('recurringEventId') for event in events], pa.string())
+
+    start_local, start_offset = _parse_event_times(start_raw, all_day)
+    end_local, end_offset = _parse_event_times(end_raw, all_day)
+    start_utc = _to_utc(start_local, start_offset)
+    end_utc = _to_utc(end_local, end_offset)
+
+    # Durata arrotondata al minuto come in apply_event_schema (arrotondamento half-to-even di numpy)
+    duration_minutes = pc.round(
+        pc.divide(pc.cast(pc.subtract(end_utc, start_utc), pa.int64()).cast(pa.float64()), MICROSECONDS_PER_MINUTE),
+        round_mode='half_to_even'
+    ).cast(pa.int32())
+
+    arrays = [
+        pa.array([event.get('id', '') for event in events], pa.string()),
+        pa.array([event.get('summary', 'Evento senza titolo') for event in events], pa.string()),
+        pa.array([event.get('calendar_name', 'Calendario principale') for event in events], pa.string()),
+        start_utc.cast(pa.timestamp('us', tz='UTC')),
+        end_utc.cast(pa.timestamp('us', tz='UTC')),
+        all_day,
+        null_where(duration_minutes, all_day),
+        pc.take(pa.array(DAYS_OF_WEEK), pc.day_of_week(start_local)),
+        pc.iso_week(start_local).cast(pa.int8()),
+        pc.day(start_local).cast(pa.int8()),
+        pc.take(pa.array(MONTHS), pc.subtract(pc.month(start_local), 1)),
+        pc.year(start_local).cast(pa.int16()),
+        null_where(pc.hour(start_local).cast(pa.int8()), all_day),
+        pa.nulls(len(events), pa.string()),
+        recurring_event_id,
+        # Offset locale solo per le occorrenze di eventi ricorrenti (0 per quelle di tutto il giorno)
+        pc.if_else(pc.is_valid(recurring_event_id), start_offset, pa.scalar(None, pa.int16())),
+    ]
+    return pa.Table.from_arrays(arrays, schema=STORE_ARROW_SCHEMA)
+
+
+def _parse_event_times(raw, all_day):
+    """
+    Converte le stringhe 'dateTime'/'date' dell'API in orario locale naive e offset in minuti
+    (0 per gli eventi di tutto il giorno, trattati come UTC come in to_store_frame)
+    """
+    # Le dateTime dell'API sono RFC3339: 'YYYY-MM-DDTHH:MM:SS', frazione di secondo facoltativa e 'Z' o '±HH:MM'.
+    # Le date degli eventi di tutto il giorno sono 'YYYY-MM-DD'
+    text = pc.if_else(all_day, pc.binary_join_element_wise(raw, "T00:00:00", ""),
+                      pc.utf8_slice_codeunits(raw, 0, 19))
+    local = pc.strptime(text, format='%Y-%m-%dT%H:%M:%S', unit='us')
+
+    # Pochi suffissi distinti (frazione e offset): si interpreta ognuno una sola volta
+    suffixes = pc.if_else(all_day, pa.scalar(None, pa.string()), pc.utf8_slice_codeunits(raw, 19, 64))
+    distinct = pc.drop_null(pc.unique(suffixes))
+    microseconds, offsets = zip(*map(parse_time_suffix, distinct.to_pylist())) if len(distinct) else ((), ())
+    positions = pc.index_in(suffixes, value_set=distinct)
+
+    fraction = pc.fill_null(pc.take(pa.array(microseconds, pa.int64()), positions), 0).cast(pa.duration('us'))
+    offset_minutes = pc.fill_null(pc.take(pa.array(offsets, pa.int16()), positions), 0)
+
+    return pc.add(local, fraction), offset_minutes.cast(pa.int16())
+
+
+def _to_utc(local, offset_minutes):
+    offset = pc.multiply(offset_minutes.cast(pa.int64()), MICROSECONDS_PER_MINUTE).cast(pa.duration('us'))
+    return pc.subtract(local, offset)
+
+
+def null_where(values, mask):
+    """
+    Sostituisce con null i valori dell'array Arrow `values` dove `mask` è vera
+    """
+    return pc.if_else(mask, pa.scalar(None, values.type), values)
+
+
+def parse_time_suffix(suffix):
+    """
+    Interpreta la parte di una dateTime RFC3339 che segue 'YYYY-MM-DDTHH:MM:SS': frazione di secondo
+    facoltativa ('.250') e fuso orario ('Z', '+02:00', '-05:30')
+
+    :return: (microsecondi della frazione di secondo, offset in minuti)
+    """
+    fraction, offset = re.fullmatch(r'(?:\.(\d+))?(.*)', suffix).groups()
+    microseconds = int(fraction[:6].ljust(6, '0')) if fraction else 0
+    return microseconds, parse_utc_offset(offset)
+
+
+def parse_utc_offset(suffix):
+    """
+    Converte il suffisso di fuso orario RFC3339 ('Z', '+02:00', '-05:30') in minuti
+    """
+    if suffix == 'Z':
+        return 0
+    if len(suffix) != 6 or suffix[0] not in '+-' or suffix[3] != ':':
+        raise ValueError(f"Offset non riconosciuto: {suffix!r}")
+
+    minutes = int(suffix[1:3]) * 60 + int(suffix[4:6])
+    return minutes if suffix[0] == '+' else -minutes
@@ -0,0 +1,80 @@
+import pandas as pd
+import pyarrow as pa
+
+DAYS_OF_WEEK = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+MONTHS = ["January", "February", "March", "April", "May", "June", "July",
+          "August", "September", "October", "November", "December"]
+
+# Schema compatto del DataFrame eventi letto e scritto dal database e dal dataset parquet:
+# - stringhe ripetute come categorie (dizionario + codici interi), gli id come stringhe Arrow
+# - parti del calendario su interi piccoli, con interi nullable al posto dei float con NaN
+# - orari in UTC con la stessa unità (microsecondi, come DuckDB e parquet)
+EVENT_DTYPES = {
+    'event_id': pd.ArrowDtype(pa.string()),
+    'summary': 'category',
+    'calendar_name': 'category',
+    'start_time': 'datetime64[us, UTC]',
+    'end_time': 'datetime64[us, UTC]',
+    'all_day': 'bool',
+    'duration_minutes': 'Int32',
+    'day_of_week': pd.CategoricalDtype(DAYS_OF_WEEK, ordered=True),
+    'week_number': 'int8',
+    'day': 'int8',
+    'month': pd.CategoricalDtype(MONTHS, ordered=True),
+    'year': 'int16',
+    'hour_of_day': 'Int8',
+    'event_category': 'category',
+}
+
+# Stesso schema in Arrow/parquet: le categorie diventano stringhe semplici (parquet le codifica
+# comunque a dizionario), così tutti i file e i blocchi scritti hanno lo stesso schema
+EVENT_ARROW_SCHEMA = pa.schema([
+    ('event_id', pa.string()),
+    ('summary', pa.string()),
+    ('calendar_name', pa.string()),
+    ('start_time', pa.timestamp('us', tz='UTC')),
+    ('end_time', pa.timestamp('us', tz='UTC')),
+    ('all_day', pa.bool_()),
+    ('duration_minutes', pa.int32()),
+    ('day_of_week', pa.string()),
+    ('week_number', pa.int8()),
+    ('day', pa.int8()),
+    ('month', pa.string()),
+    ('year', pa.int16()),
+    ('hour_of_day', pa.int8()),
+    ('event_category', pa.string()),
+])
+
+
+def apply_event_schema(events_df):
+    """
+    Converte le colonne presenti in `events_df` ai tipi di EVENT_DTYPES
+    (le altre colonne restano invariate). Gli orari con offset misti vengono portati in UTC,
+    le durate arrotondate al minuto.
+    """
+    frame = events_df.copy()
+
+    for column, dtype in EVENT_DTYPES.items():
+        if column not in frame:
+            continue
+        if column in ('start_time', 'end_time'):
+            frame[column] = pd.to_datetime(frame[column], utc=True).dt.as_unit('us')
+        elif column in ('duration_minutes', 'hour_of_day'):
+            frame[column] = pd.to_numeric(frame[column]).round().astype(dtype)
+        elif isinstance(dtype, pd.CategoricalDtype) or dtype == 'category':
+            # I valori mancanti restano tali (astype(str) li trasformerebbe in 'None')
+            frame[column] = frame[column].astype('object').astype(dtype)
+        else:
+            frame[column] = frame[column].astype(dtype)
+
+    return frame
+
+
+def to_event_table(events_df):
+    """
+    Tabella Arrow con lo schema EVENT_ARROW_SCHEMA da un DataFrame con tutte le colonne della tabella eventi
+    """
+    frame = apply_event_schema(events_df)[EVENT_ARROW_SCHEMA.names]
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    return pa.Table.from_arrays([column.cast(field.type) for column, field in zip(table.columns, EVENT_ARROW_SCHEMA)],
+                                schema=EVENT_ARROW_SCHEMA)
@@ -0,0 +1,722 @@
+import os
+import datetime
+
+import duckdb
+import pandas as pd
+import pyarrow as pa
+
+from event_tracking.components.event_schema import apply_event_schema
+from event_tracking.components.instrumentation import instrumented_stage, add_rows
+from event_tracking.config import PATH_EVENT_STORE, PATH_EVENT_STORE_SNAPSHOT, LOCAL_TIMEZONE
+
+# Colonne della tabella eventi, nell'ordine prodotto da process_calendar_events + categorize_calendar_events.
+# I tipi corrispondono allo schema compatto di event_schema.EVENT_DTYPES
+EVENT_COLUMNS = {
+    'event_id': 'VARCHAR NOT NULL',
+    'summary': 'VARCHAR',
+    'calendar_name': 'VARCHAR NOT NULL',
+    'start_time': 'TIMESTAMPTZ',
+    'end_time': 'TIMESTAMPTZ',
+    'all_day': 'BOOLEAN',
+    'duration_minutes': 'INTEGER',
+    'day_of_week': 'VARCHAR',
+    'week_number': 'TINYINT',
+    'day': 'TINYINT',
+    'month': 'VARCHAR',
+    'year': 'SMALLINT',
+    'hour_of_day': 'TINYINT',
+    'event_category': 'VARCHAR',
+}
+
+# Righe per pagina lette da query_events_page (esplorazione dei dati nella dashboard)
+EVENTS_PAGE_SIZE = 100
+
+# Numero minimo di occorrenze di una serie ricorrente per salvarla compressa in event_series
+SERIES_MIN_INSTANCES = 2
+
+# Colonne aggiuntive di to_store_frame usate per riconoscere le serie ricorrenti (non fanno parte della vista events)
+SERIES_COLUMNS = {
+    'recurring_event_id': 'VARCHAR',
+    'utc_offset_minutes': 'SMALLINT',
+}
+
+# Giorno locale di inizio di un evento, da cui derivano i periodi delle tabelle di rollup
+LOCAL_DAY = f"CAST(timezone('{LOCAL_TIMEZONE}', start_time) AS DATE)"
+
+# Etichetta del periodo per ogni grana di rollup, calcolata dal giorno locale
+# (stesso formato delle colonne year_only / year_month / year_month_week della dashboard)
+ROLLUP_GRAINS = {
+    'daily': "strftime(day, '%Y-%m-%d')",
+    'weekly': "strftime(day, '%Y-%m-') || lpad(CAST(weekofyear(day) AS VARCHAR), 2, '0')",
+    'monthly': "strftime(day, '%Y-%m')",
+    'yearly': "CAST(year(day) AS VARCHAR)",
+}
+
+
+def published_store_path(store_path=PATH_EVENT_STORE, snapshot_path=PATH_EVENT_STORE_SNAPSHOT):
+    """
+    Database da leggere nella dashboard: lo snapshot se è già stato pubblicato (vedi refresh.publish_snapshot),
+    altrimenti il database
+    """
+    return snapshot_path if os.path.exists(snapshot_path) else store_path
+
+
+def open_event_store(path=PATH_EVENT_STORE, read_only=False):
+    """
+    Apre (e se necessario crea) il database DuckDB degli eventi.
+    Gli eventi sono identificati da (calendar_name, event_id): lo stesso evento condiviso
+    compare con lo stesso id in più calendari. Gli eventi singoli sono in single_events, le serie
+    ricorrenti in event_series (una riga per serie); la vista `events` le espande in un'unica
+    tabella di occorrenze, letta da query, rollup ed esportazioni.
+    """
+    if not read_only:
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+    conn = duckdb.connect(str(path), read_only=read_only)
+    conn.execute("SET TimeZone = 'UTC'")
+
+    if not read_only:
+        _migrate_events_table(conn)
+
+        columns = ",\n".join(f"{name} {sql_type}" for name, sql_type in EVENT_COLUMNS.items())
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS single_events (
+                {columns},
+                PRIMARY KEY (calendar_name, event_id)
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS single_events_start_time ON single_events (start_time)")
+        conn.execute("CREATE INDEX IF NOT EXISTS single_events_calendar_name ON single_events (calendar_name)")
+        # Una riga per serie ricorrente, con id, inizio (UTC) e offset locale di ogni occorrenza
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS event_series (
+                calendar_name VARCHAR NOT NULL,
+                series_id VARCHAR NOT NULL,
+                summary VARCHAR,
+                event_category VARCHAR,
+                all_day BOOLEAN,
+                length_minutes INTEGER NOT NULL,
+                instance_ids VARCHAR[] NOT NULL,
+                instance_starts TIMESTAMPTZ[] NOT NULL,
+                instance_offsets SMALLINT[] NOT NULL,
+                PRIMARY KEY (calendar_name, series_id)
+            )
+        """)
+        conn.execute(f"CREATE OR REPLACE VIEW events AS {_events_sql()}")
+        # Versione dei dati, incrementata a ogni scrittura: invalida le cache della dashboard.
+        # store_id distingue un database ricreato da zero, la cui versione riparte da 0
+        conn.execute("CREATE TABLE IF NOT EXISTS data_version (version BIGINT NOT NULL, store_id VARCHAR)")
+        conn.execute("ALTER TABLE data_version ADD COLUMN IF NOT EXISTS store_id VARCHAR")
+        conn.execute("INSERT INTO data_version SELECT 0, NULL WHERE NOT EXISTS (SELECT * FROM data_version)")
+        conn.execute("UPDATE data_version SET store_id = CAST(uuid() AS VARCHAR) WHERE store_id IS NULL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS sync_state (
+                calendar_id VARCHAR PRIMARY KEY,
+                sync_token VARCHAR
+            )
+        """)
+        # Versioni della tassonomia con cui sono classificati gli eventi (l'ultima è quella attuale)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS taxonomy_versions (
+                version INTEGER NOT NULL,
+                categories VARCHAR[] NOT NULL,
+                created_at TIMESTAMPTZ NOT NULL
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS event_rollups (
+                grain VARCHAR NOT NULL,
+                period VARCHAR NOT NULL,
+                year INTEGER NOT NULL,
+                calendar_name VARCHAR NOT NULL,
+                event_category VARCHAR,
+                event_count BIGINT NOT NULL,
+                timed_events BIGINT NOT NULL,
+                all_day_events BIGINT NOT NULL,
+                total_minutes DOUBLE NOT NULL
+            )
+        """)
+
+        # Database creato prima delle tabelle di rollup: si calcolano una volta da zero
+        if conn.execute("SELECT COUNT(*) FROM event_rollups").fetchone()[0] == 0:
+            rebuild_rollups(conn)
+
+    return conn
+
+
+def _migrate_events_table(conn):
+    """
+    Nei database creati prima della compressione delle serie `events` è una tabella:
+    diventa single_events (gli indici vanno ricreati perché DuckDB non rinomina tabelle indicizzate)
+    """
+    is_table = conn.execute(
+        "SELECT COUNT(*) FROM duckdb_tables() WHERE table_name = 'events' AND NOT temporary"
+    ).fetchone()[0]
+    if is_table:
+        conn.execute("DROP INDEX IF EXISTS events_start_time")
+        conn.execute("DROP INDEX IF EXISTS events_calendar_name")
+        conn.execute("ALTER TABLE events RENAME TO single_events")
+
+
+def _series_instances_sql(where="TRUE"):
+    """
+    Espande le serie di event_series (filtrate con `where`) nelle singole occorrenze, con le colonne
+    della vista events più recurring_event_id e utc_offset_minutes. Giorno, mese, settimana e ora
+    sono calcolati dall'orario locale dell'occorrenza (inizio UTC + offset), come in process_calendar_events.
+    """
+    return f"""
+        SELECT event_id, summary, calendar_name, start_time,
+               start_time + to_minutes(length_minutes) AS end_time, all_day,
+               CASE WHEN all_day THEN NULL ELSE length_minutes END AS duration_minutes,
+               dayname(local_start) AS day_of_week, weekofyear(local_start) AS week_number,
+               day(local_start) AS day, monthname(local_start) AS month, year(local_start) AS year,
+               CASE WHEN all_day THEN NULL ELSE hour(local_start) END AS hour_of_day,
+               event_category, recurring_event_id, utc_offset_minutes
+        FROM (
+            SELECT *, CAST(start_time AS TIMESTAMP) + to_minutes(utc_offset_minutes) AS local_start
+            FROM (
+                SELECT calendar_name, series_id AS recurring_event_id, summary, event_category, all_day,
+                       length_minutes, UNNEST(instance_ids) AS event_id, UNNEST(instance_starts) AS start_time,
+                       UNNEST(instance_offsets) AS utc_offset_minutes
+                FROM event_series
+                WHERE {where}
+            )
+        )
+    """
+
+
+def _events_sql(where="TRUE", series_where="TRUE"):
+    """
+    Eventi singoli e occorrenze delle serie con le colonne della vista events (di cui, senza filtri,
+    è la definizione). Le serie sono filtrate con `series_where` (sulle colonne di event_series) prima
+    di essere espanse, così solo quelle selezionate passano per UNNEST; `where` si applica agli eventi.
+    I parametri di `where` compaiono due volte: prima e dopo quelli di `series_where`.
+    """
+    series_columns = ', '.join(f'CAST({name} AS {sql_type.replace(" NOT NULL", "")}) AS {name}'
+                               for name, sql_type in EVENT_COLUMNS.items())
+    return f"""
+        SELECT {', '.join(EVENT_COLUMNS)} FROM single_events WHERE {where}
+        UNION ALL
+        SELECT {series_columns} FROM ({_series_instances_sql(series_where)}) WHERE {where}
+    """
+
+
+def has_event_series(conn):
+    """
+    True se la connessione è un database eventi (con event_series), False ad esempio
+    per la vista sul dataset parquet o sul file Arrow
+    """
+    return conn.execute(
+        "SELECT COUNT(*) FROM information_schema.tables WHERE table_name = 'event_series'"
+    ).fetchone()[0] > 0
+
+
+def _check_unique_keys(conn, pending):
+    """
+    Verifica che ogni evento appena salvato da `pending` compaia una sola volta tra single_events
+    e le occorrenze di event_series (la chiave primaria di single_events non copre le serie)
+    """
+    duplicates = conn.execute(f"""
+        SELECT calendar_name, event_id
+        FROM (
+            SELECT calendar_name, event_id FROM single_events
+            UNION ALL
+            SELECT calendar_name, UNNEST(instance_ids) AS event_id FROM event_series
+            WHERE calendar_name IN (SELECT calendar_name FROM {pending})
+        )
+        WHERE (calendar_name, event_id) IN (SELECT (calendar_name, event_id) FROM {pending})
+        GROUP BY ALL
+        HAVING COUNT(*) > 1
+        LIMIT 5
+    """).fetchall()
+    if duplicates:
+        raise ValueError(f"Eventi duplicati tra single_events ed event_series: {duplicates}")
+
+
+def _store_pending_events(conn, pending):
+    """
+    Salva gli eventi della tabella temporanea `pending`: le occorrenze di una stessa serie
+    (stesso recurringEventId) con titolo, categoria e durata uguali diventano una riga di event_series;
+    le altre, comprese le occorrenze modificate singolarmente, vanno in single_events
+    """
+    length_seconds = "(epoch(end_time) - epoch(start_time))"
+    conn.execute(f"""
+        CREATE OR REPLACE TEMP TABLE series_candidates AS
+        SELECT calendar_name, recurring_event_id, summary, event_category, all_day, length_minutes
+        FROM (
+            SELECT calendar_name, recurring_event_id, summary, event_category, all_day,
+                   CAST({length_seconds} / 60 AS INTEGER) AS length_minutes, COUNT(*) AS n_instances
+            FROM {pending}
+            WHERE recurring_event_id IS NOT NULL AND utc_offset_minutes IS NOT NULL
+              AND {length_seconds} % 60 = 0
+            GROUP BY ALL
+        )
+        WHERE n_instances >= {SERIES_MIN_INSTANCES}
+        QUALIFY row_number() OVER (
+            PARTITION BY calendar_name, recurring_event_id ORDER BY n_instances DESC, summary, event_category
+        ) = 1
+    """)
+    conn.execute(f"""
+        CREATE OR REPLACE TEMP TABLE series_members AS
+        SELECT p.calendar_name, p.event_id, p.recurring_event_id, p.start_time, p.utc_offset_minutes,
+               c.summary, c.event_category, c.all_day, c.length_minutes
+        FROM {pending} p
+        JOIN series_candidates c
+          ON p.calendar_name = c.calendar_name AND p.recurring_event_id = c.recurring_event_id
+         AND p.summary IS NOT DISTINCT FROM c.summary AND p.event_category IS NOT DISTINCT FROM c.event_category
+         AND p.all_day = c.all_day AND epoch(p.end_time) - epoch(p.start_time) = c.length_minutes * 60
+         AND p.utc_offset_minutes IS NOT NULL
+    """)
+    conn.execute("""
+        INSERT INTO event_series
+        SELECT calendar_name, recurring_event_id, any_value(summary), any_value(event_category), any_value(all_day),
+               any_value(length_minutes), list(event_id ORDER BY start_time), list(start_time ORDER BY start_time),
+               list(utc_offset_minutes ORDER BY start_time)
+        FROM series_members
+        GROUP BY calendar_name, recurring_event_id
+    """)
+    conn.execute(f"""
+        INSERT INTO single_events
+        SELECT {', '.join(EVENT_COLUMNS)} FROM {pending}
+        WHERE (calendar_name, event_id) NOT IN (SELECT (calendar_name, event_id) FROM series_members)
+    """)
+    _check_unique_keys(conn, pending)
+
+
+def event_storage_stats(conn):
+    """
+    Righe salvate (eventi singoli + serie) rispetto al numero di occorrenze della vista events
+    """
+    single_events, series, series_instances = conn.execute("""
+        SELECT (SELECT COUNT(*) FROM single_events), COUNT(*), COALESCE(SUM(len(instance_ids)), 0)
+        FROM event_series
+    """).fetchone()
+    return {
+        "single_events": single_events,
+        "series": series,
+        "series_instances": int(series_instances),
+        "stored_rows": single_events + series,
+        "events": single_events + int(series_instances),
+    }
+
+
+def _refresh_rollups(conn, affected_days=None):
+    """
+    Ricalcola le righe di rollup dei periodi che contengono i giorni in `affected_days`
+    (tabella con calendar_name e day); tutte se None
+    """
+    for grain, period in ROLLUP_GRAINS.items():
+        if affected_days is None:
+            affected = "TRUE"
+            candidates = "TRUE"
+        else:
+            affected = f"""(calendar_name, period) IN (
+                SELECT DISTINCT (calendar_name, {period}) FROM {affected_days}
+            )"""
+            candidates = f"calendar_name IN (SELECT calendar_name FROM {affected_days})"
+
+        conn.execute(f"DELETE FROM event_rollups WHERE grain = ? AND {affected}", [grain])
+        conn.execute(f"""
+            INSERT INTO event_rollups
+            SELECT ? AS grain, period, year(day), calendar_name, event_category,
+                   COUNT(*), COUNT(duration_minutes), COUNT(*) FILTER (WHERE all_day),
+                   COALESCE(SUM(duration_minutes), 0)
+            FROM (
+                SELECT *, {period} AS period
+                FROM (
+                    SELECT calendar_name, event_category, all_day, duration_minutes, {LOCAL_DAY} AS day
+                    FROM ({_events_sql(candidates, candidates)})
+                )
+            )
+            WHERE {affected}
+            GROUP BY ALL
+        """, [grain])
+
+
+def rebuild_rollups(conn):
+    """
+    Ricalcola da zero le tabelle di rollup (numero di eventi e minuti per periodo, calendario e categoria)
+    """
+    conn.execute("BEGIN TRANSACTION")
+    try:
+        _refresh_rollups(conn)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def to_store_frame(events_df):
+    """
+    Allinea un DataFrame di eventi alle colonne della tabella e allo schema compatto; gli orari
+    vengono convertiti in UTC (process_calendar_events può restituire colonne object con offset misti).
+    Per le occorrenze di eventi ricorrenti si aggiungono recurring_event_id e l'offset locale in minuti,
+    con cui upsert_events le comprime in serie.
+    """
+    frame = apply_event_schema(events_df.reindex(columns=list(EVENT_COLUMNS)))
+    recurring = events_df['recurring_event_id'] if 'recurring_event_id' in events_df \
+        else pd.Series(None, index=events_df.index, dtype=object)
+    frame['recurring_event_id'] = recurring.astype('object').where(recurring.notna(), None)
+    if 'utc_offset_minutes' in events_df:
+        # Frame già allineato (ad es. dai blocchi della pipeline in streaming): gli orari sono già in UTC
+        frame['utc_offset_minutes'] = events_df['utc_offset_minutes'].astype('Int16')
+    else:
+        frame['utc_offset_minutes'] = _utc_offset_minutes(events_df['start_time'].where(recurring.notna()))
+    return frame.sort_values('start_time')
+
+
+def _utc_offset_minutes(start_time):
+    """
+    Offset (in minuti) dell'orario riportato dall'API rispetto a UTC; 0 per gli eventi di tutto il giorno
+    """
+    if isinstance(start_time.dtype, pd.DatetimeTZDtype):
+        local = start_time.dt.tz_localize(None)
+        utc = start_time.dt.tz_convert('UTC').dt.tz_localize(None)
+        return ((local - utc).dt.total_seconds() // 60).astype('Int16')
+    if pd.api.types.is_datetime64_dtype(start_time):
+        return pd.Series(0, index=start_time.index, dtype='Int16').where(start_time.notna())
+
+    return pd.Series([
+        pd.NA if value is None or value is pd.NaT or (isinstance(value, float) and pd.isna(value))
+        else int((value.utcoffset() or datetime.timedelta()).total_seconds() // 60)
+        for value in start_time
+    ], index=start_time.index, dtype='Int16')
+
+
+@instrumented_stage("store")
+def upsert_events(conn, events_df=None, deleted_keys=(), replace_calendars=(), sync_tokens=None, taxonomy=None,
+                  replace_time_min=None):
+    """
+    Applica in un'unica transazione le modifiche alla tabella eventi:
+    - elimina gli eventi dei calendari in `replace_calendars` (risincronizzati da zero) che finiscono
+      dopo `replace_time_min`, l'inizio della finestra risincronizzata (timeMin della richiesta):
+      lo storico precedente resta. Senza `replace_time_min` vengono eliminati tutti gli eventi del calendario
+    - elimina gli eventi cancellati, identificati da (calendar_name, event_id) in `deleted_keys`
+    - inserisce o sostituisce gli eventi di `events_df`; le occorrenze di eventi ricorrenti
+      (colonna recurring_event_id) sono salvate una sola volta per serie in event_series.
+      `events_df` può essere anche una tabella Arrow con lo schema event_parsing.STORE_ARROW_SCHEMA,
+      letta da DuckDB senza copie
+    - salva gli eventuali nuovi `sync_tokens` (calendar_id -> nextSyncToken)
+    - aggiorna le tabelle di rollup solo per i periodi toccati dalle modifiche
+    - registra `taxonomy` (le categorie usate per classificare gli eventi) se il database non ne ha ancora una:
+      i cambi di tassonomia successivi si applicano con reclassify_store_events
+    """
+    conn.execute("BEGIN TRANSACTION")
+    try:
+        # Giorni (per calendario) in cui cadono gli eventi modificati, prima e dopo l'aggiornamento
+        conn.execute("CREATE OR REPLACE TEMP TABLE affected_days (calendar_name VARCHAR, day DATE)")
+        # Eventi da salvare: i nuovi più le occorrenze delle serie toccate dalle modifiche, da ricomprimere
+        pending_columns = ",\n".join(f"{name} {sql_type.replace(' NOT NULL', '')}"
+                                      for name, sql_type in {**EVENT_COLUMNS, **SERIES_COLUMNS}.items())
+        conn.execute(f"CREATE OR REPLACE TEMP TABLE pending_events ({pending_columns})")
+
+        has_events = events_df is not None and len(events_df)
+        if has_events:
+            conn.register('new_events', events_df if isinstance(events_df, pa.Table) else to_store_frame(events_df))
+            add_rows(len(events_df))
+
+        if replace_calendars:
+            calendars = "calendar_name IN (SELECT UNNEST(?))"
+            replaced, replaced_params = calendars, [list(replace_calendars)]
+            if replace_time_min is not None:
+                replaced += " AND end_time > CAST(? AS TIMESTAMPTZ)"
+                replaced_params.append(replace_time_min)
+
+            conn.execute(f"INSERT INTO affected_days SELECT DISTINCT calendar_name, {LOCAL_DAY} "
+                         f"FROM ({_events_sql(replaced, calendars)})",
+                         [*replaced_params, list(replace_calendars), *replaced_params])
+            conn.execute(f"DELETE FROM single_events WHERE {replaced}", replaced_params)
+            # Le serie dei calendari risincronizzati vengono espanse: le occorrenze precedenti alla finestra
+            # restano in pending_events e sono ricompresse con i nuovi eventi
+            conn.execute(f"INSERT INTO pending_events {_series_instances_sql(calendars)}", [list(replace_calendars)])
+            conn.execute(f"DELETE FROM event_series WHERE {calendars}", [list(replace_calendars)])
+            conn.execute(f"DELETE FROM pending_events WHERE {replaced}", replaced_params)
+
+        # Eventi modificati: i cancellati più i nuovi, le cui chiavi sono lette direttamente da new_events
+        key_queries = []
+        deleted_keys = list(deleted_keys)
+        if deleted_keys:
+            conn.register('deleted_keys', pd.DataFrame(deleted_keys, columns=['calendar_name', 'event_id']))
+            key_queries.append("SELECT calendar_name, event_id FROM deleted_keys")
+        if has_events:
+            key_queries.append("SELECT calendar_name, event_id FROM new_events")
+
+        if key_queries:
+            conn.execute(f"CREATE OR REPLACE TEMP TABLE changed_keys AS {' UNION ALL '.join(key_queries)}")
+            changed = "(calendar_name, event_id) IN (SELECT (calendar_name, event_id) FROM changed_keys)"
+            conn.execute(f"""
+                INSERT INTO affected_days
+                SELECT DISTINCT calendar_name, {LOCAL_DAY}
+                FROM ({_events_sql(changed, "calendar_name IN (SELECT calendar_name FROM changed_keys)")})
+            """)
+
+            # Serie che contengono un evento modificato o a cui appartiene un nuovo evento
+            new_series = """
+                UNION SELECT calendar_name, recurring_event_id FROM new_events WHERE recurring_event_id IS NOT NULL
+            """ if has_events else ""
+            conn.execute(f"""
+                CREATE OR REPLACE TEMP TABLE touched_series AS
+                SELECT DISTINCT calendar_name, series_id
+                FROM (SELECT calendar_name, series_id, UNNEST(instance_ids) AS event_id FROM event_series)
+                WHERE (calendar_name, event_id) IN (SELECT (calendar_name, event_id) FROM changed_keys)
+                {new_series}
+            """)
+            touched = "(calendar_name, series_id) IN (SELECT (calendar_name, series_id) FROM touched_series)"
+            conn.execute(f"INSERT INTO pending_events {_series_instances_sql(touched)}")
+            conn.execute(f"DELETE FROM event_series WHERE {touched}")
+
+            for table in ['single_events', 'pending_events']:
+                conn.execute(f"DELETE FROM {table} WHERE {changed}")
+            conn.execute("DROP TABLE changed_keys")
+            if deleted_keys:
+                conn.unregister('deleted_keys')
+
+        if has_events:
+            conn.execute(f"""
+                INSERT INTO pending_events SELECT {', '.join({**EVENT_COLUMNS, **SERIES_COLUMNS})} FROM new_events
+            """)
+            conn.execute(f"INSERT INTO affected_days SELECT DISTINCT calendar_name, {LOCAL_DAY} FROM new_events")
+            conn.unregister('new_events')
+
+        _store_pending_events(conn, 'pending_events')
+
+        _refresh_rollups(conn, 'affected_days')
+
+        if sync_tokens:
+            conn.executemany("INSERT OR REPLACE INTO sync_state VALUES (?, ?)", list(sync_tokens.items()))
+
+        if taxonomy is not None and load_store_taxonomy(conn) is None:
+            save_store_taxonomy(conn, taxonomy)
+
+        conn.execute("UPDATE data_version SET version = version + 1")
+
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def load_store_sync_tokens(conn):
+    """
+    nextSyncToken salvati insieme agli eventi (calendar_id -> token)
+    """
+    return dict(conn.execute("SELECT calendar_id, sync_token FROM sync_state").fetchall())
+
+
+def load_store_taxonomy(conn):
+    """
+    Categorie dell'ultima versione della tassonomia registrata, None se non ce ne sono
+    """
+    row = conn.execute("SELECT categories FROM taxonomy_versions ORDER BY version DESC LIMIT 1").fetchone()
+    return row[0] if row is not None else None
+
+
+def save_store_taxonomy(conn, categories):
+    """
+    Registra `categories` come nuova versione della tassonomia (se diversa dall'ultima)
+
+    :return: numero della versione attuale
+    """
+    current = load_store_taxonomy(conn)
+    version = conn.execute("SELECT COALESCE(MAX(version), 0) FROM taxonomy_versions").fetchone()[0]
+    if current is not None and sorted(current) == sorted(categories):
+        return version
+
+    conn.execute("INSERT INTO taxonomy_versions VALUES (?, ?, ?)",
+                 [version + 1, list(categories), datetime.datetime.now(datetime.timezone.utc)])
+    return version + 1
+
+
+def update_event_categories(conn, summary_categories, calendars=None, taxonomy=None):
+    """
+    Sostituisce in un'unica transazione la categoria degli eventi salvati con i titoli indicati
+    (titolo -> nuova categoria, None per togliere la categoria), nei soli calendari `calendars`
+    (tutti se None), aggiornando le serie ricorrenti e le righe di rollup dei periodi toccati.
+    Con `taxonomy` registra anche la nuova versione della tassonomia.
+
+    :return: numero di eventi (occorrenze) la cui categoria è cambiata
+    """
+    where, params = event_filters(calendars=calendars)
+    events, events_params = filtered_events_sql(conn, calendars=calendars)
+    labels = pd.DataFrame({"summary": list(summary_categories), "category": list(summary_categories.values())},
+                          columns=["summary", "category"]).astype({"summary": object, "category": object})
+
+    conn.execute("BEGIN TRANSACTION")
+    try:
+        conn.register('new_labels', labels)
+        changed = f"""
+            FROM {events} JOIN new_labels ON events.summary = new_labels.summary
+            WHERE events.event_category IS DISTINCT FROM new_labels.category
+        """
+        conn.execute(f"""
+            CREATE OR REPLACE TEMP TABLE affected_days AS
+            SELECT DISTINCT calendar_name, {LOCAL_DAY} AS day {changed}
+        """, events_params)
+        updated = conn.execute(f"SELECT COUNT(*) {changed}", events_params).fetchone()[0]
+
+        for table in ['single_events', 'event_series']:
+            conn.execute(f"""
+                UPDATE {table} SET event_category = new_labels.category
+                FROM new_labels
+                WHERE {table}.summary = new_labels.summary
+                  AND {table}.event_category IS DISTINCT FROM new_labels.category AND {where}
+            """, params)
+        conn.unregister('new_labels')
+
+        _refresh_rollups(conn, 'affected_days')
+        if taxonomy is not None:
+            save_store_taxonomy(conn, taxonomy)
+        conn.execute("UPDATE data_version SET version = version + 1")
+
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+    return updated
+
+
+def store_data_version(conn):
+    """
+    Versione corrente dei dati del database (cambia a ogni upsert_events)
+    """
+    return conn.execute("SELECT version FROM data_version").fetchone()[0]
+
+
+def store_identity(conn):
+    """
+    Identificativo del database, generato alla sua creazione (lo snapshot pubblicato ha quello del database
+    da cui è copiato): insieme a store_data_version forma la chiave delle cache della dashboard
+    """
+    return conn.execute("SELECT store_id FROM data_version").fetchone()[0]
+
+
+def event_filters(year=None, calendars=None, start=None, end=None):
+    """
+    Condizione WHERE (con i relativi parametri posizionali) per i filtri sugli eventi.
+
+    :param year: anno degli eventi
+    :param calendars: lista di nomi di calendario
+    :param start: inizio (incluso) dell'intervallo su start_time
+    :param end: fine (esclusa) dell'intervallo su start_time
+    :return: (condizione SQL, lista di parametri); la condizione è 'TRUE' senza filtri
+    """
+    conditions = []
+    params = []
+
+    if year is not None:
+        conditions.append("year = ?")
+        params.append(int(year))
+    if calendars is not None:
+        conditions.append("calendar_name IN (SELECT UNNEST(?))")
+        params.append(list(calendars))
+    if start is not None:
+        conditions.append("start_time >= ?")
+        params.append(pd.Timestamp(start).to_pydatetime())
+    if end is not None:
+        conditions.append("start_time < ?")
+        params.append(pd.Timestamp(end).to_pydatetime())
+
+    return " AND ".join(conditions) or "TRUE", params
+
+
+def series_filters(year=None, calendars=None, start=None, end=None):
+    """
+    Condizione WHERE (con i parametri) sulle righe di event_series che possono contenere occorrenze
+    selezionate dai filtri di event_filters: calendario e intervallo tra la prima e l'ultima occorrenza
+    (per l'anno, locale, con un giorno di margine per il fuso orario)
+    """
+    conditions = []
+    params = []
+
+    if calendars is not None:
+        conditions.append("calendar_name IN (SELECT UNNEST(?))")
+        params.append(list(calendars))
+    # Le occorrenze di ogni serie sono ordinate per inizio: bastano la prima e l'ultima
+    bounds = []
+    if year is not None:
+        bounds.append((pd.Timestamp(int(year), 1, 1, tz='UTC') - pd.Timedelta(days=1),
+                       pd.Timestamp(int(year) + 1, 1, 1, tz='UTC') + pd.Timedelta(days=1)))
+    if start is not None or end is not None:
+        bounds.append((start, end))
+    for first, last in bounds:
+        if first is not None:
+            conditions.append("instance_starts[-1] >= ?")
+            params.append(pd.Timestamp(first).to_pydatetime())
+        if last is not None:
+            conditions.append("instance_starts[1] < ?")
+            params.append(pd.Timestamp(last).to_pydatetime())
+
+    return " AND ".join(conditions) or "TRUE", params
+
+
+def filtered_events_sql(conn, year=None, calendars=None, start=None, end=None):
+    """
+    Sorgente della clausola FROM (alias `events`) con gli eventi filtrati come in event_filters, e i suoi parametri.
+    Nel database eventi le serie vengono filtrate prima di espanderle (vedi series_filters), invece
+    di espanderle tutte come nella vista events; sulle altre connessioni è la vista events filtrata.
+    """
+    where, params = event_filters(year, calendars, start, end)
+    if not has_event_series(conn):
+        return f"(SELECT * FROM events WHERE {where}) AS events", params
+
+    series_where, series_params = series_filters(year, calendars, start, end)
+    return f"({_events_sql(where, series_where)}) AS events", [*params, *series_params, *params]
+
+
+def query_events(conn, year=None, calendars=None, start=None, end=None, columns=None):
+    """
+    Legge dal database solo gli eventi e le colonne richiesti (filtri come in `event_filters`),
+    con lo schema compatto di event_schema.EVENT_DTYPES.
+
+    :param columns: colonne da restituire (tutte se None)
+    """
+    events, params = filtered_events_sql(conn, year, calendars, start, end)
+    select = ", ".join(columns) if columns else "*"
+
+    return apply_event_schema(
+        conn.execute(f"SELECT {select} FROM {events} ORDER BY start_time", params).df()
+    )
+
+
+def query_events_page(conn, year=None, calendars=None, columns=None, sort_by="start_time", descending=False,
+                      offset=0, limit=EVENTS_PAGE_SIZE):
+    """
+    Una pagina degli eventi filtrati (filtri come in `event_filters`), ordinata nel database:
+    a chi la mostra arrivano al massimo `limit` righe e solo le colonne richieste.
+
+    :param columns: colonne da restituire (tutte se None)
+    :param sort_by: colonna di ordinamento (a parità di valore, l'ordine è per calendario e id)
+    :return: (DataFrame della pagina, numero totale di eventi filtrati)
+    """
+    columns = list(columns) if columns else list(EVENT_COLUMNS)
+    for column in [*columns, sort_by]:
+        if column not in EVENT_COLUMNS:
+            raise ValueError(f"Colonna sconosciuta: {column}")
+
+    events, params = filtered_events_sql(conn, year, calendars)
+    total = conn.execute(f"SELECT COUNT(*) FROM {events}", params).fetchone()[0]
+    order = "DESC" if descending else "ASC"
+    page = conn.execute(f"""
+        SELECT {', '.join(columns)} FROM {events}
+        ORDER BY {sort_by} {order} NULLS LAST, calendar_name, event_id
+        LIMIT ? OFFSET ?
+    """, [*params, int(limit), int(offset)]).df()
+
+    return apply_event_schema(page), total
+
+
+def list_years(conn):
+    return [row[0] for row in conn.execute("SELECT DISTINCT year FROM events ORDER BY year").fetchall()]
+
+
+def list_calendars(conn):
+    return [row[0] for row in
+            conn.execute("SELECT DISTINCT calendar_name FROM events ORDER BY calendar_name").fetchall()]
+
+
+def import_parquet_snapshot(conn, file_path):
+    """
+    Importa nel database uno snapshot parquet creato dalla versione precedente di create_calendar_db.py
+    """
+    upsert_events(conn, pd.read_parquet(file_path))
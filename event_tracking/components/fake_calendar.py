@@ -0,0 +1,169 @@
+import datetime
+import time
+import threading
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+
+class _FakeRequest:
+    def __init__(self, fn):
+        self._fn = fn
+
+    def execute(self):
+        return self._fn()
+
+
+class _FakeCalendarList:
+    def __init__(self, service):
+        self._service = service
+
+    def list(self):
+        return _FakeRequest(lambda: {"items": self._service.calendars})
+
+
+class _FakeEvents:
+    def __init__(self, service):
+        self._service = service
+
+    def list(self, **kwargs):
+        return _FakeRequest(lambda: self._service.list_events(**kwargs))
+
+
+class FakeCalendarService:
+    """
+    Finto `service` di Google Calendar, senza rete né credenziali: supporta calendarList().list()
+    e events().list() con paginazione (pageToken) e sincronizzazione incrementale (syncToken).
+    `latency` simula il tempo di risposta di ogni pagina, `fail_next` gli errori HTTP transitori.
+    Con `filter_time_min` la sincronizzazione completa restituisce, come l'API, solo gli eventi che
+    finiscono dopo timeMin (di default il filtro è ignorato: gli eventi dei test hanno date fisse).
+    Si può passare a fetch_calendar_events / fetch_calendar_events_incremental come `service`.
+    """
+
+    def __init__(self, calendars, page_size=250, latency=0.0, filter_time_min=False):
+        self.calendars = [{"id": cal_id, "summary": name} for cal_id, name in calendars]
+        self.page_size = page_size
+        self.calendar_events = {cal_id: {} for cal_id, _ in calendars}
+        self.changes = {cal_id: [] for cal_id, _ in calendars}
+        self.version = 0
+        self.sync_tokens_expired = False
+        self.latency = latency
+        self.filter_time_min = filter_time_min
+        self.failures = []
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        # Eventi elencati per (calendario, syncToken), ricalcolati solo se il calendario è cambiato:
+        # senza, ogni pagina ricopierebbe tutti gli eventi del calendario
+        self._listings = {}
+
+    def calendarList(self):
+        return _FakeCalendarList(self)
+
+    def events(self):
+        return _FakeEvents(self)
+
+    def upsert(self, calendar_id, event):
+        self.version += 1
+        self.calendar_events[calendar_id][event["id"]] = event
+        self.changes[calendar_id].append((self.version, event))
+
+    def cancel(self, calendar_id, event_id):
+        self.version += 1
+        del self.calendar_events[calendar_id][event_id]
+        self.changes[calendar_id].append((self.version, {"id": event_id, "status": "cancelled"}))
+
+    def expire_sync_tokens(self):
+        self.sync_tokens_expired = True
+
+    def fail_next(self, status, times=1):
+        self.failures.extend([status] * times)
+
+    def list_events(self, **kwargs):
+        with self._lock:
+            self.calls.append(kwargs)
+            failure = self.failures.pop(0) if self.failures else None
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+        try:
+            time.sleep(self.latency)
+            if failure is not None:
+                raise HttpError(httplib2.Response({"status": failure}), b"Fake error")
+            return self._list_events(**kwargs)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def _list_events(self, calendarId, pageToken=None, syncToken=None, timeMin=None, **kwargs):
+        if syncToken is not None and self.sync_tokens_expired:
+            raise HttpError(httplib2.Response({"status": 410}), b"Sync token is no longer valid")
+        if not self.filter_time_min:
+            timeMin = None
+
+        with self._lock:
+            version, items = self._listings.get((calendarId, syncToken, timeMin), (None, None))
+            if version != self.version:
+                items = self._list_items(calendarId, syncToken, timeMin)
+                self._listings[(calendarId, syncToken, timeMin)] = (self.version, items)
+
+        start = int(pageToken or 0)
+        page = items[start:start + self.page_size]
+        result = {"items": [dict(event) for event in page]}
+        if start + self.page_size < len(items):
+            result["nextPageToken"] = str(start + self.page_size)
+        else:
+            result["nextSyncToken"] = str(self.version)
+        return result
+
+    def _list_items(self, calendarId, syncToken, timeMin=None):
+        if syncToken is not None:
+            since = int(syncToken)
+            latest = {}
+            for version, event in self.changes[calendarId]:
+                if version > since:
+                    latest[event["id"]] = event
+            return list(latest.values())
+
+        events = list(self.calendar_events[calendarId].values())
+        if timeMin is not None:
+            time_min = _parse_time(timeMin)
+            events = [event for event in events
+                      if _parse_time(event["end"].get("dateTime") or event["end"]["date"]) > time_min]
+        return events
+
+
+def _parse_time(value):
+    # Orario RFC3339 o data ('YYYY-MM-DD', trattata come mezzanotte UTC) come datetime con fuso
+    parsed = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo is not None else parsed.replace(tzinfo=datetime.timezone.utc)
+
+
+def make_event(event_id, summary, start, end):
+    return {
+        "id": event_id,
+        "summary": summary,
+        "start": {"dateTime": start},
+        "end": {"dateTime": end},
+    }
+
+
+def calendar_id(calendar_name):
+    return calendar_name.lower().replace(" ", "-") + "@group.calendar.google.com"
+
+
+def build_fake_calendar_service(events, page_size=250, latency=0.0):
+    """
+    Crea un FakeCalendarService che contiene gli eventi indicati (ad es. da generate_calendar_events),
+    con un calendario per ogni `calendar_name`
+    """
+    names = list(dict.fromkeys(event["calendar_name"] for event in events))
+    service = FakeCalendarService([(calendar_id(name), name) for name in names], page_size, latency)
+
+    for event in events:
+        payload = {key: value for key, value in event.items() if key != "calendar_name"}
+        service.calendar_events[calendar_id(event["calendar_name"])][payload["id"]] = payload
+    service.version = 1
+
+    return service
@@ -0,0 +1,150 @@
+import re
+import json
+import time
+import threading
+from types import SimpleNamespace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from event_tracking.components.classification import estimate_tokens
+
+# Risposta del finto modello alle domande della chat di analisi del tempo
+FAKE_ANALYSIS_ANSWER = "Analisi simulata: la maggior parte del tempo è stata dedicata alle categorie principali."
+
+
+def prompt_texts(prompt):
+    """
+    Estrae i testi numerati da classificare dal prompt di classify_batch_openai_api
+    """
+    section = prompt.split("preceduto dal numero):")[1].split("Rispondi fornendo")[0]
+    return re.findall(r"^\d+\. (.*)$", section, flags=re.MULTILINE)
+
+
+def prompt_categories(prompt):
+    """
+    Estrae le categorie elencate nel prompt di classify_batch_openai_api
+    """
+    section = prompt.split("delle categorie seguenti:")[1].strip().splitlines()[0]
+    return [category.strip() for category in section.split(",")]
+
+
+def is_classification_prompt(prompt):
+    return "preceduto dal numero):" in prompt
+
+
+class FakeChatModel:
+    """
+    Finto modello compatibile con ChatOpenAI.invoke e stream: classifica ogni testo del prompt
+    con la prima categoria contenuta nel testo, altrimenti con 'other'. Agli altri prompt
+    (chat di analisi) risponde con FAKE_ANALYSIS_ANSWER.
+
+    :param categories: categorie possibili (None: quelle elencate nel prompt)
+    :param latency: secondi di attesa per ogni chiamata
+    :param token_latency: secondi di attesa per ogni token stimato del prompt (simula un modello su CPU)
+    :param fail_calls: numeri delle chiamate (da 0) che sollevano un errore
+    :param drop_texts: testi omessi dalla risposta (dizionario testo -> numero di volte)
+    """
+
+    model_name = "fake-chat-model"
+
+    def __init__(self, categories=None, latency=0.0, token_latency=0.0, fail_calls=(), drop_texts=None):
+        self.categories = categories
+        self.latency = latency
+        self.token_latency = token_latency
+        self.fail_calls = set(fail_calls)
+        self.drop_texts = dict(drop_texts or {})
+        self.prompts = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def classify(self, text, categories=None):
+        categories = categories or self.categories
+        return next((category for category in categories if category in text.lower()), "other")
+
+    def invoke(self, prompt):
+        with self._lock:
+            call_number = len(self.prompts)
+            self.prompts.append(prompt)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+        try:
+            time.sleep(self.latency + self.token_latency * estimate_tokens(prompt))
+            if call_number in self.fail_calls:
+                raise RuntimeError("Fake LLM error")
+
+            if not is_classification_prompt(prompt):
+                return SimpleNamespace(content=FAKE_ANALYSIS_ANSWER)
+
+            categories = self.categories or prompt_categories(prompt)
+            lines = []
+            for i, text in enumerate(prompt_texts(prompt)):
+                with self._lock:
+                    if self.drop_texts.get(text, 0) > 0:
+                        self.drop_texts[text] -= 1
+                        continue
+                lines.append(f"{i + 1}. {self.classify(text, categories)}")
+            return SimpleNamespace(content="\n".join(lines))
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def stream(self, prompt):
+        # La risposta completa divisa in parole, come i pezzi inviati da un modello in streaming
+        for word in re.findall(r"\S+\s*", self.invoke(prompt).content):
+            yield SimpleNamespace(content=word)
+
+    @property
+    def classified_texts(self):
+        return [text for prompt in self.prompts if is_classification_prompt(prompt) for text in prompt_texts(prompt)]
+
+
+def start_fake_llm_server(model=None, host="127.0.0.1", port=0):
+    """
+    Avvia in un thread un server HTTP con l'API /v1/chat/completions compatibile OpenAI
+    (quella esposta da Ollama e dal server di llama.cpp) che risponde con `model`, per provare
+    il backend "local" senza un modello installato. Chiudere con server.shutdown().
+
+    :return: (server, base_url da passare a create_llm_backend)
+    """
+    model = model or FakeChatModel()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            prompt = request["messages"][-1]["content"]
+            content = model.invoke(prompt).content
+            usage = {"prompt_tokens": estimate_tokens(prompt), "completion_tokens": estimate_tokens(content)}
+            usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+            base = {"id": "fake", "created": 0, "model": request["model"]}
+
+            if not request.get("stream"):
+                self._send("application/json", json.dumps({
+                    **base, "object": "chat.completion", "usage": usage,
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": content}}],
+                }))
+                return
+
+            events = [{**base, "object": "chat.completion.chunk",
+                       "choices": [{"index": 0, "delta": {"content": word}, "finish_reason": None}]}
+                      for word in re.findall(r"\S+\s*", content)]
+            events.append({**base, "object": "chat.completion.chunk", "usage": usage,
+                           "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+            self._send("text/event-stream",
+                       "".join(f"data: {json.dumps(event)}\n\n" for event in events) + "data: [DONE]\n\n")
+
+        def _send(self, content_type, body):
+            body = body.encode()
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
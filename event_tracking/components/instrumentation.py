@@ -0,0 +1,316 @@
+import os
+import sys
+import json
+import time
+import cProfile
+import datetime
+import functools
+import threading
+import tracemalloc
+import contextvars
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    # Modulo solo Unix: su Windows il picco di memoria viene da tracemalloc, se attivo
+    resource = None
+
+from event_tracking.config import PATH_PIPELINE_METRICS, PATH_PROFILES, PROFILE_STAGES, PROFILER
+
+# Strumentazione della pipeline: durata, righe e memoria di ogni fase (fetch, process, categorize,
+# store, publish, dashboard) e contatori (pagine e tentativi API, chiamate e token LLM, cache).
+# Le misure sono raccolte solo dentro pipeline_run: fuori da un'esecuzione fasi e contatori non fanno nulla.
+
+# Esecuzione attiva e fasi aperte (dalla più esterna) nel contesto corrente: ogni thread ha il proprio,
+# quindi esecuzioni concorrenti (ad esempio due sessioni della dashboard) non si mescolano.
+# I pool di thread della pipeline ricevono il contesto di chi li usa con in_current_context.
+_context = contextvars.ContextVar("pipeline_run", default=(None, ()))
+_lock = threading.Lock()
+
+
+def _max_rss_bytes():
+    """
+    Picco di memoria del processo in byte. Senza il modulo resource (Windows) è il picco della memoria
+    allocata da Python, se tracemalloc è attivo (ad es. con PYTHONTRACEMALLOC=1); altrimenti None
+    """
+    if resource is not None:
+        # ru_maxrss è in kilobyte su Linux e in byte su macOS
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return max_rss if sys.platform == "darwin" else max_rss * 1024
+    if tracemalloc.is_tracing():
+        return tracemalloc.get_traced_memory()[1]
+    return None
+
+
+def _megabytes(value):
+    return None if value is None else value / 2 ** 20
+
+
+class PipelineRun:
+    """
+    Misure di un'esecuzione della pipeline. Le fasi con lo stesso nome (ad esempio i blocchi
+    della pipeline in streaming) sono sommate; le fasi annidate sono misurate ciascuna per intero.
+    """
+
+    def __init__(self, name, profile_stages=(), profiler="cprofile", profiles_dir=PATH_PROFILES):
+        self.name = name
+        self.run_id = f"{datetime.datetime.now():%Y%m%dT%H%M%S}-{os.getpid()}"
+        self.profile_stages = set(profile_stages)
+        self.profiler = profiler
+        self.profiles_dir = profiles_dir
+        self.started_at = datetime.datetime.now(datetime.timezone.utc)
+        self.counters = {}
+        self.stages = {}
+        self._profiling = False
+        self._started = time.perf_counter()
+        self._seconds = None
+
+    def increment(self, counter, value=1, record=None):
+        """
+        Incrementa un contatore dell'esecuzione e, se indicata, della fase `record` (vedi stage)
+        """
+        with _lock:
+            self.counters[counter] = self.counters.get(counter, 0) + value
+            if record is not None:
+                record["counters"][counter] = record["counters"].get(counter, 0) + value
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Misura la fase `name`, che diventa la fase in corso nel contesto corrente
+        """
+        record = {"name": name, "rows": 0, "counters": {}}
+        rss_before = _max_rss_bytes()
+        run, open_stages = _context.get()
+        token = _context.set((self, open_stages + (record,)))
+
+        profiler = self._start_profiler(name)
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            seconds = time.perf_counter() - started
+            if profiler is not None:
+                self._stop_profiler(name, profiler)
+            _context.reset(token)
+
+            with _lock:
+                total = self.stages.setdefault(name, {"calls": 0, "seconds": 0.0, "rows": 0,
+                                                      "rss_growth_mb": 0.0, "counters": {}})
+                total["calls"] += 1
+                total["seconds"] += seconds
+                total["rows"] += record["rows"]
+                rss_after = _max_rss_bytes()
+                if rss_after is not None and rss_before is not None:
+                    total["rss_growth_mb"] += _megabytes(rss_after - rss_before)
+                total["max_rss_mb"] = _megabytes(rss_after)
+                total["rows_per_second"] = total["rows"] / total["seconds"] if total["seconds"] else 0.0
+                for counter, value in record["counters"].items():
+                    total["counters"][counter] = total["counters"].get(counter, 0) + value
+
+    def _start_profiler(self, name):
+        if self._profiling or not (name in self.profile_stages or "all" in self.profile_stages):
+            return None
+
+        self._profiling = True
+        if self.profiler == "pyinstrument":
+            try:
+                from pyinstrument import Profiler
+            except ImportError:
+                print("pyinstrument non installato, profilazione con cProfile")
+            else:
+                profiler = Profiler()
+                profiler.start()
+                return profiler
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+
+    def _stop_profiler(self, name, profiler):
+        self._profiling = False
+        os.makedirs(self.profiles_dir, exist_ok=True)
+        path = os.path.join(self.profiles_dir, f"{self.name}_{self.run_id}_{name}")
+
+        if isinstance(profiler, cProfile.Profile):
+            profiler.disable()
+            profiler.dump_stats(f"{path}.prof")
+            print(f"Profilo della fase {name}: {path}.prof")
+        else:
+            profiler.stop()
+            with open(f"{path}.html", "w") as f:
+                f.write(profiler.output_html())
+            print(f"Profilo della fase {name}: {path}.html")
+
+    def finish(self):
+        self._seconds = time.perf_counter() - self._started
+
+    def summary(self):
+        """
+        :return: dizionario serializzabile in JSON con durata totale, contatori, fasi e tassi derivati
+        """
+        with _lock:
+            counters = dict(self.counters)
+            stages = json.loads(json.dumps(self.stages))
+
+        summary = {
+            "run": self.name,
+            "run_id": self.run_id,
+            "started_at": self.started_at.isoformat(),
+            "seconds": self._seconds if self._seconds is not None else time.perf_counter() - self._started,
+            "max_rss_mb": _megabytes(_max_rss_bytes()),
+            "counters": counters,
+            "stages": stages,
+        }
+        titles = counters.get("classification_titles", 0)
+        if titles:
+            summary["classification_cache_hit_rate"] = counters.get("classification_cache_hits", 0) / titles
+        return summary
+
+
+def current_run():
+    """
+    Esecuzione attiva nel contesto corrente (l'ultima aperta con pipeline_run), None se non ce ne sono
+    """
+    return _context.get()[0]
+
+
+def increment(counter, value=1):
+    """
+    Incrementa un contatore dell'esecuzione attiva (e della fase in corso)
+    """
+    run, open_stages = _context.get()
+    if run is not None:
+        run.increment(counter, value, open_stages[-1] if open_stages else None)
+
+
+def add_rows(rows):
+    """
+    Aggiunge `rows` alle righe elaborate dalla fase in corso
+    """
+    run, open_stages = _context.get()
+    if run is not None and open_stages:
+        with _lock:
+            open_stages[-1]["rows"] += rows
+
+
+def in_current_context(fn):
+    """
+    `fn` eseguita, a ogni chiamata, in una copia del contesto in cui è stata creata: passata a
+    executor.map, le misure dei thread del pool vanno all'esecuzione e alla fase del chiamante
+    """
+    context = contextvars.copy_context()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        return context.copy().run(fn, *args, **kwargs)
+    return wrapper
+
+
+@contextmanager
+def stage(name):
+    """
+    Misura la fase `name` dell'esecuzione attiva (senza esecuzione attiva non misura nulla)
+    """
+    run = current_run()
+    if run is None:
+        yield {}
+        return
+
+    with run.stage(name) as record:
+        yield record
+
+
+def instrumented_stage(name):
+    """
+    Decoratore: ogni chiamata della funzione è misurata come fase `name`
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def pipeline_run(name, metrics_path=PATH_PIPELINE_METRICS, prometheus_path=None, profile_stages=PROFILE_STAGES,
+                 profiler=PROFILER):
+    """
+    Raccoglie le misure delle fasi eseguite nel blocco e alla fine le aggiunge come una riga JSON
+    a `metrics_path` e, se indicato, le scrive in formato testo Prometheus in `prometheus_path`
+    (ad esempio per il textfile collector di node_exporter). Con `metrics_path=None` non scrive nulla.
+
+    :param profile_stages: fasi da profilare ("all" per tutte), con cProfile (file .prof)
+                           o pyinstrument (file .html) secondo `profiler`
+    """
+    run = PipelineRun(name, profile_stages, profiler)
+    token = _context.set((run, ()))
+    try:
+        yield run
+    finally:
+        run.finish()
+        _context.reset(token)
+
+        summary = run.summary()
+        if metrics_path is not None:
+            write_metrics_jsonl(summary, metrics_path)
+        if prometheus_path is not None:
+            write_prometheus_metrics(summary, prometheus_path)
+
+
+def write_metrics_jsonl(summary, path=PATH_PIPELINE_METRICS):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a") as f:
+        f.write(json.dumps(summary) + "\n")
+
+
+def read_metrics_jsonl(path=PATH_PIPELINE_METRICS):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def prometheus_metrics(summary):
+    """
+    Misure di un'esecuzione nel formato testo di Prometheus
+    """
+    run = _prometheus_label_value(summary["run"])
+    samples = {
+        "event_tracking_run_seconds": [(f'run="{run}"', summary["seconds"])],
+        "event_tracking_run_timestamp_seconds":
+            [(f'run="{run}"', datetime.datetime.fromisoformat(summary["started_at"]).timestamp())],
+    }
+    if summary["max_rss_mb"] is not None:
+        samples["event_tracking_run_max_rss_bytes"] = [(f'run="{run}"', summary["max_rss_mb"] * 2 ** 20)]
+    if "classification_cache_hit_rate" in summary:
+        samples["event_tracking_classification_cache_hit_ratio"] = \
+            [(f'run="{run}"', summary["classification_cache_hit_rate"])]
+
+    for stage_name, values in summary["stages"].items():
+        labels = f'run="{run}",stage="{_prometheus_label_value(stage_name)}"'
+        for metric in ["seconds", "rows", "rows_per_second", "calls"]:
+            samples.setdefault(f"event_tracking_stage_{metric}", []).append((labels, values[metric]))
+
+    for counter, value in summary["counters"].items():
+        samples.setdefault(f"event_tracking_{counter}_total", []).append((f'run="{run}"', value))
+
+    lines = []
+    for metric, metric_samples in samples.items():
+        lines.append(f"# TYPE {metric} gauge")
+        lines.extend(f"{metric}{{{labels}}} {value}" for labels, value in metric_samples)
+    return "\n".join(lines) + "\n"
+
+
+def _prometheus_label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def write_prometheus_metrics(summary, path):
+    # Scrittura atomica: il collector non legge mai un file a metà
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(prometheus_metrics(summary))
+    os.replace(tmp_path, path)
@@ -0,0 +1,256 @@
+import numpy as np
+import pandas as pd
+
+from event_tracking.config import LOCAL_TIMEZONE
+
+# Analisi degli eventi come intervalli [start_time, end_time): tempo realmente occupato (sovrapposizioni
+# contate una volta), conflitti, spazi liberi e blocchi di concentrazione. Tutti gli algoritmi ordinano
+# gli intervalli e li scorrono in modo vettoriale (sort-and-sweep), quindi costano O(n log n).
+# Le durate sono calcolate sugli istanti UTC, i giorni e le settimane sono quelli dell'ora locale (LOCAL_TIMEZONE).
+
+NS_PER_MINUTE = 60 * 10 ** 9
+PERIOD_LENGTH = {
+    'day': np.int64(24 * 60 * NS_PER_MINUTE),
+    'week': np.int64(7 * 24 * 60 * NS_PER_MINUTE),
+}
+
+
+def _to_local_clock(utc_ns):
+    """Istanti UTC (ns) -> ora locale come orologio da parete (ns senza fuso)"""
+    return pd.DatetimeIndex(utc_ns.astype('datetime64[ns]'), tz='UTC').tz_convert(LOCAL_TIMEZONE) \
+        .tz_localize(None).asi8
+
+
+def _from_local_clock(clock_ns):
+    """Ora locale (ns senza fuso) -> istanti UTC (ns); gli orari saltati dall'ora legale vanno avanti"""
+    return pd.DatetimeIndex(clock_ns.astype('datetime64[ns]')) \
+        .tz_localize(LOCAL_TIMEZONE, ambiguous=np.zeros(len(clock_ns), dtype=bool), nonexistent='shift_forward').asi8
+
+
+def _to_datetime(utc_ns):
+    return pd.to_datetime(utc_ns, unit='ns', utc=True).tz_convert(LOCAL_TIMEZONE)
+
+
+def _event_intervals(df, include_all_day=False):
+    """
+    Intervalli degli eventi in nanosecondi UTC, ordinati per inizio.
+    Gli eventi di tutto il giorno sono salvati come mezzanotte UTC della data: occupano il giorno locale.
+    """
+    all_day = df['all_day'].fillna(False).astype(bool).to_numpy() if 'all_day' in df \
+        else np.zeros(len(df), dtype=bool)
+    if not include_all_day:
+        df, all_day = df.loc[~all_day], all_day[~all_day]
+
+    times = {}
+    for column in ['start_time', 'end_time']:
+        utc_ns = pd.DatetimeIndex(pd.to_datetime(df[column], utc=True)).as_unit('ns').asi8
+        times[column] = np.where(all_day, _from_local_clock(utc_ns), utc_ns) if all_day.any() else utc_ns
+
+    intervals = df.assign(start_ns=times['start_time'], end_ns=times['end_time'])
+    intervals = intervals.loc[intervals['end_ns'] > intervals['start_ns']]
+    return intervals.sort_values('start_ns', kind='stable', ignore_index=True)
+
+
+def _group_codes(intervals, by):
+    """
+    Codice intero del gruppo di ogni intervallo e DataFrame con i valori delle colonne `by` per codice
+    """
+    if not by:
+        return np.zeros(len(intervals), dtype=np.int64), pd.DataFrame(index=[0])
+
+    grouped = intervals.groupby(list(by), observed=True, sort=True, dropna=False)
+    codes = grouped.ngroup().to_numpy()
+    labels = grouped.size().reset_index()[list(by)]
+    return codes, labels
+
+
+def _sweep(starts, ends, codes, max_gap=0):
+    """
+    Unisce gli intervalli dello stesso gruppo che si sovrappongono (o distano al più `max_gap` ns).
+
+    :return: (ordine degli intervalli, indice del blocco di ogni intervallo ordinato,
+              gruppo, inizio e fine di ogni blocco)
+    """
+    order = np.lexsort((starts, codes))
+    starts, ends, codes = starts[order], ends[order], codes[order]
+
+    # Fine massima raggiunta finora nel gruppo, fino all'intervallo precedente
+    reached = pd.Series(ends).groupby(codes).cummax().to_numpy()
+    previous = np.empty_like(reached)
+    previous[1:] = reached[:-1]
+
+    new_block = np.ones(len(starts), dtype=bool)
+    new_block[1:] = (codes[1:] != codes[:-1]) | (starts[1:] > previous[1:] + max_gap)
+    first = np.flatnonzero(new_block)
+
+    block_ids = np.cumsum(new_block) - 1
+    block_ends = np.maximum.reduceat(ends, first) if len(first) else ends[:0]
+    return order, block_ids, codes[first], starts[first], block_ends
+
+
+def merge_intervals(starts, ends, codes=None, max_gap=0):
+    """
+    Unione di intervalli [start, end) (array numerici, ad es. nanosecondi), separatamente per `codes`.
+
+    :return: (codici, inizi, fini) degli intervalli uniti, ordinati per codice e inizio
+    """
+    starts, ends = np.asarray(starts), np.asarray(ends)
+    codes = np.zeros(len(starts), dtype=np.int64) if codes is None else np.asarray(codes)
+    _, _, block_codes, block_starts, block_ends = _sweep(starts, ends, codes, max_gap)
+    return block_codes, block_starts, block_ends
+
+
+def _period_start(clock_ns, period):
+    days = clock_ns - clock_ns % PERIOD_LENGTH['day']
+    if period == 'week':
+        # Settimane ISO: 1970-01-01 era un giovedì, i lunedì sono 3 giorni dopo
+        days = days - ((days // PERIOD_LENGTH['day'] + 3) % 7) * PERIOD_LENGTH['day']
+    return days
+
+
+def _split_by_period(starts, ends, period):
+    """
+    Divide gli intervalli (ns UTC) ai confini dei periodi locali (giorni o settimane).
+
+    :return: (indice dell'intervallo originale, inizio del periodo in ora locale, inizio e fine UTC di ogni pezzo)
+    """
+    length = PERIOD_LENGTH[period]
+    first = _period_start(_to_local_clock(starts), period)
+    last = _period_start(_to_local_clock(ends - 1), period)
+    pieces = np.maximum((last - first) // length + 1, 1)
+
+    index = np.repeat(np.arange(len(starts)), pieces)
+    offset = np.arange(len(index)) - np.repeat(np.cumsum(pieces) - pieces, pieces)
+    period_starts = first[index] + offset * length
+    return index, period_starts, np.maximum(starts[index], _from_local_clock(period_starts)), \
+        np.minimum(ends[index], _from_local_clock(period_starts + length))
+
+
+def busy_time(df, period='day', by=None, include_all_day=False):
+    """
+    Minuti occupati per periodo ('day' o 'week', in ora locale) ed eventualmente per gruppo
+    (ad es. by=['calendar_name'] o ['event_category']), contando una sola volta il tempo in cui
+    più eventi si sovrappongono. Gli eventi a cavallo di due periodi sono divisi tra i due.
+
+    :return: DataFrame con le colonne di `by`, period, scheduled_minutes (somma delle durate),
+             busy_minutes (tempo realmente occupato) e overlap_minutes (differenza)
+    """
+    by = list(by or [])
+    intervals = _event_intervals(df, include_all_day)
+    codes, labels = _group_codes(intervals, by)
+    starts, ends = intervals['start_ns'].to_numpy(), intervals['end_ns'].to_numpy()
+
+    frames = {}
+    block_codes, block_starts, block_ends = merge_intervals(starts, ends, codes)
+    for name, (piece_codes, piece_starts, piece_ends) in {
+        'scheduled_minutes': (codes, starts, ends),
+        'busy_minutes': (block_codes, block_starts, block_ends),
+    }.items():
+        index, period_starts, cut_starts, cut_ends = _split_by_period(piece_starts, piece_ends, period)
+        frames[name] = pd.DataFrame({
+            'group': piece_codes[index],
+            'period': period_starts,
+            name: (cut_ends - cut_starts) / NS_PER_MINUTE,
+        }).groupby(['group', 'period'])[name].sum()
+
+    result = pd.concat(frames, axis=1).fillna(0).reset_index()
+    result['overlap_minutes'] = result['scheduled_minutes'] - result['busy_minutes']
+    result['period'] = pd.to_datetime(result['period'], unit='ns')
+    result = pd.concat([labels.iloc[result['group']].reset_index(drop=True), result.drop(columns='group')], axis=1)
+    return result.sort_values([*by, 'period'], ignore_index=True)
+
+
+def overlapping_events(df, include_all_day=False):
+    """
+    Coppie di eventi che si sovrappongono (conflitti), con inizio, fine e durata della sovrapposizione.
+    Ogni evento è confrontato solo con quelli che iniziano prima della sua fine (ricerca binaria
+    sugli inizi ordinati): il costo è O(n log n + numero di coppie).
+    """
+    intervals = _event_intervals(df, include_all_day)
+    starts, ends = intervals['start_ns'].to_numpy(), intervals['end_ns'].to_numpy()
+
+    # Gli eventi i+1 .. stop-1 iniziano dopo l'evento i ma prima della sua fine
+    stop = np.searchsorted(starts, ends, side='left')
+    counts = np.maximum(stop - np.arange(len(starts)) - 1, 0)
+    first = np.repeat(np.arange(len(starts)), counts)
+    second = first + 1 + np.arange(len(first)) - np.repeat(np.cumsum(counts) - counts, counts)
+
+    overlap_starts = starts[second]
+    overlap_ends = np.minimum(ends[first], ends[second])
+    keep = overlap_ends > overlap_starts
+    first, second = first[keep], second[keep]
+
+    columns = [column for column in ['event_id', 'summary', 'calendar_name', 'event_category'] if column in intervals]
+    pairs = pd.concat([
+        intervals[columns].iloc[first].add_suffix('_a').reset_index(drop=True),
+        intervals[columns].iloc[second].add_suffix('_b').reset_index(drop=True),
+    ], axis=1)
+    pairs['overlap_start'] = _to_datetime(overlap_starts[keep])
+    pairs['overlap_end'] = _to_datetime(overlap_ends[keep])
+    pairs['overlap_minutes'] = (overlap_ends[keep] - overlap_starts[keep]) / NS_PER_MINUTE
+    return pairs
+
+
+def free_slots(df, work_start="09:00", work_end="18:00", weekdays=(0, 1, 2, 3, 4), min_minutes=30,
+               start=None, end=None):
+    """
+    Spazi liberi (senza eventi con orario) nell'orario di lavoro dei giorni `weekdays` (0 = lunedì),
+    tra `start` ed `end` (date, di default il primo e l'ultimo giorno con eventi).
+
+    :return: DataFrame con day, slot_start, slot_end e minutes, per gli spazi di almeno `min_minutes` minuti
+    """
+    intervals = _event_intervals(df)
+    _, busy_starts, busy_ends = merge_intervals(intervals['start_ns'].to_numpy(), intervals['end_ns'].to_numpy())
+    if start is None and not len(busy_starts):
+        return pd.DataFrame(columns=['day', 'slot_start', 'slot_end', 'minutes'])
+
+    # Primo e ultimo giorno (ora locale) in cui cercare gli spazi liberi
+    day = PERIOD_LENGTH['day']
+    first_day = np.int64(pd.Timestamp(start).normalize().value) if start is not None \
+        else _period_start(_to_local_clock(busy_starts[:1]), 'day')[0]
+    last_day = np.int64(pd.Timestamp(end).normalize().value) if end is not None \
+        else _period_start(_to_local_clock(busy_ends[-1:] - 1), 'day')[0]
+    range_start, range_end = _from_local_clock(np.array([first_day, last_day + day]))
+
+    # Spazi tra un blocco occupato e il successivo, limitati all'intervallo richiesto
+    gap_starts = np.clip(np.concatenate([[range_start], busy_ends]), range_start, range_end)
+    gap_ends = np.clip(np.concatenate([busy_starts, [range_end]]), range_start, range_end)
+    keep = gap_ends > gap_starts
+    _, days, cut_starts, cut_ends = _split_by_period(gap_starts[keep], gap_ends[keep], 'day')
+
+    slot_starts = np.maximum(cut_starts, _from_local_clock(days + pd.Timedelta(f"{work_start}:00").value))
+    slot_ends = np.minimum(cut_ends, _from_local_clock(days + pd.Timedelta(f"{work_end}:00").value))
+    weekday = (days // day + 3) % 7
+    keep = (slot_ends > slot_starts) & (slot_ends - slot_starts >= min_minutes * NS_PER_MINUTE) \
+        & np.isin(weekday, list(weekdays))
+
+    return pd.DataFrame({
+        'day': pd.to_datetime(days[keep], unit='ns'),
+        'slot_start': _to_datetime(slot_starts[keep]),
+        'slot_end': _to_datetime(slot_ends[keep]),
+        'minutes': (slot_ends[keep] - slot_starts[keep]) / NS_PER_MINUTE,
+    })
+
+
+def focus_blocks(df, by=('calendar_name', 'event_category'), max_gap_minutes=0, min_minutes=0):
+    """
+    Blocchi di concentrazione: eventi consecutivi dello stesso gruppo (ad es. calendario e categoria)
+    uniti quando si sovrappongono o distano al più `max_gap_minutes` minuti.
+
+    :return: DataFrame con le colonne di `by`, block_start, block_end, minutes e n_events
+    """
+    by = list(by or [])
+    intervals = _event_intervals(df)
+    codes, labels = _group_codes(intervals, by)
+    _, block_ids, block_codes, block_starts, block_ends = _sweep(
+        intervals['start_ns'].to_numpy(), intervals['end_ns'].to_numpy(), codes, max_gap_minutes * NS_PER_MINUTE
+    )
+
+    blocks = pd.concat([labels.iloc[block_codes].reset_index(drop=True), pd.DataFrame({
+        'block_start': _to_datetime(block_starts),
+        'block_end': _to_datetime(block_ends),
+        'minutes': (block_ends - block_starts) / NS_PER_MINUTE,
+        'n_events': np.bincount(block_ids, minlength=len(block_starts)),
+    })], axis=1)
+    return blocks.loc[blocks['minutes'] >= min_minutes].reset_index(drop=True)
+
@@ -0,0 +1,173 @@
+import os
+import time
+import threading
+from collections import deque
+
+from dotenv import load_dotenv, find_dotenv
+
+from event_tracking.components.classification import CLASSIFICATION_MODEL, estimate_tokens
+from event_tracking.components.instrumentation import increment
+from event_tracking.config import LLM_BACKEND, LOCAL_LLM_BASE_URL, LOCAL_LLM_MODEL
+
+# langchain_openai è importato solo quando si crea un backend "openai" o "local"
+
+# Parametri di ogni backend: modello, chiamate contemporanee e parametri di classify_summaries.
+# Un modello locale su CPU elabora una richiesta alla volta: batch più piccoli e nessun rate limit.
+LLM_BACKENDS = {
+    "openai": {
+        "model": CLASSIFICATION_MODEL,
+        "max_concurrency": 8,
+        "classify_kwargs": {},
+    },
+    "local": {
+        "model": LOCAL_LLM_MODEL,
+        "base_url": LOCAL_LLM_BASE_URL,
+        "max_concurrency": 1,
+        "classify_kwargs": {"max_batch_size": 20, "max_batch_tokens": 400, "max_workers": 1,
+                            "requests_per_minute": 6000},
+    },
+    "fake": {
+        "model": "fake-chat-model",
+        "max_concurrency": 8,
+        "classify_kwargs": {"requests_per_minute": 60000},
+    },
+}
+
+# Numero di chiamate recenti usate per i percentili di latenza
+LLM_METRICS_WINDOW = 1000
+
+
+class LLMBackend:
+    """
+    Modello LLM con un limite di chiamate contemporanee e metriche per chiamata (latenza e token).
+    Espone invoke(prompt) e stream(prompt) come i modelli langchain: si può passare come `llm`
+    a categorize_calendar_events, classify_summaries e stream_time_analysis.
+
+    :param llm: modello con invoke (e stream per la chat), ad esempio ChatOpenAI o FakeChatModel
+    :param classify_kwargs: parametri di classify_summaries adatti al backend (batch, thread, rate limit)
+    """
+
+    def __init__(self, llm, model_name, max_concurrency=1, classify_kwargs=None):
+        self.llm = llm
+        self.model_name = model_name
+        self.max_concurrency = max_concurrency
+        self.classify_kwargs = dict(classify_kwargs or {})
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self.reset_metrics()
+
+    def reset_metrics(self):
+        with self._lock:
+            self._calls = 0
+            self._errors = 0
+            self._prompt_tokens = 0
+            self._completion_tokens = 0
+            self._busy_seconds = 0.0
+            self._latencies = deque(maxlen=LLM_METRICS_WINDOW)
+
+    def invoke(self, prompt):
+        with self._semaphore:
+            started = time.perf_counter()
+            try:
+                response = self.llm.invoke(prompt)
+            except Exception:
+                self._record(started, prompt, None)
+                raise
+
+        self._record(started, prompt, response.content, getattr(response, "usage_metadata", None))
+        return response
+
+    def stream(self, prompt):
+        with self._semaphore:
+            started = time.perf_counter()
+            parts = []
+            usage = None
+            try:
+                for chunk in self.llm.stream(prompt):
+                    usage = getattr(chunk, "usage_metadata", None) or usage
+                    parts.append(getattr(chunk, "content", chunk))
+                    yield chunk
+            except Exception:
+                self._record(started, prompt, None)
+                raise
+
+        self._record(started, prompt, "".join(parts), usage)
+
+    def _record(self, started, prompt, content, usage=None):
+        latency = time.perf_counter() - started
+        increment("llm_calls")
+        increment("llm_seconds", latency)
+        with self._lock:
+            self._calls += 1
+            self._busy_seconds += latency
+            self._latencies.append(latency)
+            if content is None:
+                self._errors += 1
+                increment("llm_errors")
+                return
+            # Token riportati dal server se disponibili, altrimenti stimati
+            prompt_tokens = usage["input_tokens"] if usage else estimate_tokens(prompt)
+            completion_tokens = usage["output_tokens"] if usage else estimate_tokens(content)
+            self._prompt_tokens += prompt_tokens
+            self._completion_tokens += completion_tokens
+
+        increment("llm_prompt_tokens", prompt_tokens)
+        increment("llm_completion_tokens", completion_tokens)
+
+    def metrics(self):
+        """
+        :return: dizionario con chiamate, errori, latenza (media e 95° percentile, in secondi)
+                 e token in ingresso e in uscita
+        """
+        with self._lock:
+            latencies = sorted(self._latencies)
+            return {
+                "calls": self._calls,
+                "errors": self._errors,
+                "mean_latency": self._busy_seconds / self._calls if self._calls else 0.0,
+                "p95_latency": latencies[int(0.95 * (len(latencies) - 1))] if latencies else 0.0,
+                "prompt_tokens": self._prompt_tokens,
+                "completion_tokens": self._completion_tokens,
+                "completion_tokens_per_second":
+                    self._completion_tokens / self._busy_seconds if self._busy_seconds else 0.0,
+            }
+
+
+def create_llm_backend(backend=LLM_BACKEND, model=None, **settings):
+    """
+    Crea il backend LLM `backend` ("openai", "local" o "fake") con i parametri di LLM_BACKENDS,
+    sovrascrivibili con `settings` (ad esempio base_url, max_concurrency, classify_kwargs).
+    Per "openai" la chiave OPENAI_API_KEY è letta dal file .env solo qui.
+    """
+    settings = {**LLM_BACKENDS[backend], **settings}
+    model = model or settings["model"]
+
+    if backend == "fake":
+        from event_tracking.components.fake_llm import FakeChatModel
+
+        llm = FakeChatModel(latency=settings.get("latency", 0.0), token_latency=settings.get("token_latency", 0.0))
+    else:
+        from langchain_openai import ChatOpenAI
+
+        if backend == "openai":
+            load_dotenv(find_dotenv())
+            llm = ChatOpenAI(model=model, temperature=0, api_key=os.environ['OPENAI_API_KEY'], stream_usage=True)
+        else:
+            # Ollama e llama.cpp espongono la stessa API di OpenAI: serve solo l'indirizzo del server
+            llm = ChatOpenAI(model=model, temperature=0, base_url=settings["base_url"], api_key="local",
+                             stream_usage=True, max_retries=0)
+
+    return LLMBackend(llm, model, settings["max_concurrency"], settings["classify_kwargs"])
+
+
+def print_llm_metrics(llm):
+    """
+    Stampa le metriche del backend (se `llm` è un LLMBackend)
+    """
+    if not isinstance(llm, LLMBackend):
+        return
+
+    metrics = llm.metrics()
+    print(f"  - LLM {llm.model_name}: {metrics['calls']} chiamate ({metrics['errors']} errori), "
+          f"latenza media {metrics['mean_latency']:.2f}s (p95 {metrics['p95_latency']:.2f}s), "
+          f"{metrics['prompt_tokens']} token in ingresso, {metrics['completion_tokens']} in uscita")
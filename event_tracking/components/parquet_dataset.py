@@ -0,0 +1,224 @@
+import os
+import time
+import hashlib
+
+import duckdb
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from event_tracking.components.event_store import to_store_frame, event_filters
+from event_tracking.components.event_schema import apply_event_schema, to_event_table
+from event_tracking.components.instrumentation import instrumented_stage
+from event_tracking.config import PATH_EVENTS_DATASET
+
+# Layout Hive: <root>/year=2025/month=May/calendar_name=Pozz%20Work/part-<ns>-<i>.parquet
+PARTITION_COLUMNS = ['year', 'month', 'calendar_name']
+PARTITIONING = ds.partitioning(
+    pa.schema([('year', pa.int32()), ('month', pa.string()), ('calendar_name', pa.string())]),
+    flavor='hive'
+)
+EVENT_KEY = ['calendar_name', 'event_id']
+
+
+def _open_dataset(root):
+    return ds.dataset(str(root), format='parquet', partitioning=PARTITIONING)
+
+
+def _dataset_filter(year=None, calendars=None):
+    """
+    Filtro pyarrow sulle colonne di partizione: le partizioni escluse non vengono lette
+    """
+    expression = None
+    if year is not None:
+        expression = ds.field('year') == int(year)
+    if calendars is not None:
+        calendar_filter = ds.field('calendar_name').isin(list(calendars))
+        expression = calendar_filter if expression is None else expression & calendar_filter
+    return expression
+
+
+def _dataset_files(root):
+    """
+    File del dataset con chiavi e partizione di ogni riga
+    """
+    if not os.path.isdir(root):
+        return pd.DataFrame(columns=[*PARTITION_COLUMNS, 'event_id', '__filename'])
+    return _open_dataset(root).to_table(columns=[*PARTITION_COLUMNS, 'event_id', '__filename']).to_pandas()
+
+
+def _remove_empty_dirs(root):
+    for dirpath, _, _ in sorted(os.walk(root), key=lambda entry: -len(entry[0])):
+        if dirpath != str(root) and not os.listdir(dirpath):
+            os.rmdir(dirpath)
+
+
+def append_events_dataset(events_df, root=PATH_EVENTS_DATASET):
+    """
+    Aggiunge gli eventi come nuovi file nelle rispettive partizioni (create se non esistono).
+    Il nome dei file contiene l'istante di scrittura: in compattazione vince la riga più recente.
+    """
+    if events_df is None or not len(events_df):
+        return
+
+    table = to_event_table(to_store_frame(events_df))
+    ds.write_dataset(
+        table, str(root), format='parquet', partitioning=PARTITIONING,
+        basename_template=f'part-{time.time_ns()}-{{i}}.parquet',
+        existing_data_behavior='overwrite_or_ignore'
+    )
+
+
+def rewrite_events_partitions(events_df, partitions, root=PATH_EVENTS_DATASET):
+    """
+    Sostituisce completamente le partizioni indicate con gli eventi di `events_df`
+    (che devono appartenere a quelle partizioni); le partizioni rimaste vuote vengono eliminate.
+
+    :param partitions: insieme di tuple (year, month, calendar_name)
+    """
+    partitions = {(int(year), month, calendar_name) for year, month, calendar_name in partitions}
+    files = _dataset_files(root)
+
+    in_partitions = [(int(year), month, calendar_name) in partitions for year, month, calendar_name
+                     in files[PARTITION_COLUMNS].itertuples(index=False)]
+    old_files = set(files.loc[in_partitions, '__filename'])
+
+    append_events_dataset(events_df, root)
+
+    for file_path in old_files:
+        os.remove(file_path)
+    _remove_empty_dirs(root)
+
+
+def compact_events_dataset(root=PATH_EVENTS_DATASET):
+    """
+    Unisce i file di ogni partizione in un unico file. Per ogni evento (calendar_name, event_id)
+    si tiene solo la riga scritta per ultima, anche se si trova in un'altra partizione
+    (ad esempio un evento spostato di mese).
+
+    :return: numero di partizioni compattate
+    """
+    files = _dataset_files(root)
+    if files.empty:
+        return 0
+
+    files['written'] = files['__filename'].map(os.path.basename)
+    files['latest'] = files.sort_values('written').groupby(EVENT_KEY)['__filename'].transform('last')
+    files['partition_dir'] = files['__filename'].map(os.path.dirname)
+
+    compacted = 0
+    for partition_dir, rows in files.groupby('partition_dir'):
+        if rows['__filename'].nunique() == 1 and (rows['__filename'] == rows['latest']).all():
+            continue
+
+        keep = rows.loc[rows['__filename'] == rows['latest'], ['__filename', 'event_id']]
+        tables = []
+        for file_path in rows['__filename'].unique():
+            table = pq.read_table(file_path, partitioning=None)
+            keep_ids = keep.loc[keep['__filename'] == file_path, 'event_id']
+            tables.append(table.filter(pc.is_in(table['event_id'], pa.array(keep_ids, pa.string()))))
+
+        merged = pa.concat_tables(tables)
+        if merged.num_rows:
+            pq.write_table(merged, os.path.join(partition_dir, f'part-{time.time_ns()}-0.parquet'))
+        for file_path in rows['__filename'].unique():
+            os.remove(file_path)
+        compacted += 1
+
+    _remove_empty_dirs(root)
+    return compacted
+
+
+def read_events_dataset(root=PATH_EVENTS_DATASET, year=None, calendars=None, columns=None):
+    """
+    Legge dal dataset solo le partizioni (anno, calendari) e le colonne richieste,
+    con lo schema compatto di event_schema.EVENT_DTYPES
+    """
+    events_df = _open_dataset(root).to_table(columns=columns, filter=_dataset_filter(year, calendars)).to_pandas()
+    if 'start_time' in events_df:
+        events_df = events_df.sort_values('start_time', ignore_index=True)
+    return apply_event_schema(events_df)
+
+
+def dataset_version(root=PATH_EVENTS_DATASET):
+    """
+    Impronta del dataset (nomi, dimensioni e date di modifica dei file): cambia a ogni esportazione
+    """
+    files = []
+    for dirpath, _, names in os.walk(root):
+        for name in names:
+            if name.endswith('.parquet'):
+                path = os.path.join(dirpath, name)
+                stat = os.stat(path)
+                files.append((os.path.relpath(path, root), stat.st_size, stat.st_mtime_ns))
+    return hashlib.sha1(repr(sorted(files)).encode()).hexdigest()
+
+
+def open_events_dataset_view(root=PATH_EVENTS_DATASET):
+    """
+    Connessione DuckDB in memoria con una vista `events` sul dataset partizionato:
+    le funzioni di event_store e queries funzionano senza modifiche e DuckDB legge
+    solo le partizioni che soddisfano i filtri su year e calendar_name
+    """
+    conn = duckdb.connect()
+    conn.execute("SET TimeZone = 'UTC'")
+    # Una vista non accetta parametri: il percorso è inserito come letterale SQL con gli apici raddoppiati
+    pattern = os.path.join(str(root), '**', '*.parquet').replace("'", "''")
+    conn.execute(f"""
+        CREATE VIEW events AS
+        SELECT * FROM read_parquet('{pattern}', hive_partitioning = true, hive_types = {{'year': INTEGER}})
+    """)
+    return conn
+
+
+def store_partitions(conn, keys=(), calendars=(), events_df=None):
+    """
+    Partizioni (year, month, calendar_name) toccate da una modifica: quelle in cui si trovano
+    nel database gli eventi `keys` e i calendari `calendars`, più quelle dei nuovi `events_df`
+    (DataFrame o tabella Arrow)
+    """
+    partitions = set()
+
+    if keys:
+        conn.register('partition_keys', pd.DataFrame(list(keys), columns=EVENT_KEY))
+        partitions |= set(conn.execute("""
+            SELECT DISTINCT year, month, calendar_name FROM events
+            WHERE (calendar_name, event_id) IN (SELECT (calendar_name, event_id) FROM partition_keys)
+        """).fetchall())
+        conn.unregister('partition_keys')
+
+    if calendars:
+        where, params = event_filters(calendars=calendars)
+        partitions |= set(conn.execute(f"SELECT DISTINCT year, month, calendar_name FROM events WHERE {where}",
+                                       params).fetchall())
+
+    if isinstance(events_df, pa.Table):
+        events_partitions = events_df.group_by(PARTITION_COLUMNS).aggregate([])
+        partitions |= set(zip(*[events_partitions[column].to_pylist() for column in PARTITION_COLUMNS]))
+    elif events_df is not None and len(events_df):
+        partitions |= set(events_df[PARTITION_COLUMNS].drop_duplicates().itertuples(index=False, name=None))
+
+    return partitions
+
+
+@instrumented_stage("export")
+def export_store_partitions(conn, partitions=None, root=PATH_EVENTS_DATASET):
+    """
+    Esporta dal database le partizioni indicate (tutte se None), riscrivendole nel dataset
+    """
+    if partitions is None:
+        # Esportazione completa: vengono sostituite anche le partizioni non più presenti nel database
+        dataset_partitions = _dataset_files(root)[PARTITION_COLUMNS].drop_duplicates()
+        partitions = set(conn.execute("SELECT DISTINCT year, month, calendar_name FROM events").fetchall())
+        partitions |= set(dataset_partitions.itertuples(index=False, name=None))
+
+    conn.register('export_partitions', pd.DataFrame(list(partitions), columns=PARTITION_COLUMNS))
+    events_df = conn.execute("""
+        SELECT * FROM events
+        WHERE (year, month, calendar_name) IN (SELECT (year, month, calendar_name) FROM export_partitions)
+    """).df()
+    conn.unregister('export_partitions')
+
+    rewrite_events_partitions(events_df, partitions, root)
@@ -0,0 +1,177 @@
+import pandas as pd
+
+from event_tracking.components.event_store import event_filters
+from event_tracking.config import LOCAL_TIMEZONE
+
+# Etichetta del periodo per ogni scala della multiscale review, calcolata sull'orario locale
+# (stesso formato delle colonne year_only / year_month / year_month_week della dashboard)
+TIME_SCALE_EXPRESSIONS = {
+    'yearly': "CAST(year AS VARCHAR)",
+    'monthly': "strftime(timezone(?, start_time), '%Y-%m')",
+    'weekly': "strftime(timezone(?, start_time), '%Y-%m-') || lpad(CAST(week_number AS VARCHAR), 2, '0')",
+}
+
+# Valori disponibili per la heatmap: (aggregazione sugli eventi, aggregazione sulle tabelle di rollup)
+CONTRIBUTION_VALUES = {
+    'count': ("COUNT(*)", "SUM(event_count)"),
+    'minutes': ("COALESCE(SUM(duration_minutes), 0)", "SUM(total_minutes)"),
+}
+
+
+def _period_expression(time_scale):
+    expression = TIME_SCALE_EXPRESSIONS[time_scale]
+    return expression, [LOCAL_TIMEZONE] * expression.count("?")
+
+
+def has_rollups(conn):
+    """
+    True se la connessione espone le tabelle di rollup (database eventi), False ad esempio
+    per la vista sul dataset parquet
+    """
+    return conn.execute(
+        "SELECT COUNT(*) FROM information_schema.tables WHERE table_name = 'event_rollups'"
+    ).fetchone()[0] > 0
+
+
+def period_range(periods, time_scale):
+    """
+    Tutti i periodi di `time_scale` dal primo all'ultimo (in ordine cronologico) tra `periods`, con le etichette
+    di TIME_SCALE_EXPRESSIONS e ROLLUP_GRAINS. Le etichette settimanali non sono ordinabili come stringhe
+    (il 30/12/2024 è in "2024-12-01"): l'ordine è quello dei giorni da cui sono calcolate.
+    """
+    periods = sorted(periods)
+    # I primi caratteri (anno, o anno e mese) sono sempre in ordine cronologico
+    first, last = pd.Timestamp(periods[0][:7]), pd.Timestamp(periods[-1][:7])
+    days = pd.date_range(first, last + (pd.offsets.YearEnd(0) if len(periods[-1]) == 4 else pd.offsets.MonthEnd(0)))
+
+    if time_scale == "weekly":
+        labels = days.strftime("%Y-%m-") + pd.Index(days.isocalendar().week).astype(str).str.zfill(2)
+    else:
+        labels = days.strftime({"daily": "%Y-%m-%d", "monthly": "%Y-%m", "yearly": "%Y"}[time_scale])
+
+    labels = list(dict.fromkeys(labels))
+    positions = [labels.index(period) for period in periods]
+    return labels[min(positions):max(positions) + 1]
+
+
+def downsample_periods(matrix, max_periods=None, time_scale=None):
+    """
+    Riduce le colonne (periodi, in ordine cronologico) di una tabella categoria x periodo ad al più
+    `max_periods`, sommando gruppi di periodi consecutivi della stessa ampiezza. Il gruppo è indicato
+    dal primo e dall'ultimo periodo, ad es. "2024-01-01 – 2024-01-04" per quattro settimane.
+    Con `time_scale` i periodi senza eventi vengono prima aggiunti con valore 0 (vedi period_range),
+    così ogni gruppo copre lo stesso intervallo di tempo e non solo lo stesso numero di colonne.
+    """
+    if max_periods is None or matrix.columns.empty:
+        return matrix
+
+    if time_scale is not None:
+        matrix = matrix.reindex(columns=period_range(matrix.columns, time_scale), fill_value=0)
+
+    n_periods = len(matrix.columns)
+    if n_periods <= max_periods:
+        return matrix
+
+    if time_scale is None:
+        matrix = matrix.reindex(columns=sorted(matrix.columns))
+    bucket_size = -(-n_periods // max_periods)
+    buckets = [matrix.columns[i:i + bucket_size] for i in range(0, n_periods, bucket_size)]
+
+    return pd.DataFrame(
+        {f"{bucket[0]} – {bucket[-1]}" if len(bucket) > 1 else bucket[0]: matrix[bucket].sum(axis=1)
+         for bucket in buckets},
+        index=matrix.index
+    )
+
+
+def contribution_matrix(conn, time_scale="monthly", year=None, calendars=None, calendar_name="Pozz Work",
+                        value="count", max_periods=None):
+    """
+    Numero di eventi (`value="count"`) o minuti (`value="minutes"`) per categoria e periodo
+    del calendario `calendar_name`. Letto dalle tabelle di rollup se disponibili, altrimenti
+    aggregato sugli eventi nel database. Con `max_periods` i periodi consecutivi vengono raggruppati
+    in modo che la tabella abbia al più `max_periods` colonne (vedi downsample_periods).
+
+    :return: DataFrame con una riga per categoria e una colonna per periodo (come in get_contribution_plot)
+    """
+    events_value, rollup_value = CONTRIBUTION_VALUES[value]
+    where, params = event_filters(year, calendars)
+
+    if has_rollups(conn):
+        counts = conn.execute(f"""
+            SELECT period, event_category, {rollup_value} AS value
+            FROM event_rollups
+            WHERE grain = ? AND calendar_name = ? AND event_category IS NOT NULL AND {where}
+            GROUP BY ALL
+        """, [time_scale, calendar_name, *params]).df()
+    else:
+        period, period_params = _period_expression(time_scale)
+        counts = conn.execute(f"""
+            SELECT {period} AS period, event_category, {events_value} AS value
+            FROM events
+            WHERE calendar_name = ? AND event_category IS NOT NULL AND {where}
+            GROUP BY ALL
+        """, [*period_params, calendar_name, *params]).df()
+
+    return downsample_periods(
+        counts
+        .pivot_table(index="event_category", columns="period", values="value")
+        .fillna(0),
+        max_periods, time_scale
+    )
+
+
+def event_metrics(conn, year=None, calendars=None):
+    """
+    Metriche della sezione Statistiche calcolate nel database sugli eventi filtrati
+    """
+    where, params = event_filters(year, calendars)
+
+    if has_rollups(conn):
+        query = f"""
+            SELECT SUM(event_count), SUM(total_minutes) / NULLIF(SUM(timed_events), 0), SUM(all_day_events)
+            FROM event_rollups
+            WHERE grain = 'yearly' AND {where}
+        """
+    else:
+        query = f"""
+            SELECT COUNT(*), AVG(duration_minutes), COUNT(*) FILTER (WHERE all_day)
+            FROM events
+            WHERE {where}
+        """
+    total_events, avg_duration, all_day_events = conn.execute(query, params).fetchone()
+
+    return {
+        "total_events": int(total_events or 0),
+        "avg_duration": avg_duration if avg_duration is not None else float("nan"),
+        "all_day_events": int(all_day_events or 0)
+    }
+
+
+def category_totals(conn, year=None, calendars=None, timed_only=False):
+    """
+    Numero di eventi e minuti totali per categoria, dalle tabelle di rollup se disponibili
+
+    :param timed_only: conta solo gli eventi con orario (esclusi quelli di tutto il giorno)
+    :return: DataFrame indicizzato per event_category con colonne count e total_minutes
+    """
+    where, params = event_filters(year, calendars)
+
+    if has_rollups(conn):
+        count = "timed_events" if timed_only else "event_count"
+        query = f"""
+            SELECT event_category, SUM({count})::BIGINT AS count, SUM(total_minutes) AS total_minutes
+            FROM event_rollups
+            WHERE grain = 'yearly' AND event_category IS NOT NULL AND {where}
+            GROUP BY ALL
+            HAVING SUM({count}) > 0
+        """
+    else:
+        query = f"""
+            SELECT event_category, COUNT(*) AS count, COALESCE(SUM(duration_minutes), 0) AS total_minutes
+            FROM events
+            WHERE event_category IS NOT NULL AND {where} {"AND NOT all_day" if timed_only else ""}
+            GROUP BY ALL
+        """
+
+    return conn.execute(query, params).df().set_index("event_category").sort_index()
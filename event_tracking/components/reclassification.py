@@ -0,0 +1,69 @@
+from event_tracking.components.calendar import WORK_CALENDARS, categories, category_renames, classification_model, \
+    classify_event_summaries
+from event_tracking.components.classification import CLASSIFICATION_PROMPT_VERSION
+from event_tracking.components.classification_cache import open_classification_cache, store_categories, \
+    migrate_classification_cache, drop_taxonomy_classifications, taxonomy_changes, taxonomy_key
+from event_tracking.components.event_store import filtered_events_sql, load_store_taxonomy, update_event_categories
+from event_tracking.components.instrumentation import instrumented_stage
+from event_tracking.config import PATH_CLASSIFICATION_CACHE
+
+
+@instrumented_stage("categorize")
+def reclassify_store_events(conn, taxonomy=None, renames=None, llm=None, cache_path=PATH_CLASSIFICATION_CACHE,
+                            work_calendars=WORK_CALENDARS, drop_previous_taxonomy=False, **classify_kwargs):
+    """
+    Applica agli eventi salvati un cambio di tassonomia: rispetto all'ultima versione registrata nel database
+    (vedi taxonomy_changes) le categorie rinominate vengono aggiornate senza LLM, solo i titoli con una categoria
+    eliminata o divisa o con 'other' (se sono state aggiunte categorie) vengono riclassificati.
+    Le nuove categorie sono scritte negli eventi salvati e la nuova tassonomia registrata come versione attuale.
+    Se il database non ha una tassonomia registrata si usano le categorie presenti negli eventi.
+
+    :param taxonomy: nuove categorie (di default `categories`)
+    :param renames: categorie rinominate, vecchia -> nuova (di default `category_renames`)
+    :param drop_previous_taxonomy: elimina dalla cache le classificazioni della tassonomia precedente,
+        dopo averle copiate; da non usare se altri account la usano ancora
+    :return: dizionario con il numero di titoli rinominati e riclassificati e di eventi aggiornati
+    """
+    taxonomy = categories if taxonomy is None else list(taxonomy)
+    renames = category_renames if renames is None else renames
+
+    events, params = filtered_events_sql(conn, calendars=work_calendars)
+    labels = dict(conn.execute(
+        f"SELECT DISTINCT summary, event_category FROM {events} WHERE summary IS NOT NULL",
+        params
+    ).fetchall())
+
+    previous = load_store_taxonomy(conn)
+    if previous is None:
+        previous = sorted({category for category in labels.values() if category is not None})
+    changes = taxonomy_changes(previous, taxonomy, renames)
+
+    kept = {summary: changes["renamed"].get(category, category) for summary, category in labels.items()
+            if category is not None and category not in changes["reclassify"]}
+    to_reclassify = [summary for summary, category in labels.items() if category in changes["reclassify"]]
+    print(f"Tassonomia: {len(changes['added'])} categorie aggiunte, {len(changes['removed'])} eliminate, "
+          f"{len(changes['renamed'])} rinominate; {len(to_reclassify)} titoli da riclassificare")
+
+    if cache_path is not None:
+        # Classificazioni ancora valide: dalla cache della tassonomia precedente e dagli eventi salvati
+        cache = open_classification_cache(cache_path)
+        try:
+            migrate_classification_cache(cache, previous, taxonomy, renames)
+            store_categories(cache, kept, taxonomy, classification_model(llm), CLASSIFICATION_PROMPT_VERSION)
+            if drop_previous_taxonomy and taxonomy_key(previous) != taxonomy_key(taxonomy):
+                drop_taxonomy_classifications(cache, previous)
+        finally:
+            cache.close()
+
+    new_categories = classify_event_summaries(to_reclassify, taxonomy, llm=llm, cache_path=cache_path,
+                                              **classify_kwargs) if to_reclassify else {}
+    # Un titolo non riclassificato resta in 'other'; una categoria eliminata non resta negli eventi
+    for summary in to_reclassify:
+        if summary not in new_categories:
+            new_categories[summary] = labels[summary] if labels[summary] in taxonomy else None
+
+    renamed = {summary: kept[summary] for summary, category in labels.items() if category in changes["renamed"]}
+    updated_events = update_event_categories(conn, {**renamed, **new_categories}, work_calendars, taxonomy)
+
+    return {"renamed_summaries": len(renamed), "reclassified_summaries": len(to_reclassify),
+            "updated_events": updated_events}
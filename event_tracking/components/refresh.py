@@ -0,0 +1,183 @@
+import os
+import time
+import shutil
+import datetime
+from contextlib import contextmanager
+
+try:
+    import fcntl
+    msvcrt = None
+except ImportError:
+    # Windows: lock sul primo byte del file con msvcrt.locking
+    fcntl = None
+    import msvcrt
+
+from event_tracking.components.calendar import fetch_calendar_events_incremental, categories
+from event_tracking.components.arrow_events import process_calendar_events_arrow, categorize_calendar_events_arrow, \
+    export_events_ipc
+from event_tracking.components.event_store import open_event_store, upsert_events, load_store_sync_tokens
+from event_tracking.components.parquet_dataset import store_partitions, export_store_partitions
+from event_tracking.components.instrumentation import instrumented_stage, pipeline_run
+from event_tracking.config import PATH_EVENT_STORE, PATH_EVENT_STORE_SNAPSHOT, PATH_REFRESH_LOCK, \
+    PATH_EVENTS_DATASET, PATH_EVENTS_IPC, REFRESH_INTERVAL_MINUTES, PATH_PIPELINE_METRICS, PATH_PIPELINE_METRICS_PROM
+
+# Tentativi di sostituzione dello snapshot: su Windows os.replace fallisce finché la dashboard lo tiene aperto
+PUBLISH_MAX_RETRIES = 10
+PUBLISH_BACKOFF_SECONDS = 0.5
+
+
+@contextmanager
+def refresh_lock(path=PATH_REFRESH_LOCK):
+    """
+    Lock esclusivo (flock, msvcrt.locking su Windows) tra i processi che scrivono nel database eventi:
+    servizio di refresh e create_calendar_db.py. Restituisce False se un altro aggiornamento è già in corso.
+    Il lock è rilasciato dal sistema operativo anche se il processo termina senza rilasciarlo.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'a+') as lock_file:
+        if not _try_lock(lock_file):
+            yield False
+            return
+
+        try:
+            yield True
+        finally:
+            _unlock(lock_file)
+
+
+def _try_lock(lock_file):
+    try:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        return False
+    return True
+
+
+def _unlock(lock_file):
+    if fcntl is not None:
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+    else:
+        lock_file.seek(0)
+        msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@instrumented_stage("publish")
+def publish_snapshot(store_path=PATH_EVENT_STORE, snapshot_path=PATH_EVENT_STORE_SNAPSHOT,
+                     max_retries=PUBLISH_MAX_RETRIES, backoff_seconds=PUBLISH_BACKOFF_SECONDS):
+    """
+    Copia il database (chiuso) nello snapshot letto dalla dashboard: prima in un file temporaneo
+    nella stessa cartella, poi con una rinomina atomica. Chi ha già aperto lo snapshot continua
+    a leggere la versione precedente, le nuove connessioni vedono quella nuova.
+    Su Windows la rinomina fallisce (PermissionError) finché un lettore tiene aperto lo snapshot:
+    le connessioni della dashboard sono brevi, quindi si riprova con attesa crescente.
+    """
+    tmp_path = snapshot_path.with_name(f".{snapshot_path.name}.{os.getpid()}.tmp")
+    shutil.copyfile(store_path, tmp_path)
+    with open(tmp_path, 'rb') as f:
+        os.fsync(f.fileno())
+
+    for attempt in range(max_retries + 1):
+        try:
+            os.replace(tmp_path, snapshot_path)
+            return
+        except PermissionError:
+            if attempt == max_retries:
+                os.remove(tmp_path)
+                raise
+            time.sleep(backoff_seconds * 2 ** attempt)
+
+
+def run_incremental_update(conn, time_period_days=150, incremental=True, service=None, export_dataset=False,
+                           dataset_root=PATH_EVENTS_DATASET, export_ipc=False, ipc_path=PATH_EVENTS_IPC,
+                           **categorize_kwargs):
+    """
+    Aggiornamento incrementale del database eventi `conn` (usato da refresh_once e da create_calendar_db.py):
+    scarica le modifiche dall'ultimo sync token (tutto il periodo con `incremental=False`), le elabora
+    e classifica come tabella Arrow, passata a DuckDB senza copie, e le salva in un'unica transazione.
+    Con `export_dataset` riscrive le partizioni parquet toccate, con `export_ipc` il file Arrow
+    letto dalla dashboard (vedi open_events_ipc_view).
+
+    :return: dizionario con il numero di eventi modificati e cancellati
+    """
+    sync = fetch_calendar_events_incremental(load_store_sync_tokens(conn) if incremental else {}, time_period_days,
+                                             service=service)
+
+    active_events = [event for event in sync["events"] if event.get('status') != 'cancelled']
+    cancelled_keys = [(event['calendar_name'], event['id'])
+                      for event in sync["events"] if event.get('status') == 'cancelled']
+
+    events_table = None
+    if active_events:
+        events_table = categorize_calendar_events_arrow(process_calendar_events_arrow(active_events),
+                                                        **categorize_kwargs)
+
+    if export_dataset:
+        # Partizioni in cui si trovavano gli eventi modificati o cancellati, prima dell'aggiornamento
+        changed_keys = cancelled_keys + [(event['calendar_name'], event['id']) for event in active_events]
+        partitions = store_partitions(conn, keys=changed_keys, calendars=sync["full_sync_calendars"],
+                                      events_df=events_table)
+
+    upsert_events(conn, events_table, deleted_keys=cancelled_keys, replace_calendars=sync["full_sync_calendars"],
+                  replace_time_min=sync["full_sync_time_min"], sync_tokens=sync["sync_tokens"],
+                  taxonomy=categorize_kwargs.get("taxonomy") or categories)
+
+    if export_dataset:
+        # Si riscrivono solo le partizioni toccate (tutte alla prima esportazione)
+        export_store_partitions(conn, partitions if os.path.isdir(dataset_root) else None, dataset_root)
+    if export_ipc:
+        export_events_ipc(conn, ipc_path)
+
+    return {"changed_events": len(active_events), "cancelled_events": len(cancelled_keys)}
+
+
+def refresh_once(time_period_days=150, store_path=PATH_EVENT_STORE, snapshot_path=PATH_EVENT_STORE_SNAPSHOT,
+                 lock_path=PATH_REFRESH_LOCK, metrics_path=PATH_PIPELINE_METRICS,
+                 prometheus_path=PATH_PIPELINE_METRICS_PROM, **update_kwargs):
+    """
+    Aggiornamento incrementale (vedi run_incremental_update) sotto il lock dei processi che scrivono
+    nel database, poi pubblicazione dello snapshot per la dashboard.
+    Le misure delle fasi sono aggiunte a `metrics_path` (JSON lines) e scritte in `prometheus_path`
+    (vedi pipeline_run).
+
+    :return: dizionario con il numero di eventi modificati e cancellati, None se un altro aggiornamento è in corso
+    """
+    with refresh_lock(lock_path) as acquired:
+        if not acquired:
+            print("Aggiornamento già in corso in un altro processo, salto questa esecuzione")
+            return None
+
+        with pipeline_run("refresh", metrics_path, prometheus_path):
+            with open_event_store(store_path) as conn:
+                result = run_incremental_update(conn, time_period_days, **update_kwargs)
+                conn.execute("CHECKPOINT")
+
+            publish_snapshot(store_path, snapshot_path)
+
+            return result
+
+
+def run_refresh_daemon(interval_minutes=REFRESH_INTERVAL_MINUTES, max_runs=None, **refresh_kwargs):
+    """
+    Servizio di refresh: esegue refresh_once ogni `interval_minutes` minuti (a partire dall'inizio
+    dell'esecuzione precedente). Un errore in un aggiornamento viene stampato e si riprova al giro successivo.
+
+    :param max_runs: numero di aggiornamenti dopo cui fermarsi (None: senza fine)
+    """
+    runs = 0
+    while max_runs is None or runs < max_runs:
+        started = time.monotonic()
+        print(f"[{datetime.datetime.now():%Y-%m-%d %H:%M:%S}] Aggiornamento eventi")
+        try:
+            result = refresh_once(**refresh_kwargs)
+            if result is not None:
+                print(f"  - {result['changed_events']} eventi modificati, {result['cancelled_events']} cancellati")
+        except Exception as e:
+            print(f"  - Aggiornamento non riuscito: {e}")
+
+        runs += 1
+        if max_runs is None or runs < max_runs:
+            time.sleep(max(0.0, interval_minutes * 60 - (time.monotonic() - started)))
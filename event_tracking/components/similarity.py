@@ -0,0 +1,121 @@
+import re
+import zlib
+import threading
+
+import numpy as np
+from scipy import sparse
+
+from event_tracking.components.classification_cache import normalize_summary
+
+# Dimensione dello spazio delle feature (n-grammi di caratteri mappati con hashing)
+SIMILARITY_FEATURES = 2 ** 12
+SIMILARITY_NGRAM = 3
+# Similarità coseno minima per assegnare la categoria del titolo più vicino senza passare dall'LLM
+SIMILARITY_THRESHOLD = 0.85
+# Indici conservati in memoria da cached_similarity_index (ad esempio uno per tassonomia e modello)
+SIMILARITY_INDEX_CACHE_SIZE = 8
+
+_index_cache = {}
+_index_cache_lock = threading.Lock()
+
+
+def similarity_text(summary):
+    """
+    Testo usato per il confronto: titolo normalizzato con numeri e date ridotti a '0',
+    così "Weekly sync 12/05" e "Weekly sync 19/05" diventano identici
+    """
+    return re.sub(r'\d+', '0', normalize_summary(summary))
+
+
+def _ngram_ids(text, n=SIMILARITY_NGRAM, n_features=SIMILARITY_FEATURES):
+    padded = f" {text} "
+    grams = [padded[i:i + n] for i in range(max(1, len(padded) - n + 1))]
+    # crc32 invece di hash(): stabile tra processi diversi
+    return [zlib.crc32(gram.encode()) % n_features for gram in grams]
+
+
+def _term_counts(texts, n_features=SIMILARITY_FEATURES):
+    # Matrice sparsa CSR: ogni titolo ha poche decine di n-grammi su n_features colonne
+    ids = [_ngram_ids(text, n_features=n_features) for text in texts]
+    indptr = np.cumsum([0] + [len(row) for row in ids])
+    indices = np.fromiter((i for row in ids for i in row), dtype=np.int32, count=indptr[-1])
+    counts = sparse.csr_matrix((np.ones(len(indices), dtype=np.float32), indices, indptr),
+                               shape=(len(texts), n_features))
+    counts.sum_duplicates()
+    return counts
+
+
+def _tfidf(counts, idf):
+    weights = counts.log1p().multiply(idf).tocsr()
+    norms = np.sqrt(np.asarray(weights.multiply(weights).sum(axis=1)).ravel())
+    return sparse.diags(1 / np.where(norms == 0, 1, norms)).astype(np.float32) @ weights
+
+
+def build_similarity_index(labelled, n_features=SIMILARITY_FEATURES):
+    """
+    Costruisce l'indice TF-IDF sugli n-grammi di caratteri dei titoli già classificati.
+
+    :param labelled: dizionario titolo -> categoria
+    :return: dizionario con matrice sparsa normalizzata, pesi idf e categorie (una riga per titolo distinto)
+    """
+    by_text = {similarity_text(summary): category for summary, category in labelled.items()}
+    texts = list(by_text)
+
+    counts = _term_counts(texts, n_features)
+    document_frequency = np.bincount(counts.indices, minlength=n_features)
+    idf = (np.log((1 + len(texts)) / (1 + document_frequency)) + 1).astype(np.float32)
+
+    return {
+        "matrix": _tfidf(counts, idf),
+        "idf": idf,
+        "labels": np.array(list(by_text.values()), dtype=object)
+    }
+
+
+def cached_similarity_index(key, labelled, n_features=SIMILARITY_FEATURES):
+    """
+    Come build_similarity_index, ma riusa l'indice già costruito per `key` (ad esempio tassonomia e modello)
+    finché i titoli classificati `labelled` non cambiano. Sono conservati gli ultimi
+    SIMILARITY_INDEX_CACHE_SIZE indici usati.
+    """
+    key = (key, n_features)
+    with _index_cache_lock:
+        cached = _index_cache.pop(key, None)
+
+    if cached is None or cached[0] != labelled:
+        cached = (dict(labelled), build_similarity_index(labelled, n_features))
+
+    with _index_cache_lock:
+        _index_cache[key] = cached
+        while len(_index_cache) > SIMILARITY_INDEX_CACHE_SIZE:
+            del _index_cache[next(iter(_index_cache))]
+    return cached[1]
+
+
+def predict_from_index(index, summaries, threshold=SIMILARITY_THRESHOLD, chunk_size=1024):
+    """
+    Assegna a ogni titolo la categoria del titolo classificato più simile,
+    solo se la similarità coseno supera `threshold`.
+
+    :return: dizionario titolo -> (categoria, similarità) per i titoli assegnati
+    """
+    if not summaries or len(index["labels"]) == 0:
+        return {}
+
+    predictions = {}
+    n_features = index["matrix"].shape[1]
+
+    for start in range(0, len(summaries), chunk_size):
+        chunk = summaries[start:start + chunk_size]
+        queries = _tfidf(_term_counts([similarity_text(summary) for summary in chunk], n_features), index["idf"])
+
+        # Prodotto sparso: restano solo le coppie di titoli con n-grammi in comune
+        scores = (queries @ index["matrix"].T).tocsr()
+        best = np.asarray(scores.argmax(axis=1)).ravel()
+        best_scores = np.asarray(scores.max(axis=1).todense()).ravel()
+
+        for summary, position, score in zip(chunk, best, best_scores):
+            if score >= threshold:
+                predictions[summary] = (index["labels"][position], float(score))
+
+    return predictions
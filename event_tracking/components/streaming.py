@@ -0,0 +1,120 @@
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from event_tracking.components.calendar import iter_calendar_event_pages
+from event_tracking.components.arrow_events import process_calendar_events_arrow, categorize_calendar_events_arrow
+from event_tracking.components.event_schema import EVENT_ARROW_SCHEMA
+from event_tracking.components.event_store import upsert_events
+from event_tracking.components.instrumentation import stage, add_rows
+
+# Numero di eventi elaborati (normalizzati, classificati e scritti) per blocco
+STREAM_CHUNK_SIZE = 10_000
+
+
+def stream_event_chunks(pages, chunk_size=STREAM_CHUNK_SIZE, categorize=True, **categorize_kwargs):
+    """
+    Raggruppa le pagine di iter_calendar_event_pages in blocchi di circa `chunk_size` eventi,
+    che vengono classificati uno alla volta: in memoria c'è un solo blocco. Ogni pagina è convertita
+    subito in una tabella Arrow (process_calendar_events_arrow), senza accumulare i dizionari dell'API.
+    I titoli già classificati nei blocchi precedenti sono letti dalla cache di categorize_calendar_events_arrow
+    (a cui sono passati `categorize_kwargs`), quindi solo i titoli nuovi vengono inviati all'LLM.
+
+    :return: generatore di dizionari con gli argomenti di upsert_events per il blocco:
+             events_df (tabella Arrow con lo schema STORE_ARROW_SCHEMA), deleted_keys, replace_calendars,
+             replace_time_min e sync_tokens dei calendari la cui ultima pagina è nel blocco
+    """
+    chunk = _empty_chunk()
+
+    for page in pages:
+        calendar = page["calendar"]
+        if page["full_sync"] and page["first_page"]:
+            chunk["replace_calendars"].append(calendar["summary"])
+            chunk["replace_time_min"] = page["time_min"]
+
+        events = []
+        for event in page["events"]:
+            if event.get('status') == 'cancelled':
+                chunk["deleted_keys"].append((event['calendar_name'], event['id']))
+            else:
+                events.append(event)
+        if events:
+            chunk["tables"].append(process_calendar_events_arrow(events))
+            chunk["n_events"] += len(events)
+
+        if page["next_sync_token"] is not None:
+            chunk["sync_tokens"][calendar["id"]] = page["next_sync_token"]
+
+        if chunk["n_events"] >= chunk_size:
+            yield _process_chunk(chunk, categorize, categorize_kwargs)
+            chunk = _empty_chunk()
+
+    if chunk["n_events"] or chunk["deleted_keys"] or chunk["replace_calendars"] or chunk["sync_tokens"]:
+        yield _process_chunk(chunk, categorize, categorize_kwargs)
+
+
+def _empty_chunk():
+    return {"tables": [], "n_events": 0, "deleted_keys": [], "replace_calendars": [], "replace_time_min": None,
+            "sync_tokens": {}}
+
+
+def _process_chunk(chunk, categorize, categorize_kwargs):
+    events_df = None
+    if chunk["n_events"]:
+        events_df = pa.concat_tables(chunk["tables"])
+        if categorize:
+            events_df = categorize_calendar_events_arrow(events_df, **categorize_kwargs)
+        events_df = events_df.sort_by('start_time')
+
+    return {
+        "events_df": events_df,
+        "deleted_keys": chunk["deleted_keys"],
+        "replace_calendars": chunk["replace_calendars"],
+        "replace_time_min": chunk["replace_time_min"],
+        "sync_tokens": chunk["sync_tokens"],
+    }
+
+
+def write_chunks_to_store(conn, chunks):
+    """
+    Applica ogni blocco al database eventi con upsert_events, in una transazione per blocco.
+    I sync token di un calendario sono salvati solo con il blocco che contiene la sua ultima pagina:
+    se l'esecuzione si interrompe, il calendario viene risincronizzato alla successiva.
+
+    :return: numero di eventi scritti
+    """
+    n_events = 0
+    for chunk in chunks:
+        upsert_events(conn, chunk["events_df"], deleted_keys=chunk["deleted_keys"],
+                      replace_calendars=chunk["replace_calendars"], replace_time_min=chunk["replace_time_min"],
+                      sync_tokens=chunk["sync_tokens"])
+        n_events += 0 if chunk["events_df"] is None else len(chunk["events_df"])
+        print(f"  - Scritti {n_events} eventi")
+    return n_events
+
+
+def write_chunks_to_parquet(chunks, file_path):
+    """
+    Scrive gli eventi dei blocchi in un unico file parquet, un row group per blocco
+    (le cancellazioni vengono ignorate: pensato per lo scaricamento completo dello storico)
+
+    :return: numero di eventi scritti
+    """
+    n_events = 0
+    with pq.ParquetWriter(str(file_path), EVENT_ARROW_SCHEMA) as writer:
+        for chunk in chunks:
+            if chunk["events_df"] is not None:
+                with stage("store"):
+                    writer.write_table(chunk["events_df"].select(EVENT_ARROW_SCHEMA.names))
+                    add_rows(len(chunk["events_df"]))
+                n_events += len(chunk["events_df"])
+    return n_events
+
+
+def ingest_calendar_events(conn, sync_tokens=None, time_period_days=30, service=None,
+                           chunk_size=STREAM_CHUNK_SIZE, **categorize_kwargs):
+    """
+    Pipeline in streaming: scarica, normalizza, classifica e scrive nel database gli eventi
+    un blocco alla volta, con memoria limitata dalla dimensione del blocco e non dallo storico.
+    """
+    pages = iter_calendar_event_pages(sync_tokens, time_period_days, service)
+    return write_chunks_to_store(conn, stream_event_chunks(pages, chunk_size, **categorize_kwargs))
@@ -0,0 +1,82 @@
+import random
+import datetime
+
+DEFAULT_CALENDARS = ("Pozz Work", "Pozz", "Giulia")
+
+# Titoli tipici degli eventi, con un numero finale per simulare varianti dello stesso titolo
+SUMMARY_TOPICS = ["Meeting", "Weekly sync AVM", "AVM property value review", "Genertel POC",
+                  "Finbox gara MCC call", "Finbox privati", "Deploy affordability", "Smart lending suite meeting",
+                  "Pipeline tools side project", "Review DSS best practices", "Pranzo", "Palestra"]
+
+
+def calendar_names(n):
+    """
+    Nomi di `n` calendari: quelli predefiniti seguiti da 'Calendario 4', 'Calendario 5', ...
+    """
+    return list(DEFAULT_CALENDARS[:n]) + [f"Calendario {i + 1}" for i in range(len(DEFAULT_CALENDARS), n)]
+
+
+def generate_calendar_events(n, seed=0, offsets=("+01:00", "+02:00", "Z"), all_day_ratio=0.1,
+                             calendars=DEFAULT_CALENDARS, recurring_ratio=0.0):
+    """
+    Genera `n` eventi casuali nel formato restituito da events().list, con offset misti
+    ed eventi di tutto il giorno. Utile per test e benchmark senza accesso all'API.
+
+    :param calendars: nomi dei calendari a cui assegnare gli eventi
+    :param recurring_ratio: frazione delle serie generate che sono ricorrenti (settimanali), espanse
+        in singole occorrenze con `recurringEventId` e `originalStartTime` come con singleEvents=True
+    """
+    rng = random.Random(seed)
+    base = datetime.datetime(2023, 1, 1)
+    events = []
+
+    while len(events) < n:
+        start = base + datetime.timedelta(days=rng.randint(0, 3 * 365), minutes=15 * rng.randint(0, 95))
+        calendar_name = rng.choice(calendars)
+        summary = f"{rng.choice(SUMMARY_TOPICS)} {rng.randint(0, 50)}" if rng.random() < 0.95 else None
+        all_day = rng.random() < all_day_ratio
+        length = datetime.timedelta(days=rng.randint(1, 3)) if all_day \
+            else datetime.timedelta(minutes=15 * rng.randint(1, 16))
+        offset = rng.choice(offsets)
+        series_id = f"ev{len(events)}"
+        occurrences = rng.randint(4, 20) if recurring_ratio and rng.random() < recurring_ratio else 1
+
+        for k in range(min(occurrences, n - len(events))):
+            occurrence_start = start + datetime.timedelta(weeks=k)
+            event = _event_payload(series_id, calendar_name, summary, occurrence_start,
+                                   occurrence_start + length, all_day, offset)
+            if occurrences > 1:
+                event["id"] = f"{series_id}_{occurrence_start.strftime('%Y%m%dT%H%M%S')}"
+                event["recurringEventId"] = series_id
+                event["originalStartTime"] = dict(event["start"])
+            events.append(event)
+
+    return events
+
+
+def _event_payload(event_id, calendar_name, summary, start, end, all_day, offset):
+    """
+    Evento con i campi principali restituiti dall'API (oltre a `calendar_name`, aggiunto da fetch_calendar_events)
+    """
+    created = (start - datetime.timedelta(days=7)).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+    event = {
+        "kind": "calendar#event",
+        "id": event_id,
+        "status": "confirmed",
+        "created": created,
+        "updated": created,
+        "iCalUID": f"{event_id}@google.com",
+        "eventType": "default",
+        "calendar_name": calendar_name,
+    }
+    if summary is not None:
+        event["summary"] = summary
+
+    if all_day:
+        event["start"] = {"date": start.strftime("%Y-%m-%d")}
+        event["end"] = {"date": end.strftime("%Y-%m-%d")}
+    else:
+        event["start"] = {"dateTime": start.strftime("%Y-%m-%dT%H:%M:%S") + offset}
+        event["end"] = {"dateTime": end.strftime("%Y-%m-%dT%H:%M:%S") + offset}
+
+    return event
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 # Paths
@@ -5,9 +6,45 @@ PROJ_ROOT = Path(__file__).resolve().parents[1]
 
 PATH_TOKEN = PROJ_ROOT / "token.json"
 PATH_CREDENTIALS = PROJ_ROOT / "credentials.json"
+# Ingestione di più account: configurazione (lista JSON di account), token OAuth e database di ogni account
+PATH_ACCOUNTS = PROJ_ROOT / "accounts.json"
+ACCOUNT_TOKENS_DIR = PROJ_ROOT / "tokens"
 
 DATA_DIR = PROJ_ROOT / "data"
 RAW_DATA_DIR = DATA_DIR / "raw"
 INTERIM_DATA_DIR = DATA_DIR / "interim"
 PROCESSED_DATA_DIR = DATA_DIR / "processed"
-EXTERNAL_DATA_DIR = DATA_DIR / "external"
\ No newline at end of file
+EXTERNAL_DATA_DIR = DATA_DIR / "external"
+
+PATH_CLASSIFICATION_CACHE = INTERIM_DATA_DIR / "classification_cache.sqlite"
+PATH_EVENT_STORE = PROCESSED_DATA_DIR / "calendar_events.duckdb"
+PATH_EVENTS_DATASET = PROCESSED_DATA_DIR / "events_dataset"
+# Eventi in formato Arrow IPC, letti dalla dashboard mappando il file in memoria
+PATH_EVENTS_IPC = PROCESSED_DATA_DIR / "calendar_events.arrow"
+# Copia del database letta dalla dashboard, sostituita in modo atomico a ogni aggiornamento
+PATH_EVENT_STORE_SNAPSHOT = PROCESSED_DATA_DIR / "calendar_events.snapshot.duckdb"
+PATH_REFRESH_LOCK = PROCESSED_DATA_DIR / "refresh.lock"
+ACCOUNT_STORES_DIR = PROCESSED_DATA_DIR / "accounts"
+# Metriche delle esecuzioni della pipeline (una riga JSON per esecuzione, testo Prometheus) e profili delle fasi
+PATH_PIPELINE_METRICS = INTERIM_DATA_DIR / "pipeline_metrics.jsonl"
+PATH_PIPELINE_METRICS_PROM = INTERIM_DATA_DIR / "pipeline_metrics.prom"
+PATH_PROFILES = INTERIM_DATA_DIR / "profiles"
+
+# Intervallo tra due aggiornamenti incrementali del servizio di refresh
+REFRESH_INTERVAL_MINUTES = 30
+
+# Fuso orario usato per le etichette dei periodi nella dashboard
+LOCAL_TIMEZONE = "Europe/Rome"
+
+# Backend LLM per la classificazione e la chat di analisi: "openai", "local" (server Ollama o llama.cpp
+# con API compatibile OpenAI, anche solo CPU) oppure "fake" (modello deterministico, senza rete)
+LLM_BACKEND = os.environ.get("EVENT_TRACKING_LLM_BACKEND", "openai")
+LOCAL_LLM_BASE_URL = os.environ.get("EVENT_TRACKING_LOCAL_LLM_URL", "http://localhost:11434/v1")
+LOCAL_LLM_MODEL = os.environ.get("EVENT_TRACKING_LOCAL_LLM_MODEL", "llama3.2:3b")
+
+# Profilazione delle fasi della pipeline, ad es. EVENT_TRACKING_PROFILE=categorize,store (oppure "all"),
+# con cProfile o pyinstrument (EVENT_TRACKING_PROFILER)
+PROFILE_STAGES = tuple(stage for stage in os.environ.get("EVENT_TRACKING_PROFILE", "").split(",") if stage)
+PROFILER = os.environ.get("EVENT_TRACKING_PROFILER", "cprofile")
+# Metriche di ogni esecuzione della dashboard (disattivate: Streamlit riesegue lo script a ogni interazione)
+DASHBOARD_METRICS = os.environ.get("EVENT_TRACKING_DASHBOARD_METRICS") == "1"
@@ -0,0 +1,19 @@
+import pytest
+
+from event_tracking.components.calendar import process_calendar_events
+from event_tracking.components.synthetic import generate_calendar_events
+
+
+@pytest.fixture
+def make_events_df():
+    """
+    Eventi sintetici elaborati da process_calendar_events, già classificati:
+    `category` è una categoria o una funzione del DataFrame che restituisce la colonna event_category.
+    Gli altri argomenti sono passati a generate_calendar_events.
+    """
+    def make(n=300, seed=0, category="other", **kwargs):
+        events_df = process_calendar_events(generate_calendar_events(n, seed=seed, **kwargs))
+        events_df["event_category"] = category(events_df) if callable(category) else category
+        return events_df
+
+    return make
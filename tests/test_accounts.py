@@ -0,0 +1,110 @@
+import json
+
+import pytest
+
+from event_tracking.components.accounts import account_settings, load_accounts, ingest_accounts
+from event_tracking.components.calendar import WORK_CALENDARS, categories
+from event_tracking.components.event_store import open_event_store, query_events, load_store_sync_tokens
+from event_tracking.components.fake_calendar import FakeCalendarService, build_fake_calendar_service, make_event
+from event_tracking.components.fake_llm import FakeChatModel
+from event_tracking.components.synthetic import generate_calendar_events
+
+
+def _account(tmp_path, name, **settings):
+    return account_settings(name, store_path=tmp_path / f"{name}.duckdb", **settings)
+
+
+def _work_service(summaries, calendar_name="Pozz Work"):
+    service = FakeCalendarService([("work", calendar_name)])
+    for i, summary in enumerate(summaries):
+        service.upsert("work", make_event(f"e{i}", summary, f"2025-05-0{i + 1}T09:00:00Z",
+                                          f"2025-05-0{i + 1}T10:00:00Z"))
+    return service
+
+
+def test_load_accounts_applies_defaults(tmp_path):
+    path = tmp_path / "accounts.json"
+    path.write_text(json.dumps([{"name": "mario", "calendars": ["Lavoro"], "work_calendars": ["Lavoro"],
+                                 "taxonomy": ["meetings", "other"]},
+                                {"name": "anna"}]))
+
+    mario, anna = load_accounts(path)
+
+    assert mario["calendars"] == ["Lavoro"] and mario["work_calendars"] == ("Lavoro",)
+    assert mario["taxonomy"] == ["meetings", "other"]
+    assert anna["calendars"] is None and anna["work_calendars"] == WORK_CALENDARS
+    assert anna["taxonomy"] == categories
+    assert anna["token_path"].name == "anna.json" and anna["store_path"].name == "anna.duckdb"
+
+
+def test_load_accounts_rejects_duplicate_names(tmp_path):
+    path = tmp_path / "accounts.json"
+    path.write_text(json.dumps([{"name": "mario"}, {"name": "mario"}]))
+
+    with pytest.raises(ValueError):
+        load_accounts(path)
+
+
+def test_identical_titles_are_classified_once_across_accounts(tmp_path):
+    accounts = [_account(tmp_path, "mario"), _account(tmp_path, "anna")]
+    services = {"mario": _work_service(["Weekly avm-meetings", "Finbox privati"]),
+                "anna": _work_service(["Weekly avm-meetings", "Palestra"])}
+    llm = FakeChatModel(categories)
+
+    results = ingest_accounts(accounts, llm=llm, cache_path=tmp_path / "cache.sqlite", services=services)
+
+    assert results == {"mario": {"changed_events": 2, "cancelled_events": 0},
+                       "anna": {"changed_events": 2, "cancelled_events": 0}}
+    assert sorted(llm.classified_texts) == ["Finbox privati", "Palestra", "Weekly avm-meetings"]
+
+    with open_event_store(accounts[1]["store_path"], read_only=True) as conn:
+        anna_events = query_events(conn)
+        assert load_store_sync_tokens(conn) == {"work": str(services["anna"].version)}
+    assert dict(zip(anna_events["summary"], anna_events["event_category"])) == \
+        {"Weekly avm-meetings": "avm-meetings", "Palestra": "other"}
+
+    # Alla seconda esecuzione i titoli sono già nella cache condivisa e arrivano solo le modifiche
+    services["anna"].cancel("work", "e1")
+    services["mario"].upsert("work", make_event("e9", "Palestra", "2025-05-09T09:00:00Z", "2025-05-09T10:00:00Z"))
+    results = ingest_accounts(accounts, llm=llm, cache_path=tmp_path / "cache.sqlite", services=services)
+
+    assert results == {"mario": {"changed_events": 1, "cancelled_events": 0},
+                       "anna": {"changed_events": 0, "cancelled_events": 1}}
+    assert len(llm.classified_texts) == 3
+
+
+def test_accounts_keep_their_calendars_and_taxonomy(tmp_path):
+    accounts = [
+        _account(tmp_path, "mario", calendars=["Pozz Work"]),
+        _account(tmp_path, "anna", work_calendars=["Lavoro"], taxonomy=["finbox-privati", "other"]),
+    ]
+    events = generate_calendar_events(40, calendars=("Pozz Work", "Pozz"))
+    services = {"mario": build_fake_calendar_service(events), "anna": _work_service(["Weekly avm-meetings"], "Lavoro")}
+
+    ingest_accounts(accounts, llm=FakeChatModel(), cache_path=None, services=services)
+
+    with open_event_store(accounts[0]["store_path"], read_only=True) as conn:
+        mario_events = query_events(conn)
+    with open_event_store(accounts[1]["store_path"], read_only=True) as conn:
+        anna_events = query_events(conn)
+
+    assert set(mario_events["calendar_name"]) == {"Pozz Work"}
+    assert len(mario_events) == sum(event["calendar_name"] == "Pozz Work" for event in events)
+    assert anna_events["event_category"].tolist() == ["other"]
+
+
+def test_fetch_concurrency_is_bounded_across_accounts(tmp_path):
+    # Lo stesso servizio per tutti gli account (con calendari diversi) misura le richieste contemporanee totali
+    service = FakeCalendarService([(f"cal{i}", f"Calendario {i}") for i in range(6)], latency=0.05)
+    for i in range(6):
+        service.upsert(f"cal{i}", make_event(f"e{i}", "Pranzo", "2025-05-01T12:00:00Z", "2025-05-01T13:00:00Z"))
+    accounts = [_account(tmp_path, f"utente{i}", calendars=[f"Calendario {2 * i}", f"Calendario {2 * i + 1}"])
+                for i in range(3)]
+
+    ingest_accounts(accounts, max_workers=2, llm=FakeChatModel(), cache_path=None,
+                    services={account["name"]: service for account in accounts})
+
+    assert service.max_in_flight == 2
+    for account in accounts:
+        with open_event_store(account["store_path"], read_only=True) as conn:
+            assert len(query_events(conn)) == 2
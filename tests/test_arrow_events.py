@@ -0,0 +1,70 @@
+import pandas as pd
+
+from event_tracking.components.arrow_events import process_calendar_events_arrow, \
+    categorize_calendar_events_arrow, export_events_ipc, open_events_ipc_view, ipc_version
+from event_tracking.components.calendar import process_calendar_events, categorize_calendar_events, categories
+from event_tracking.components.event_schema import apply_event_schema
+from event_tracking.components.event_store import open_event_store, upsert_events, query_events, to_store_frame
+from event_tracking.components.fake_llm import FakeChatModel
+from event_tracking.components.queries import category_totals, event_metrics
+from event_tracking.components.synthetic import generate_calendar_events
+
+
+def _sorted(events_df):
+    return events_df.sort_values(["calendar_name", "event_id"], ignore_index=True)
+
+
+def test_arrow_events_match_pandas_pipeline(tmp_path):
+    events = generate_calendar_events(2000, recurring_ratio=0.2)
+
+    table = categorize_calendar_events_arrow(process_calendar_events_arrow(events), llm=FakeChatModel(categories),
+                                             cache_path=tmp_path / "arrow_cache.sqlite")
+    expected = to_store_frame(categorize_calendar_events(process_calendar_events(events),
+                                                         llm=FakeChatModel(categories),
+                                                         cache_path=tmp_path / "pandas_cache.sqlite"))
+
+    # Orari con offset misti ed eventi di tutto il giorno: stessi valori dello schema compatto
+    actual = apply_event_schema(table.to_pandas())
+    actual["utc_offset_minutes"] = actual["utc_offset_minutes"].astype("Int16")
+    pd.testing.assert_frame_equal(_sorted(actual), _sorted(expected))
+
+
+def test_upsert_arrow_table(tmp_path):
+    events = generate_calendar_events(500, recurring_ratio=0.3)
+    kwargs = dict(llm=FakeChatModel(categories), cache_path=None)
+
+    arrow_conn = open_event_store(tmp_path / "arrow.duckdb")
+    upsert_events(arrow_conn, categorize_calendar_events_arrow(process_calendar_events_arrow(events), **kwargs))
+    pandas_conn = open_event_store(tmp_path / "pandas.duckdb")
+    upsert_events(pandas_conn, categorize_calendar_events(process_calendar_events(events), **kwargs))
+
+    pd.testing.assert_frame_equal(_sorted(query_events(arrow_conn)), _sorted(query_events(pandas_conn)))
+
+    # Un evento modificato sostituisce quello salvato, uno cancellato viene eliminato
+    changed = dict(events[0], summary="Modificato")
+    upsert_events(arrow_conn, process_calendar_events_arrow([changed]),
+                  deleted_keys=[(events[1]["calendar_name"], events[1]["id"])])
+    stored = query_events(arrow_conn).set_index("event_id")
+    assert len(stored) == 499
+    assert stored.loc[events[0]["id"], "summary"] == "Modificato"
+
+
+def test_events_ipc_round_trip(tmp_path):
+    conn = open_event_store(tmp_path / "events.duckdb")
+    upsert_events(conn, categorize_calendar_events(process_calendar_events(generate_calendar_events(800)),
+                                                   llm=FakeChatModel(categories), cache_path=None))
+    path = tmp_path / "events.arrow"
+
+    assert export_events_ipc(conn, path) == 800
+    version = ipc_version(path)
+
+    with open_events_ipc_view(path) as ipc_conn:
+        pd.testing.assert_frame_equal(_sorted(query_events(ipc_conn)), _sorted(query_events(conn)))
+        # Senza tabelle di rollup le aggregazioni sono calcolate sugli eventi, con lo stesso risultato
+        assert event_metrics(ipc_conn, year=2024) == event_metrics(conn, year=2024)
+        pd.testing.assert_frame_equal(category_totals(ipc_conn), category_totals(conn), check_dtype=False)
+
+    upsert_events(conn, process_calendar_events(generate_calendar_events(10, seed=1)))
+    export_events_ipc(conn, path)
+    assert ipc_version(path) != version
+    assert list(tmp_path.glob(".*.tmp")) == []
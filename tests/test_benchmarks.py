@@ -0,0 +1,120 @@
+import os
+import random
+import tracemalloc
+
+import pandas as pd
+import pytest
+
+from event_tracking.components.calendar import fetch_calendar_events, process_calendar_events, \
+    categorize_calendar_events, categories
+from event_tracking.components.classification import classify_summaries
+from event_tracking.components.dashboard import add_time_scale_columns, get_contribution_plot
+from event_tracking.components.fake_calendar import build_fake_calendar_service
+from event_tracking.components.fake_llm import FakeChatModel
+from event_tracking.components.interval_analyzer import busy_time, free_slots, focus_blocks
+from event_tracking.components.llm_backends import create_llm_backend
+from event_tracking.components.synthetic import generate_calendar_events, calendar_names
+from event_tracking.config import LOCAL_TIMEZONE
+
+# Numero di eventi dei benchmark, ad es. EVENT_TRACKING_BENCHMARK_EVENTS=1000,100000,1000000
+# Confronto tra esecuzioni: pytest tests/test_benchmarks.py --benchmark-autosave --benchmark-compare
+BENCHMARK_EVENTS = [int(n) for n in os.environ.get("EVENT_TRACKING_BENCHMARK_EVENTS", "1000").split(",")]
+BENCHMARK_CALENDARS = 20
+
+
+def _events(n):
+    return generate_calendar_events(n, calendars=calendar_names(BENCHMARK_CALENDARS), recurring_ratio=0.2)
+
+
+def _record_peak_memory(benchmark, fn, *args, **kwargs):
+    """Esegue `fn` una volta con tracemalloc e salva il picco di memoria (MB) nei risultati del benchmark"""
+    tracemalloc.start()
+    try:
+        fn(*args, **kwargs)
+        benchmark.extra_info["peak_memory_mb"] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 1)
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.mark.benchmark(group="fetch_calendar_events")
+@pytest.mark.parametrize("n", BENCHMARK_EVENTS)
+def test_benchmark_fetch_calendar_events(benchmark, n):
+    service = build_fake_calendar_service(_events(n))
+
+    _record_peak_memory(benchmark, fetch_calendar_events, service=service)
+    events = benchmark(fetch_calendar_events, service=service)
+
+    assert len(events) == n
+
+
+@pytest.mark.benchmark(group="process_calendar_events")
+@pytest.mark.parametrize("n", BENCHMARK_EVENTS)
+def test_benchmark_process_calendar_events(benchmark, n):
+    events = _events(n)
+
+    _record_peak_memory(benchmark, process_calendar_events, events)
+    events_df = benchmark(process_calendar_events, events)
+
+    assert len(events_df) == n
+
+
+@pytest.mark.benchmark(group="categorize_calendar_events")
+@pytest.mark.parametrize("n", BENCHMARK_EVENTS)
+def test_benchmark_categorize_calendar_events(benchmark, n):
+    events_df = process_calendar_events(_events(n))
+    llm = FakeChatModel(categories)
+
+    _record_peak_memory(benchmark, categorize_calendar_events, events_df, llm=llm, cache_path=None)
+    events_df_categorized = benchmark(categorize_calendar_events, events_df, llm=llm, cache_path=None)
+
+    work = events_df_categorized["calendar_name"] == "Pozz Work"
+    assert events_df_categorized.loc[work, "event_category"].notna().all()
+
+
+@pytest.mark.benchmark(group="get_contribution_plot")
+@pytest.mark.parametrize("n", BENCHMARK_EVENTS)
+def test_benchmark_get_contribution_plot(benchmark, n):
+    events_df = process_calendar_events(_events(n))
+    # Come in load_data della dashboard: orari nel fuso locale e una categoria per evento
+    events_df["start_time"] = pd.to_datetime(events_df["start_time"], utc=True).dt.tz_convert(LOCAL_TIMEZONE)
+    rng = random.Random(0)
+    events_df["event_category"] = [rng.choice(categories) for _ in range(len(events_df))]
+    events_df = add_time_scale_columns(events_df)
+
+    _record_peak_memory(benchmark, get_contribution_plot, events_df, "weekly")
+    fig = benchmark(get_contribution_plot, events_df, "weekly")
+
+    assert fig.data
+
+
+@pytest.mark.benchmark(group="interval_analyzer")
+@pytest.mark.parametrize("n", BENCHMARK_EVENTS)
+@pytest.mark.parametrize("analysis", [
+    pytest.param(lambda df: busy_time(df, period='week'), id="busy_time"),
+    pytest.param(free_slots, id="free_slots"),
+    pytest.param(focus_blocks, id="focus_blocks"),
+])
+def test_benchmark_interval_analyzer(benchmark, n, analysis):
+    # busy_time per settimana è quello calcolato da build_time_context per il contesto della chat
+    events_df = process_calendar_events(_events(n))
+    rng = random.Random(0)
+    events_df["event_category"] = [rng.choice(categories) for _ in range(len(events_df))]
+
+    _record_peak_memory(benchmark, analysis, events_df)
+    result = benchmark(analysis, events_df)
+
+    assert len(result)
+
+
+@pytest.mark.benchmark(group="classification_backend")
+@pytest.mark.parametrize("max_batch_size", [5, 20, 50])
+def test_benchmark_classification_backend(benchmark, max_batch_size):
+    # Modello locale simulato: un costo fisso per chiamata più un costo per token del prompt
+    summaries = sorted(set(process_calendar_events(_events(BENCHMARK_EVENTS[0]))["summary"]))
+    llm = create_llm_backend("fake", latency=0.01, token_latency=0.0001)
+
+    classified = benchmark.pedantic(classify_summaries, args=(llm, summaries, categories),
+                                    kwargs={**llm.classify_kwargs, "max_batch_size": max_batch_size}, rounds=3)
+
+    benchmark.extra_info.update(llm.metrics())
+    assert len(classified) == len(summaries)
@@ -12,8 +12,7 @@ def test_get_calendars_to_include():
     print(calendars_to_include)
 
 def test_fetch_calendar():
-    creds = get_google_calendar_credentials()
-    service = build('calendar', 'v3', credentials=creds)
+    service = get_calendar_service()
     calendars = fetch_all_calendars(service)
 
     print(f'Trovati {len(calendars)} calendari')
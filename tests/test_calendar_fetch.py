@@ -0,0 +1,70 @@
+import types
+
+import pytest
+from googleapiclient.errors import HttpError
+
+from event_tracking.components import calendar as calendar_module
+from event_tracking.components.calendar import fetch_calendar_events
+
+from event_tracking.components.fake_calendar import FakeCalendarService, make_event
+
+
+def _make_service(n_calendars=4, n_events=7, **kwargs):
+    service = FakeCalendarService([(f"cal{c}", f"Calendario {c}") for c in range(n_calendars)], **kwargs)
+    for c in range(n_calendars):
+        for i in range(n_events):
+            service.upsert(f"cal{c}", make_event(f"e{c}-{i}", f"Evento {i}", "2025-05-01T09:00:00Z",
+                                                 "2025-05-01T10:00:00Z"))
+    return service
+
+
+@pytest.fixture(autouse=True)
+def all_calendars(monkeypatch):
+    monkeypatch.delenv("CALENDARS_TO_INCLUDE", raising=False)
+
+
+@pytest.fixture
+def backoff_sleeps(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(calendar_module, "time", types.SimpleNamespace(sleep=sleeps.append))
+    return sleeps
+
+
+def test_fetch_drains_all_pages():
+    service = _make_service(page_size=3)
+
+    events = fetch_calendar_events(5, service=service)
+
+    assert len(events) == 4 * 7
+    assert [event["calendar_name"] for event in events[:7]] == ["Calendario 0"] * 7
+    assert sum(call["calendarId"] == "cal0" for call in service.calls) == 3
+
+
+def test_fetch_runs_calendars_concurrently():
+    service = _make_service(n_calendars=6, n_events=1, latency=0.05)
+
+    fetch_calendar_events(5, service=service, max_workers=3)
+
+    assert service.max_in_flight == 3
+
+
+def test_fetch_retries_transient_errors(backoff_sleeps):
+    service = _make_service(n_calendars=1)
+    service.fail_next(429)
+    service.fail_next(503, times=2)
+
+    events = fetch_calendar_events(5, service=service, max_workers=1)
+
+    assert len(events) == 7
+    assert len(service.calls) == 4
+    assert len(backoff_sleeps) == 3
+    assert backoff_sleeps[0] < backoff_sleeps[1] < backoff_sleeps[2]
+
+
+def test_fetch_does_not_retry_client_errors(backoff_sleeps):
+    service = _make_service(n_calendars=1)
+    service.fail_next(404)
+
+    with pytest.raises(HttpError):
+        fetch_calendar_events(5, service=service)
+    assert len(service.calls) == 1
@@ -0,0 +1,41 @@
+import pandas as pd
+import pytest
+
+from event_tracking.components.calendar import process_calendar_events, process_calendar_events_rowwise
+from event_tracking.components.event_store import to_store_frame
+from event_tracking.components.fake_calendar import make_event
+from event_tracking.components.synthetic import generate_calendar_events
+
+
+@pytest.mark.parametrize("offsets, all_day_ratio", [
+    (("+01:00", "+02:00", "Z"), 0.1),   # fusi misti ed eventi di tutto il giorno
+    (("+02:00",), 0.0),                 # un solo offset
+    (("Z",), 0.0),                      # UTC
+    (("+02:00",), 0.3),                 # un offset ed eventi di tutto il giorno
+    (("-05:00",), 1.0),                 # solo eventi di tutto il giorno
+])
+def test_process_calendar_events_matches_rowwise(offsets, all_day_ratio):
+    events = generate_calendar_events(2000, offsets=offsets, all_day_ratio=all_day_ratio, recurring_ratio=0.3)
+
+    # Stessi valori dell'implementazione di riferimento allineata allo schema compatto,
+    # compreso l'offset locale delle occorrenze ricorrenti
+    pd.testing.assert_frame_equal(process_calendar_events(events), _expected(events))
+
+
+def test_process_calendar_events_empty():
+    result = process_calendar_events([])
+
+    assert result.empty
+    assert list(result.columns) == list(_expected(generate_calendar_events(1)).columns)
+
+
+def test_process_calendar_events_fractional_seconds():
+    # RFC3339 ammette la frazione di secondo prima del fuso orario
+    events = [make_event("a", "Frazione", "2024-03-01T10:00:00.000+01:00", "2024-03-01T10:30:00.250+01:00"),
+              make_event("b", "UTC", "2024-03-01T09:00:00.5Z", "2024-03-01T10:00:00Z")]
+
+    pd.testing.assert_frame_equal(process_calendar_events(events), _expected(events))
+
+
+def _expected(events):
+    return to_store_frame(process_calendar_events_rowwise(events)).sort_index().drop(columns="event_category")
@@ -0,0 +1,117 @@
+import datetime
+
+import pandas as pd
+
+from event_tracking.components.calendar import fetch_calendar_events_incremental, process_calendar_events
+from event_tracking.components.event_store import open_event_store, upsert_events, query_events, \
+    load_store_sync_tokens
+from event_tracking.components.fake_calendar import FakeCalendarService, make_event
+
+
+def _make_service():
+    service = FakeCalendarService([("work", "Pozz Work"), ("home", "Pozz")], page_size=2)
+    for i in range(5):
+        service.upsert("work", make_event(f"w{i}", f"Meeting {i}", f"2025-05-0{i + 1}T09:00:00Z",
+                                          f"2025-05-0{i + 1}T10:00:00Z"))
+    service.upsert("home", make_event("h0", "Palestra", "2025-05-01T18:00:00Z", "2025-05-01T19:00:00Z"))
+    return service
+
+
+def _store_changes(conn, sync):
+    """
+    Salva nel database le modifiche di fetch_calendar_events_incremental, come run_incremental_update
+    """
+    active_events = [event for event in sync["events"] if event.get("status") != "cancelled"]
+    upsert_events(conn, process_calendar_events(active_events) if active_events else None,
+                  deleted_keys=[(event["calendar_name"], event["id"])
+                                for event in sync["events"] if event.get("status") == "cancelled"],
+                  replace_calendars=sync["full_sync_calendars"], replace_time_min=sync["full_sync_time_min"],
+                  sync_tokens=sync["sync_tokens"])
+
+
+def test_incremental_sync_merges_changes(monkeypatch, tmp_path):
+    monkeypatch.delenv("CALENDARS_TO_INCLUDE", raising=False)
+    service = _make_service()
+    conn = open_event_store(tmp_path / "events.duckdb")
+
+    initial = fetch_calendar_events_incremental(load_store_sync_tokens(conn), service=service)
+    _store_changes(conn, initial)
+    assert len(query_events(conn)) == 6
+    assert sorted(initial["full_sync_calendars"]) == ["Pozz", "Pozz Work"]
+
+    service.upsert("work", make_event("w1", "Meeting spostato", "2025-05-02T11:00:00Z", "2025-05-02T12:30:00Z"))
+    service.upsert("work", make_event("w9", "Nuovo meeting", "2025-05-09T09:00:00Z", "2025-05-09T09:30:00Z"))
+    service.cancel("work", "w3")
+
+    changes = fetch_calendar_events_incremental(load_store_sync_tokens(conn), service=service)
+    assert changes["full_sync_calendars"] == []
+    assert sorted(event["id"] for event in changes["events"]) == ["w1", "w3", "w9"]
+    assert all("timeMin" not in call for call in service.calls if call.get("syncToken") is not None)
+
+    _store_changes(conn, changes)
+    merged = query_events(conn)
+    expected = process_calendar_events(
+        [dict(event, calendar_name=name, calendar_id=cal_id)
+         for cal_id, name in [("work", "Pozz Work"), ("home", "Pozz")]
+         for event in service.calendar_events[cal_id].values()]
+    )
+
+    key = ["calendar_name", "event_id"]
+    columns = [column for column in merged.columns if column != "event_category"]
+    pd.testing.assert_frame_equal(merged.sort_values(key, ignore_index=True)[columns],
+                                  expected.sort_values(key, ignore_index=True)[columns], check_categorical=False)
+    assert merged.loc[merged["event_id"] == "w1", "duration_minutes"].item() == 90
+
+
+def test_incremental_sync_full_resync_on_expired_token(monkeypatch, tmp_path):
+    monkeypatch.delenv("CALENDARS_TO_INCLUDE", raising=False)
+    service = _make_service()
+    conn = open_event_store(tmp_path / "events.duckdb")
+
+    # Finestra che comprende gli eventi: fuori dalla finestra lo storico resterebbe
+    days = (datetime.datetime.utcnow() - datetime.datetime(2025, 5, 1)).days + 30
+    _store_changes(conn, fetch_calendar_events_incremental({}, time_period_days=days, service=service))
+
+    service.cancel("home", "h0")
+    service.expire_sync_tokens()
+
+    changes = fetch_calendar_events_incremental(load_store_sync_tokens(conn), time_period_days=days, service=service)
+    assert sorted(changes["full_sync_calendars"]) == ["Pozz", "Pozz Work"]
+
+    _store_changes(conn, changes)
+    assert sorted(query_events(conn)["event_id"]) == ["w0", "w1", "w2", "w3", "w4"]
+
+
+def test_sync_tokens_saved_with_events(tmp_path):
+    conn = open_event_store(tmp_path / "events.duckdb")
+    assert load_store_sync_tokens(conn) == {}
+
+    upsert_events(conn, sync_tokens={"work": "42"})
+    upsert_events(conn, sync_tokens={"home": "7"})
+    assert load_store_sync_tokens(conn) == {"work": "42", "home": "7"}
+
+
+def test_full_resync_keeps_history_before_window(monkeypatch, tmp_path):
+    monkeypatch.delenv("CALENDARS_TO_INCLUDE", raising=False)
+    now = datetime.datetime.utcnow().replace(microsecond=0)
+
+    def event(event_id, days_ago):
+        start = now - datetime.timedelta(days=days_ago)
+        return make_event(event_id, f"Evento {event_id}", start.isoformat() + "Z",
+                          (start + datetime.timedelta(hours=1)).isoformat() + "Z")
+
+    service = FakeCalendarService([("work", "Pozz Work")], filter_time_min=True)
+    for event_id, days_ago in [("old", 400), ("recent", 5), ("gone", 3)]:
+        service.upsert("work", event(event_id, days_ago))
+
+    conn = open_event_store(tmp_path / "events.duckdb")
+    _store_changes(conn, fetch_calendar_events_incremental({}, time_period_days=1000, service=service))
+
+    # Token scaduto: la risincronizzazione copre solo gli ultimi 30 giorni
+    service.cancel("work", "gone")
+    service.expire_sync_tokens()
+    changes = fetch_calendar_events_incremental(load_store_sync_tokens(conn), time_period_days=30, service=service)
+    assert sorted(event["id"] for event in changes["events"]) == ["recent"]
+
+    _store_changes(conn, changes)
+    assert sorted(query_events(conn)["event_id"]) == ["old", "recent"]
@@ -0,0 +1,73 @@
+import time
+
+from event_tracking.components.calendar import categories
+from event_tracking.components.classification import build_classification_batches, classify_summaries, \
+    parse_classification_response, RateLimiter
+from event_tracking.components.fake_llm import FakeChatModel
+
+
+def test_batches_respect_size_and_token_budget():
+    short = [f"t{i}" for i in range(10)]
+    assert [len(batch) for batch in build_classification_batches(short, max_batch_size=4)] == [4, 4, 2]
+
+    long = ["x" * 400] * 6
+    assert [len(batch) for batch in build_classification_batches(long, max_batch_tokens=250)] == [2, 2, 2]
+
+    assert build_classification_batches([]) == []
+
+
+def test_parse_response_by_index():
+    content = "\n".join([
+        "Ecco la classificazione:",
+        "2) Finbox-Meetings",
+        "- 1: **other**",
+        "3. categoria-inventata",
+        "9. other",
+    ])
+
+    assert parse_classification_response(content, 4, categories) == ["other", "finbox-meetings", None, None]
+
+
+def test_classify_summaries_runs_batches_concurrently():
+    summaries = [f"finbox-privati {i}" for i in range(16)]
+    llm = FakeChatModel(categories, latency=0.05)
+
+    result = classify_summaries(llm, summaries, categories, max_batch_size=2, max_workers=4,
+                                requests_per_minute=60_000)
+
+    assert result == {summary: "finbox-privati" for summary in summaries}
+    assert llm.max_in_flight == 4
+
+
+def test_classify_summaries_retries_only_failed_items():
+    summaries = [f"avm-meetings {i}" for i in range(6)]
+    llm = FakeChatModel(categories, fail_calls={0}, drop_texts={"avm-meetings 4": 1})
+
+    result = classify_summaries(llm, summaries, categories, max_batch_size=3, max_workers=1,
+                                requests_per_minute=60_000, backoff_seconds=0)
+
+    assert result == {summary: "avm-meetings" for summary in summaries}
+    # batch fallito ripetuto per intero, per il secondo batch solo il titolo mancante
+    assert llm.classified_texts.count("avm-meetings 0") == 2
+    assert llm.classified_texts.count("avm-meetings 3") == 1
+    assert llm.classified_texts.count("avm-meetings 4") == 2
+
+
+def test_classify_summaries_splits_persistently_failing_batches():
+    summaries = ["avm-meetings a", "avm-meetings b", "avm-meetings c", "avm-meetings d"]
+    llm = FakeChatModel(categories, drop_texts={"avm-meetings c": 100})
+
+    result = classify_summaries(llm, summaries, categories, max_retries=1, requests_per_minute=60_000,
+                                backoff_seconds=0)
+
+    assert result == {summary: "avm-meetings" for summary in summaries if summary != "avm-meetings c"}
+
+
+def test_rate_limiter_spaces_calls():
+    limiter = RateLimiter(requests_per_minute=1200)
+
+    start = time.monotonic()
+    for _ in range(4):
+        limiter.acquire()
+
+    assert time.monotonic() - start >= 0.15
@@ -0,0 +1,72 @@
+import pandas as pd
+
+from event_tracking.components.calendar import categorize_calendar_events, categories
+from event_tracking.components.classification_cache import open_classification_cache, store_categories, \
+    get_cached_categories, evict_classification_cache, normalize_summary
+from event_tracking.components.fake_llm import FakeChatModel
+
+
+def _events_df(summaries, calendar_name="Pozz Work"):
+    return pd.DataFrame({"event_id": [f"e{i}" for i in range(len(summaries))],
+                         "summary": summaries, "calendar_name": calendar_name})
+
+
+def test_categorize_uses_cache_for_known_summaries(tmp_path):
+    cache_path = tmp_path / "cache.sqlite"
+    llm = FakeChatModel(categories)
+
+    first = categorize_calendar_events(_events_df(["finbox-meetings sync", "Pranzo", "avm-meetings"]),
+                                       llm=llm, cache_path=cache_path)
+    assert sorted(llm.classified_texts) == ["Pranzo", "avm-meetings", "finbox-meetings sync"]
+
+    llm = FakeChatModel(categories)
+    second = categorize_calendar_events(
+        _events_df(["finbox-meetings sync", "  AVM-meetings ", "dss-best-practices review"]),
+        llm=llm, cache_path=cache_path
+    )
+
+    assert llm.classified_texts == ["dss-best-practices review"]
+    assert first["event_category"].tolist() == ["finbox-meetings", "other", "avm-meetings"]
+    assert second["event_category"].tolist() == ["finbox-meetings", "avm-meetings", "dss-best-practices"]
+
+
+def test_categorize_keeps_other_taxonomies_in_cache(tmp_path, monkeypatch):
+    cache_path = tmp_path / "cache.sqlite"
+    categorize_calendar_events(_events_df(["finbox-privati call"]), llm=FakeChatModel(categories),
+                               cache_path=cache_path)
+
+    new_categories = categories[:-1] + ["new-project", "other"]
+    monkeypatch.setattr("event_tracking.components.calendar.categories", new_categories)
+    llm = FakeChatModel(new_categories)
+    categorize_calendar_events(_events_df(["finbox-privati call"]), llm=llm, cache_path=cache_path)
+
+    assert llm.classified_texts == ["finbox-privati call"]
+    # La cache è condivisa: la classificazione della tassonomia precedente (di un altro account) resta
+    conn = open_classification_cache(cache_path)
+    assert get_cached_categories(conn, ["finbox-privati call"], categories, "fake-chat-model", 1) == \
+        {"finbox-privati call": "finbox-privati"}
+    assert conn.execute("SELECT COUNT(*) FROM classification_cache").fetchone()[0] == 2
+
+
+def test_categorize_only_classifies_work_calendar(tmp_path):
+    llm = FakeChatModel(categories)
+    events_df = pd.concat([_events_df(["avm-meetings"]), _events_df(["Palestra"], calendar_name="Pozz")])
+
+    result = categorize_calendar_events(events_df, llm=llm, cache_path=None)
+
+    assert llm.classified_texts == ["avm-meetings"]
+    assert result["event_category"].tolist()[0] == "avm-meetings"
+    assert pd.isna(result["event_category"].tolist()[1])
+
+
+def test_cache_lru_eviction(tmp_path):
+    conn = open_classification_cache(tmp_path / "cache.sqlite")
+    store_categories(conn, {f"titolo {i}": "other" for i in range(5)}, categories, "m", 1)
+    get_cached_categories(conn, ["titolo 0"], categories, "m", 1)
+
+    assert evict_classification_cache(conn, max_entries=1) == 4
+    assert get_cached_categories(conn, [f"titolo {i}" for i in range(5)], categories, "m", 1) == {"titolo 0": "other"}
+
+
+def test_normalize_summary():
+    assert normalize_summary("  Weekly   SYNC ") == "weekly sync"
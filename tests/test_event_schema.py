@@ -0,0 +1,42 @@
+import pandas as pd
+
+from event_tracking.components.calendar import process_calendar_events_rowwise
+from event_tracking.components.event_schema import EVENT_DTYPES, apply_event_schema
+from event_tracking.components.event_store import open_event_store, upsert_events, query_events
+from event_tracking.components.parquet_dataset import append_events_dataset, read_events_dataset
+from event_tracking.components.synthetic import generate_calendar_events
+
+
+def _events_df(n=2000):
+    # Colonne object e float come nel DataFrame costruito evento per evento
+    events_df = process_calendar_events_rowwise(generate_calendar_events(n))
+    events_df["event_category"] = "other"
+    return events_df
+
+
+def _assert_schema(df):
+    for column, dtype in EVENT_DTYPES.items():
+        assert df[column].dtype == dtype, column
+
+
+def test_schema_is_compact_and_lossless():
+    events_df = _events_df()
+
+    compact = apply_event_schema(events_df)
+
+    _assert_schema(compact)
+    assert compact.memory_usage(deep=True).sum() < events_df.memory_usage(deep=True).sum() / 3
+    assert compact["hour_of_day"].isna().sum() == events_df["all_day"].sum()
+    assert (compact["start_time"] == pd.to_datetime(events_df["start_time"], utc=True)).all()
+    assert compact["summary"].isna().sum() == events_df["summary"].isna().sum()
+    assert compact["day_of_week"].min() == "Monday"
+
+
+def test_schema_enforced_on_read(tmp_path):
+    events_df = _events_df()
+    conn = open_event_store(tmp_path / "events.duckdb")
+    upsert_events(conn, events_df)
+    append_events_dataset(events_df, tmp_path / "dataset")
+
+    _assert_schema(query_events(conn))
+    _assert_schema(read_events_dataset(tmp_path / "dataset"))
@@ -0,0 +1,100 @@
+import pandas as pd
+import pytest
+
+from event_tracking.components.event_store import open_event_store, upsert_events, query_events, list_years, \
+    list_calendars, load_store_sync_tokens, import_parquet_snapshot, store_data_version, query_events_page, \
+    store_identity
+
+
+def test_upsert_replaces_and_deletes(tmp_path, make_events_df):
+    conn = open_event_store(tmp_path / "events.duckdb")
+    events_df = make_events_df()
+    upsert_events(conn, events_df, sync_tokens={"work": "1"})
+    upsert_events(conn, events_df)
+
+    assert conn.execute("SELECT COUNT(*) FROM events").fetchone()[0] == len(events_df)
+
+    changed = events_df.iloc[:2].copy()
+    changed["summary"] = "Modificato"
+    deleted = events_df.iloc[2]
+    upsert_events(conn, changed, deleted_keys=[(deleted["calendar_name"], deleted["event_id"])],
+                  replace_calendars=["Giulia"], sync_tokens={"work": "2"})
+
+    stored = query_events(conn)
+    expected_ids = set(events_df.loc[events_df["calendar_name"] != "Giulia", "event_id"]) \
+        - {deleted["event_id"]} | set(changed["event_id"])
+    assert set(stored["event_id"]) == expected_ids
+    assert (stored.set_index("event_id").loc[list(changed["event_id"]), "summary"] == "Modificato").all()
+    assert load_store_sync_tokens(conn) == {"work": "2"}
+
+
+def test_query_reads_only_requested_slice(tmp_path, make_events_df):
+    conn = open_event_store(tmp_path / "events.duckdb")
+    events_df = make_events_df()
+    upsert_events(conn, events_df)
+
+    result = query_events(conn, year=2024, calendars=["Pozz Work"], columns=["event_id", "start_time"])
+
+    expected = events_df[(events_df["year"] == 2024) & (events_df["calendar_name"] == "Pozz Work")]
+    assert list(result.columns) == ["event_id", "start_time"]
+    assert sorted(result["event_id"]) == sorted(expected["event_id"])
+    assert result["start_time"].is_monotonic_increasing
+    assert list_years(conn) == sorted(events_df["year"].unique().tolist())
+    assert list_calendars(conn) == sorted(events_df["calendar_name"].unique().tolist())
+
+    window = query_events(conn, start="2024-03-01", end="2024-04-01")
+    assert window["start_time"].between(pd.Timestamp("2024-03-01", tz="UTC"),
+                                        pd.Timestamp("2024-04-01", tz="UTC"), inclusive="left").all()
+
+
+def test_query_events_page(tmp_path, make_events_df):
+    conn = open_event_store(tmp_path / "events.duckdb")
+    upsert_events(conn, make_events_df())
+    events = query_events(conn, year=2024)
+    expected = events.sort_values(["duration_minutes", "calendar_name", "event_id"], ascending=[False, True, True],
+                                  na_position="last")
+
+    pages = [query_events_page(conn, year=2024, columns=["event_id", "duration_minutes"], sort_by="duration_minutes",
+                               descending=True, offset=offset, limit=40)
+             for offset in range(0, len(events) + 40, 40)]
+
+    assert all(total == len(events) for _, total in pages)
+    assert all(len(page) <= 40 and list(page.columns) == ["event_id", "duration_minutes"] for page, _ in pages)
+    assert pages[-1][0].empty
+    assert pd.concat([page for page, _ in pages])["event_id"].tolist() == expected["event_id"].tolist()
+
+    with pytest.raises(ValueError):
+        query_events_page(conn, sort_by="start_time; DROP TABLE single_events")
+
+
+def test_import_parquet_snapshot(tmp_path, make_events_df):
+    events_df = make_events_df(50)
+    file_path = tmp_path / "my_calendar_db_20250508.parquet"
+    events_df.assign(start_time=pd.to_datetime(events_df["start_time"], utc=True),
+                     end_time=pd.to_datetime(events_df["end_time"], utc=True)).to_parquet(file_path)
+
+    conn = open_event_store(tmp_path / "events.duckdb")
+    import_parquet_snapshot(conn, file_path)
+
+    assert conn.execute("SELECT COUNT(*) FROM events").fetchone()[0] == 50
+
+
+def test_data_version_changes_on_write(tmp_path, make_events_df):
+    conn = open_event_store(tmp_path / "events.duckdb")
+    version = store_data_version(conn)
+
+    upsert_events(conn, make_events_df(20))
+    assert store_data_version(conn) > version
+    conn.close()
+
+    # La versione è salvata nel database e leggibile anche in sola lettura (come dalla dashboard)
+    with open_event_store(tmp_path / "events.duckdb", read_only=True) as conn:
+        assert store_data_version(conn) == version + 1
+        identity = store_identity(conn)
+
+    # Un database ricreato riparte dalla stessa versione, ma con un'altra identità
+    (tmp_path / "events.duckdb").unlink()
+    with open_event_store(tmp_path / "events.duckdb") as conn:
+        upsert_events(conn, make_events_df(20))
+        assert store_data_version(conn) == version + 1
+        assert store_identity(conn) not in (None, identity)
@@ -0,0 +1,46 @@
+import os
+import re
+import sys
+import subprocess
+
+import pytest
+
+# Budget in secondi per l'import a freddo del modulo (pandas da solo richiede circa 0.4s)
+IMPORT_TIME_BUDGET_SECONDS = 1.5
+
+HEAVY_MODULES = ["googleapiclient.discovery", "google.oauth2.credentials", "google_auth_oauthlib",
+                 "langchain", "langchain_openai", "openai"]
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+\d+ \|\s+(\d+) \| (\s*)(\S+)")
+
+
+def _run_import(code):
+    env = {key: value for key, value in os.environ.items() if key != "OPENAI_API_KEY"}
+    return subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          capture_output=True, text=True, env=env, check=True)
+
+
+def _cumulative_import_time(stderr, module):
+    """Tempo cumulativo (in secondi) dell'import di primo livello di `module` dall'output di -X importtime"""
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match and match.group(3) == module and not match.group(2):
+            return int(match.group(1)) / 1e6
+    raise AssertionError(f"{module} non trovato nell'output di -X importtime")
+
+
+def test_calendar_import_has_no_side_effects():
+    result = _run_import(
+        "import sys, event_tracking.components.calendar; "
+        f"print([m for m in {HEAVY_MODULES!r} if m in sys.modules])"
+    )
+
+    assert result.stdout.strip() == "[]"
+
+
+@pytest.mark.parametrize("module", ["event_tracking.components.calendar",
+                                    "event_tracking.components.event_analyzer"])
+def test_import_time_budget(module):
+    result = _run_import(f"import {module}")
+
+    assert _cumulative_import_time(result.stderr, module) < IMPORT_TIME_BUDGET_SECONDS
@@ -0,0 +1,125 @@
+import sys
+import json
+import pstats
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from event_tracking.components.calendar import categories
+from event_tracking.components.fake_calendar import build_fake_calendar_service
+from event_tracking.components.instrumentation import pipeline_run, stage, increment, add_rows, \
+    read_metrics_jsonl, prometheus_metrics, in_current_context
+from event_tracking.components.llm_backends import LLMBackend
+from event_tracking.components.fake_llm import FakeChatModel
+from event_tracking.components.refresh import refresh_once
+from event_tracking.components.synthetic import generate_calendar_events
+
+
+def test_stages_and_counters(tmp_path):
+    # Fuori da un'esecuzione fasi e contatori non fanno nulla
+    with stage("process"):
+        increment("api_pages")
+
+    with pipeline_run("test", metrics_path=tmp_path / "metrics.jsonl") as run:
+        for _ in range(2):
+            with stage("process"):
+                add_rows(100)
+                increment("api_pages", 3)
+
+    summary = read_metrics_jsonl(tmp_path / "metrics.jsonl")[-1]
+    assert summary["run"] == "test" and summary["run_id"] == run.run_id
+    assert summary["counters"] == {"api_pages": 6}
+    process = summary["stages"]["process"]
+    assert process["calls"] == 2 and process["rows"] == 200 and process["counters"] == {"api_pages": 6}
+    assert process["rows_per_second"] > 0 and process["max_rss_mb"] > 0
+
+
+def test_without_resource_module(tmp_path):
+    # Su Windows il modulo resource non esiste: i moduli della pipeline si importano comunque
+    # e le misure di memoria vengono da tracemalloc, se attivo, o mancano
+    code = (
+        "import sys, json, tracemalloc; sys.modules['resource'] = None\n"
+        "import event_tracking.components.calendar\n"
+        "from event_tracking.components.instrumentation import pipeline_run, stage, prometheus_metrics\n"
+        "summaries = []\n"
+        "for tracing in [False, True]:\n"
+        "    if tracing:\n"
+        "        tracemalloc.start()\n"
+        "    with pipeline_run('test', metrics_path=None) as run:\n"
+        "        with stage('process'):\n"
+        "            data = list(range(100000))\n"
+        "    summary = run.summary()\n"
+        "    summaries.append([summary['max_rss_mb'], summary['stages']['process']['max_rss_mb'],\n"
+        "                      'max_rss_bytes' in prometheus_metrics(summary)])\n"
+        "print(json.dumps(summaries))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+
+    untraced, traced = json.loads(result.stdout)
+    assert untraced == [None, None, False]
+    assert traced[0] > 0 and traced[1] > 0 and traced[2]
+
+
+def test_concurrent_runs_are_separate(tmp_path):
+    # Due esecuzioni in thread diversi (ad es. due sessioni della dashboard) non si mescolano;
+    # i thread di un pool ricevono l'esecuzione e la fase del chiamante
+    both_open = threading.Barrier(2)
+
+    def run(name, pages):
+        with pipeline_run(name, metrics_path=tmp_path / f"{name}.jsonl"):
+            with stage("fetch"):
+                both_open.wait()
+                with ThreadPoolExecutor(max_workers=2) as executor:
+                    list(executor.map(in_current_context(increment), ["api_pages"] * pages))
+
+    threads = [threading.Thread(target=run, args=(name, pages)) for name, pages in [("a", 2), ("b", 5)]]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for name, pages in [("a", 2), ("b", 5)]:
+        summary = read_metrics_jsonl(tmp_path / f"{name}.jsonl")[-1]
+        assert summary["counters"] == {"api_pages": pages}
+        assert summary["stages"]["fetch"]["counters"] == {"api_pages": pages}
+
+
+def test_refresh_records_pipeline_metrics(tmp_path):
+    service = build_fake_calendar_service(generate_calendar_events(500), page_size=100)
+    llm = LLMBackend(FakeChatModel(categories), "fake-chat-model", max_concurrency=4)
+    paths = dict(store_path=tmp_path / "events.duckdb", snapshot_path=tmp_path / "snapshot.duckdb",
+                 lock_path=tmp_path / "refresh.lock", metrics_path=tmp_path / "metrics.jsonl",
+                 prometheus_path=tmp_path / "metrics.prom")
+
+    refresh_once(service=service, llm=llm, cache_path=tmp_path / "cache.sqlite", **paths)
+    refresh_once(service=service, llm=llm, cache_path=tmp_path / "cache.sqlite", **paths)
+
+    first, second = read_metrics_jsonl(paths["metrics_path"])
+    assert set(first["stages"]) == {"fetch", "process", "categorize", "store", "publish"}
+    assert first["stages"]["fetch"]["rows"] == 500
+    assert first["stages"]["store"]["rows"] == 500
+    assert first["counters"]["api_pages"] >= 5
+    assert first["counters"]["api_requests"] == first["counters"]["api_pages"]
+    assert first["counters"]["llm_calls"] > 0 and first["counters"]["llm_prompt_tokens"] > 0
+    assert first["stages"]["categorize"]["counters"]["llm_calls"] == first["counters"]["llm_calls"]
+    assert first["classification_cache_hit_rate"] == 0
+    # Il secondo aggiornamento non ha modifiche: nessuna fase di classificazione
+    assert "categorize" not in second["stages"] and second["stages"]["fetch"]["rows"] == 0
+
+    prometheus = paths["prometheus_path"].read_text()
+    assert prometheus == prometheus_metrics(second)
+    assert 'event_tracking_stage_seconds{run="refresh",stage="fetch"}' in prometheus
+    assert 'event_tracking_api_pages_total{run="refresh"}' in prometheus
+
+
+def test_profile_stage(tmp_path):
+    with pipeline_run("test", metrics_path=None, profile_stages=["process"]) as run:
+        run.profiles_dir = tmp_path
+        with stage("process"):
+            sum(range(1000))
+        with stage("store"):
+            pass
+
+    profiles = list(tmp_path.glob("*.prof"))
+    assert [path.name for path in profiles] == [f"test_{run.run_id}_process.prof"]
+    assert pstats.Stats(str(profiles[0])).total_calls > 0
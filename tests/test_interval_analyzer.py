@@ -0,0 +1,106 @@
+import random
+from collections import defaultdict
+
+import pandas as pd
+import pytest
+
+from event_tracking.components.interval_analyzer import merge_intervals, busy_time, overlapping_events, \
+    free_slots, focus_blocks
+from event_tracking.config import LOCAL_TIMEZONE
+
+
+def _random_events(n=300, seed=0):
+    """Eventi casuali al minuto, spesso sovrapposti e a volte a cavallo della mezzanotte"""
+    rng = random.Random(seed)
+    base = pd.Timestamp("2024-03-25", tz=LOCAL_TIMEZONE)
+    rows = []
+    for i in range(n):
+        start = base + pd.Timedelta(minutes=rng.randrange(0, 14 * 24 * 60))
+        rows.append({
+            "event_id": f"e{i}",
+            "summary": f"Evento {i}",
+            "calendar_name": rng.choice(["Pozz Work", "Personal"]),
+            "event_category": rng.choice(["meeting", "coding"]),
+            "start_time": start.tz_convert("UTC"),
+            "end_time": (start + pd.Timedelta(minutes=rng.randrange(0, 300))).tz_convert("UTC"),
+            "all_day": False,
+        })
+    return pd.DataFrame(rows)
+
+
+def _minutes(row):
+    return pd.date_range(row["start_time"], row["end_time"] - pd.Timedelta(minutes=1), freq="min")
+
+
+def test_merge_intervals():
+    codes, starts, ends = merge_intervals([5, 1, 2, 10, 12], [6, 3, 4, 12, 13])
+    assert starts.tolist() == [1, 5, 10] and ends.tolist() == [4, 6, 13]
+
+    _, starts, ends = merge_intervals([1, 5], [3, 6], max_gap=2)
+    assert starts.tolist() == [1] and ends.tolist() == [6]
+
+
+@pytest.mark.parametrize("period, by", [("day", None), ("week", ["calendar_name"]), ("day", ["event_category"])])
+def test_busy_time_matches_minute_grid(period, by):
+    events_df = _random_events()
+
+    busy, scheduled = defaultdict(set), defaultdict(float)
+    for _, row in events_df.iterrows():
+        for minute in _minutes(row):
+            day = minute.tz_convert(LOCAL_TIMEZONE).tz_localize(None).normalize()
+            key = (*(row[column] for column in by or []),
+                   day if period == "day" else day - pd.Timedelta(days=day.weekday()))
+            busy[key].add(minute)
+            scheduled[key] += 1
+
+    result = busy_time(events_df, period=period, by=by)
+
+    assert {tuple(key): minutes for *key, minutes in
+            result[[*(by or []), "period", "busy_minutes"]].itertuples(index=False)} == \
+        {key: len(minutes) for key, minutes in busy.items()}
+    assert dict(zip(map(tuple, result[[*(by or []), "period"]].to_numpy()), result["scheduled_minutes"])) == \
+        dict(scheduled)
+    assert (result["overlap_minutes"] >= 0).all()
+
+
+def test_overlapping_events_matches_brute_force():
+    events_df = _random_events()
+    minutes = {row["event_id"]: set(_minutes(row)) for _, row in events_df.iterrows()}
+
+    expected = {}
+    for a, b in [(a, b) for a in minutes for b in minutes if a < b]:
+        if minutes[a] & minutes[b]:
+            expected[a, b] = len(minutes[a] & minutes[b])
+
+    pairs = overlapping_events(events_df)
+    assert {tuple(sorted((a, b))): m for a, b, m in
+            pairs[["event_id_a", "event_id_b", "overlap_minutes"]].itertuples(index=False)} == expected
+    assert (pairs["overlap_end"] > pairs["overlap_start"]).all()
+
+
+def test_free_slots_and_focus_blocks():
+    def event(start, end, category="coding", all_day=False):
+        return {"calendar_name": "Pozz Work", "event_category": category, "all_day": all_day,
+                "start_time": pd.Timestamp(start, tz=LOCAL_TIMEZONE), "end_time": pd.Timestamp(end, tz=LOCAL_TIMEZONE)}
+
+    events_df = pd.DataFrame([
+        event("2024-04-01 08:00", "2024-04-01 10:00"),
+        event("2024-04-01 10:15", "2024-04-01 11:00"),
+        event("2024-04-01 10:30", "2024-04-01 12:00", "meeting"),
+        event("2024-04-01 17:50", "2024-04-02 09:30", "meeting"),
+        # Gli eventi di tutto il giorno non occupano tempo
+        event("2024-04-02", "2024-04-03", "other", all_day=True),
+    ])
+
+    slots = free_slots(events_df, min_minutes=15)
+    assert slots[["slot_start", "slot_end"]].astype(str).values.tolist() == [
+        ["2024-04-01 10:00:00+02:00", "2024-04-01 10:15:00+02:00"],
+        ["2024-04-01 12:00:00+02:00", "2024-04-01 17:50:00+02:00"],
+        ["2024-04-02 09:30:00+02:00", "2024-04-02 18:00:00+02:00"],
+    ]
+
+    blocks = focus_blocks(events_df, max_gap_minutes=15)
+    assert blocks[["event_category", "minutes", "n_events"]].values.tolist() == [
+        ["coding", 180, 2], ["meeting", 90, 1], ["meeting", 940, 1],
+    ]
+
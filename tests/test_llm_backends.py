@@ -0,0 +1,63 @@
+from event_tracking.components.calendar import process_calendar_events, categorize_calendar_events, categories
+from event_tracking.components.classification import classify_summaries
+from event_tracking.components.event_analyzer import stream_time_analysis
+from event_tracking.components.fake_llm import FakeChatModel, FAKE_ANALYSIS_ANSWER, start_fake_llm_server
+from event_tracking.components.llm_backends import LLMBackend, create_llm_backend
+from event_tracking.components.synthetic import generate_calendar_events
+
+
+def _work_summaries(n=40):
+    return [f"Riunione {categories[i % len(categories)]} {i}" for i in range(n)]
+
+
+def test_fake_backend_classifies_and_records_metrics():
+    events_df = process_calendar_events(generate_calendar_events(300))
+    llm = create_llm_backend("fake")
+
+    categorized = categorize_calendar_events(events_df, llm=llm, cache_path=None, similarity_threshold=None)
+
+    work = categorized["calendar_name"] == "Pozz Work"
+    assert categorized.loc[work, "event_category"].notna().all()
+    metrics = llm.metrics()
+    assert metrics["calls"] > 0 and metrics["errors"] == 0
+    assert metrics["prompt_tokens"] > metrics["completion_tokens"] > 0
+
+
+def test_backend_limits_concurrency():
+    fake = FakeChatModel(categories, latency=0.02)
+    llm = LLMBackend(fake, "fake-chat-model", max_concurrency=2)
+
+    classified = classify_summaries(llm, _work_summaries(), categories, max_batch_size=2, max_workers=8,
+                                    requests_per_minute=60000)
+
+    assert len(classified) == 40
+    assert fake.max_in_flight == 2
+    assert llm.metrics()["calls"] == 20
+
+
+def test_backend_counts_errors():
+    llm = LLMBackend(FakeChatModel(categories, fail_calls=[0]), "fake-chat-model")
+
+    classified = classify_summaries(llm, _work_summaries(4), categories, backoff_seconds=0)
+
+    assert len(classified) == 4
+    assert llm.metrics()["errors"] == 1
+
+
+def test_local_backend_over_http():
+    fake = FakeChatModel()
+    server, base_url = start_fake_llm_server(fake)
+    try:
+        llm = create_llm_backend("local", base_url=base_url)
+
+        classified = classify_summaries(llm, _work_summaries(), categories, **llm.classify_kwargs)
+        answer = "".join(stream_time_analysis(llm, "Panoramica:", "Come ho usato il tempo?"))
+    finally:
+        server.shutdown()
+
+    assert classified == {summary: fake.classify(summary, categories) for summary in _work_summaries()}
+    assert answer == FAKE_ANALYSIS_ANSWER
+    # Batch da 20 titoli per il modello locale, più la chiamata della chat
+    metrics = llm.metrics()
+    assert metrics["calls"] == 3
+    assert metrics["prompt_tokens"] > 0 and metrics["completion_tokens"] > 0
@@ -0,0 +1,92 @@
+import os
+
+import pandas as pd
+
+from event_tracking.components.event_store import open_event_store, upsert_events, query_events
+from event_tracking.components.parquet_dataset import append_events_dataset, compact_events_dataset, \
+    read_events_dataset, open_events_dataset_view, store_partitions, export_store_partitions, dataset_version
+from event_tracking.components.queries import event_metrics
+
+
+def _files(root):
+    return [os.path.join(dirpath, name) for dirpath, _, names in os.walk(root) for name in names]
+
+
+def test_read_prunes_partitions(tmp_path, make_events_df):
+    root = tmp_path / "dataset"
+    events_df = make_events_df(500)
+    append_events_dataset(events_df, root)
+
+    result = read_events_dataset(root, year=2024, calendars=["Pozz Work"], columns=["event_id", "start_time"])
+
+    expected = events_df[(events_df["year"] == 2024) & (events_df["calendar_name"] == "Pozz Work")]
+    assert sorted(result["event_id"]) == sorted(expected["event_id"])
+    assert any("calendar_name=Pozz%20Work" in path for path in _files(root))
+
+
+def test_compaction_keeps_latest_rows(tmp_path, make_events_df):
+    root = tmp_path / "dataset"
+    events_df = make_events_df(500)
+    append_events_dataset(events_df, root)
+
+    moved = events_df.iloc[[0]].copy()
+    moved["summary"] = "Spostato"
+    moved["year"] = 2030
+    updated = events_df.iloc[[1]].copy()
+    updated["summary"] = "Aggiornato"
+    append_events_dataset(pd.concat([moved, updated]), root)
+
+    assert compact_events_dataset(root) > 0
+    assert compact_events_dataset(root) == 0
+
+    result = read_events_dataset(root).set_index("event_id")
+    assert len(result) == len(events_df)
+    assert result.loc[moved["event_id"].item(), ["summary", "year"]].tolist() == ["Spostato", 2030]
+    assert result.loc[updated["event_id"].item(), "summary"] == "Aggiornato"
+
+    partition_dirs = {os.path.dirname(path) for path in _files(root)}
+    assert len(partition_dirs) == len(_files(root))
+
+
+def test_export_store_partitions_follows_store(tmp_path, make_events_df):
+    root = tmp_path / "dataset"
+    conn = open_event_store(tmp_path / "events.duckdb")
+    events_df = make_events_df(500)
+    upsert_events(conn, events_df)
+    export_store_partitions(conn, root=root)
+
+    deleted = events_df.iloc[0]
+    keys = [(deleted["calendar_name"], deleted["event_id"])]
+    partitions = store_partitions(conn, keys=keys, calendars=["Giulia"])
+    upsert_events(conn, deleted_keys=keys, replace_calendars=["Giulia"])
+    export_store_partitions(conn, partitions, root=root)
+
+    result = read_events_dataset(root)
+    expected = query_events(conn)
+    assert sorted(result["event_id"]) == sorted(expected["event_id"])
+    assert not any("calendar_name=Giulia" in path for path in _files(root))
+
+    view = open_events_dataset_view(root)
+    assert event_metrics(view, year=2024, calendars=["Pozz Work"]) == \
+        event_metrics(conn, year=2024, calendars=["Pozz Work"])
+
+
+def test_dataset_view_with_quote_in_path(tmp_path, make_events_df):
+    root = tmp_path / "l'archivio"
+    events_df = make_events_df(100)
+    append_events_dataset(events_df, root)
+
+    view = open_events_dataset_view(root)
+    assert view.execute("SELECT COUNT(*) FROM events").fetchone()[0] == len(events_df)
+
+
+def test_dataset_version_changes_on_write(tmp_path, make_events_df):
+    root = tmp_path / "dataset"
+    events_df = make_events_df(100)
+    append_events_dataset(events_df, root)
+    version = dataset_version(root)
+
+    assert dataset_version(root) == version
+
+    append_events_dataset(events_df.iloc[:10], root)
+    assert dataset_version(root) != version
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from event_tracking.components.calendar import process_calendar_events
+from event_tracking.components.dashboard import add_time_scale_columns
+from event_tracking.components.event_store import open_event_store, upsert_events, query_events
+from event_tracking.components.queries import contribution_matrix, event_metrics, downsample_periods, period_range
+from event_tracking.components.synthetic import generate_calendar_events
+from event_tracking.config import LOCAL_TIMEZONE
+
+
+@pytest.fixture
+def conn(tmp_path):
+    events_df = process_calendar_events(generate_calendar_events(2000, offsets=("+01:00", "+02:00")))
+    events_df["event_category"] = np.where(events_df["summary"].str.endswith("1"), "avm-meetings", "other")
+
+    conn = open_event_store(tmp_path / "events.duckdb")
+    upsert_events(conn, events_df)
+    return conn
+
+
+@pytest.mark.parametrize("time_scale, column", [("yearly", "year_only"), ("monthly", "year_month"),
+                                                ("weekly", "year_month_week")])
+def test_contribution_matrix_matches_pandas(conn, time_scale, column):
+    df = query_events(conn, year=2024, calendars=["Pozz Work", "Pozz"])
+    df["start_time"] = df["start_time"].dt.tz_convert(LOCAL_TIMEZONE)
+    df = add_time_scale_columns(df)
+    expected = (
+        df.loc[df["calendar_name"] == "Pozz Work"]
+        .groupby([column, "event_category"], observed=True).size().to_frame("count")
+        .pivot_table(index="event_category", columns=column, values="count", observed=True)
+        .fillna(0)
+    )
+
+    result = contribution_matrix(conn, time_scale, year=2024, calendars=["Pozz Work", "Pozz"])
+
+    pd.testing.assert_frame_equal(result, expected, check_names=False, check_dtype=False, check_index_type=False,
+                                  check_categorical=False)
+
+
+def test_contribution_matrix_respects_calendar_filter(conn):
+    assert contribution_matrix(conn, "monthly", year=2024, calendars=["Pozz"]).empty
+
+
+def test_contribution_matrix_downsamples_long_ranges(conn):
+    weekly = contribution_matrix(conn, "weekly")
+
+    result = contribution_matrix(conn, "weekly", max_periods=20)
+
+    assert len(weekly.columns) > 20 >= len(result.columns)
+    assert result.columns[0].startswith(f"{weekly.columns[0]} – ")
+    pd.testing.assert_series_equal(result.sum(axis=1), weekly.sum(axis=1))
+
+
+def test_downsample_periods_keeps_short_ranges():
+    matrix = pd.DataFrame({"2024-02": [1.0], "2024-01": [2.0], "2024-03": [3.0]}, index=["other"])
+
+    assert downsample_periods(matrix, 3) is matrix
+    assert downsample_periods(matrix, 2).to_dict() == {"2024-01 – 2024-02": {"other": 3.0}, "2024-03": {"other": 3.0}}
+
+
+def test_downsample_periods_buckets_by_time():
+    # Periodi senza eventi: i gruppi coprono comunque lo stesso numero di mesi
+    matrix = pd.DataFrame({"2024-01": [1.0], "2024-02": [2.0], "2024-12": [3.0]}, index=["other"])
+
+    result = downsample_periods(matrix, 6, "monthly")
+
+    assert list(result.columns) == ["2024-01 – 2024-02", "2024-03 – 2024-04", "2024-05 – 2024-06",
+                                    "2024-07 – 2024-08", "2024-09 – 2024-10", "2024-11 – 2024-12"]
+    assert result.loc["other"].tolist() == [3.0, 0.0, 0.0, 0.0, 0.0, 3.0]
+
+
+def test_period_range_orders_weeks_by_day():
+    # Il 30 e 31 dicembre 2024 sono nella prima settimana ISO del 2025
+    assert period_range(["2024-12-01", "2024-12-51", "2024-11-48"], "weekly") == \
+        ["2024-11-48", "2024-12-48", "2024-12-49", "2024-12-50", "2024-12-51", "2024-12-52", "2024-12-01"]
+
+
+def test_event_metrics(conn):
+    df = query_events(conn, year=2024, calendars=["Pozz Work"])
+
+    metrics = event_metrics(conn, year=2024, calendars=["Pozz Work"])
+
+    assert metrics["total_events"] == len(df)
+    assert metrics["avg_duration"] == pytest.approx(df["duration_minutes"].mean())
+    assert metrics["all_day_events"] == df["all_day"].sum()
+    assert np.isnan(event_metrics(conn, year=1990)["avg_duration"])
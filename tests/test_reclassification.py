@@ -0,0 +1,151 @@
+import pandas as pd
+import pytest
+
+from event_tracking.components.calendar import categorize_calendar_events, process_calendar_events
+from event_tracking.components.classification_cache import open_classification_cache, store_categories, \
+    get_cached_categories, migrate_classification_cache, taxonomy_changes
+from event_tracking.components.event_store import open_event_store, upsert_events, query_events, rebuild_rollups, \
+    load_store_taxonomy, store_data_version, event_storage_stats
+from event_tracking.components.fake_calendar import make_event
+from event_tracking.components.fake_llm import FakeChatModel
+from event_tracking.components.reclassification import reclassify_store_events
+
+OLD_TAXONOMY = ["avm-meetings", "finbox-privati", "finbox-meetings", "other"]
+NEW_TAXONOMY = ["avm-meetings", "finbox-retail", "new-project", "other"]
+RENAMES = {"finbox-privati": "finbox-retail"}
+
+
+def _events():
+    events = [dict(make_event(f"w{i}", summary, f"2025-05-0{i + 1}T09:00:00Z", f"2025-05-0{i + 1}T10:00:00Z"),
+                   calendar_name="Pozz Work")
+              for i, summary in enumerate(["finbox-privati call", "finbox-meetings sync", "new-project kickoff",
+                                           "Pranzo"])]
+    # Serie ricorrente settimanale, salvata compressa in event_series
+    events += [dict(make_event(f"s_{i}", "avm-meetings weekly", f"2025-05-{5 + 7 * i:02d}T14:00:00Z",
+                               f"2025-05-{5 + 7 * i:02d}T15:00:00Z"), calendar_name="Pozz Work",
+                    recurringEventId="s")
+               for i in range(3)]
+    events.append(dict(make_event("h0", "Palestra", "2025-05-01T18:00:00Z", "2025-05-01T19:00:00Z"),
+                       calendar_name="Pozz"))
+    return events
+
+
+def _store(tmp_path, taxonomy=OLD_TAXONOMY):
+    events_df = categorize_calendar_events(process_calendar_events(_events()), llm=FakeChatModel(),
+                                           cache_path=tmp_path / "cache.sqlite", taxonomy=OLD_TAXONOMY)
+    conn = open_event_store(tmp_path / "events.duckdb")
+    upsert_events(conn, events_df, taxonomy=taxonomy)
+    return conn
+
+
+def _categories(conn):
+    events = query_events(conn)
+    categories = events["event_category"].astype(object)
+    return dict(zip(events["summary"], categories.where(categories.notna(), None)))
+
+
+def test_taxonomy_changes():
+    changes = taxonomy_changes(OLD_TAXONOMY, NEW_TAXONOMY, RENAMES)
+
+    assert changes["added"] == ["new-project"]
+    assert changes["removed"] == ["finbox-meetings"]
+    assert changes["renamed"] == RENAMES
+    assert changes["reclassify"] == {"finbox-meetings", "other"}
+
+    # Senza nuove categorie i titoli in 'other' restano dove sono
+    assert taxonomy_changes(OLD_TAXONOMY, ["avm-meetings", "finbox-privati", "other"])["reclassify"] == \
+        {"finbox-meetings"}
+
+
+def test_reclassify_only_affected_summaries(tmp_path):
+    conn = _store(tmp_path)
+    assert _categories(conn)["finbox-privati call"] == "finbox-privati"
+    assert event_storage_stats(conn)["series"] == 1
+    version = store_data_version(conn)
+    llm = FakeChatModel()
+
+    result = reclassify_store_events(conn, NEW_TAXONOMY, RENAMES, llm=llm, cache_path=tmp_path / "cache.sqlite")
+
+    assert sorted(llm.classified_texts) == ["Pranzo", "finbox-meetings sync", "new-project kickoff"]
+    assert result == {"renamed_summaries": 1, "reclassified_summaries": 3, "updated_events": 3}
+    assert _categories(conn) == {"finbox-privati call": "finbox-retail", "finbox-meetings sync": "other",
+                                 "new-project kickoff": "new-project", "Pranzo": "other",
+                                 "avm-meetings weekly": "avm-meetings", "Palestra": None}
+    assert event_storage_stats(conn)["series"] == 1
+    assert load_store_taxonomy(conn) == NEW_TAXONOMY
+    assert store_data_version(conn) == version + 1
+
+    # Le tabelle di rollup aggiornate solo nei periodi toccati coincidono con quelle ricalcolate da zero
+    rollups = conn.execute("SELECT * FROM event_rollups ORDER BY ALL").fetchall()
+    rebuild_rollups(conn)
+    assert conn.execute("SELECT * FROM event_rollups ORDER BY ALL").fetchall() == rollups
+
+    # La tassonomia è già applicata: nessuna nuova chiamata
+    assert reclassify_store_events(conn, NEW_TAXONOMY, RENAMES, llm=llm, cache_path=tmp_path / "cache.sqlite") == \
+        {"renamed_summaries": 0, "reclassified_summaries": 0, "updated_events": 0}
+    assert len(llm.classified_texts) == 3
+
+
+def test_reclassify_keeps_valid_labels_in_cache(tmp_path):
+    conn = _store(tmp_path)
+    reclassify_store_events(conn, NEW_TAXONOMY, RENAMES, llm=FakeChatModel(), cache_path=tmp_path / "cache.sqlite")
+
+    # I nuovi eventi con titoli già noti non vengono inviati all'LLM
+    llm = FakeChatModel()
+    events_df = categorize_calendar_events(
+        pd.DataFrame({"summary": ["finbox-privati call", "avm-meetings weekly"], "calendar_name": "Pozz Work"}),
+        llm=llm, cache_path=tmp_path / "cache.sqlite", taxonomy=NEW_TAXONOMY
+    )
+
+    assert llm.classified_texts == []
+    assert events_df["event_category"].tolist() == ["finbox-retail", "avm-meetings"]
+
+
+@pytest.mark.parametrize("drop_previous_taxonomy", [False, True])
+def test_reclassify_drops_previous_taxonomy_only_on_request(tmp_path, drop_previous_taxonomy):
+    cache_path = tmp_path / "cache.sqlite"
+    conn = _store(tmp_path)
+
+    reclassify_store_events(conn, NEW_TAXONOMY, RENAMES, llm=FakeChatModel(), cache_path=cache_path,
+                            drop_previous_taxonomy=drop_previous_taxonomy)
+
+    # Senza una migrazione esplicita la tassonomia precedente resta (può usarla un altro account)
+    cache = open_classification_cache(cache_path)
+    assert get_cached_categories(cache, ["Pranzo"], OLD_TAXONOMY, "fake-chat-model", 1) == \
+        ({} if drop_previous_taxonomy else {"Pranzo": "other"})
+    assert get_cached_categories(cache, ["Pranzo"], NEW_TAXONOMY, "fake-chat-model", 1) == {"Pranzo": "other"}
+
+
+def test_reclassify_without_registered_taxonomy_uses_stored_labels(tmp_path):
+    conn = _store(tmp_path, taxonomy=None)
+    assert load_store_taxonomy(conn) is None
+    llm = FakeChatModel()
+
+    result = reclassify_store_events(conn, NEW_TAXONOMY, RENAMES, llm=llm, cache_path=None)
+
+    assert sorted(llm.classified_texts) == ["Pranzo", "finbox-meetings sync", "new-project kickoff"]
+    assert result["updated_events"] == 3
+    assert load_store_taxonomy(conn) == NEW_TAXONOMY
+
+
+def test_failed_reclassification_clears_removed_categories(tmp_path):
+    conn = _store(tmp_path)
+
+    reclassify_store_events(conn, NEW_TAXONOMY, RENAMES, cache_path=None, max_retries=0,
+                            llm=FakeChatModel(fail_calls=range(10)), backoff_seconds=0)
+
+    categories = _categories(conn)
+    assert categories["finbox-meetings sync"] is None
+    assert categories["Pranzo"] == "other"
+    assert categories["finbox-privati call"] == "finbox-retail"
+
+
+def test_migrate_classification_cache(tmp_path):
+    cache = open_classification_cache(tmp_path / "cache.sqlite")
+    store_categories(cache, {"finbox-privati call": "finbox-privati", "finbox-meetings sync": "finbox-meetings",
+                             "Pranzo": "other", "avm-meetings weekly": "avm-meetings"}, OLD_TAXONOMY, "fake", 1)
+
+    assert migrate_classification_cache(cache, OLD_TAXONOMY, NEW_TAXONOMY, RENAMES) == 2
+    assert get_cached_categories(cache, ["finbox-privati call", "finbox-meetings sync", "Pranzo",
+                                         "avm-meetings weekly"], NEW_TAXONOMY, "fake", 1) == \
+        {"finbox-privati call": "finbox-retail", "avm-meetings weekly": "avm-meetings"}
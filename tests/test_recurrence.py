@@ -0,0 +1,119 @@
+import duckdb
+import pandas as pd
+import pytest
+
+from event_tracking.components.calendar import process_calendar_events
+from event_tracking.components.event_schema import apply_event_schema
+from event_tracking.components.event_store import EVENT_COLUMNS, open_event_store, upsert_events, query_events, \
+    event_storage_stats, rebuild_rollups, event_filters, filtered_events_sql
+from event_tracking.components.synthetic import generate_calendar_events
+
+
+def _assert_stored(conn, events_df):
+    stored = query_events(conn).sort_values(["calendar_name", "event_id"], ignore_index=True)
+    expected = apply_event_schema(events_df[list(EVENT_COLUMNS)]) \
+        .sort_values(["calendar_name", "event_id"], ignore_index=True)
+    pd.testing.assert_frame_equal(stored, expected, check_categorical=False)
+
+
+@pytest.mark.parametrize("offsets", [("+01:00", "+02:00", "Z"), ("+02:00",)])
+def test_series_stored_once_and_expanded_exactly(tmp_path, offsets, make_events_df):
+    events_df = make_events_df(2000, recurring_ratio=1.0, offsets=offsets)
+    conn = open_event_store(tmp_path / "events.duckdb")
+
+    upsert_events(conn, events_df)
+
+    stats = event_storage_stats(conn)
+    assert stats["events"] == len(events_df)
+    assert stats["stored_rows"] * 5 < stats["events"]
+    _assert_stored(conn, events_df)
+
+
+def test_series_updates_and_exceptions(tmp_path, make_events_df):
+    events_df = make_events_df(500, recurring_ratio=1.0)
+    conn = open_event_store(tmp_path / "events.duckdb")
+    upsert_events(conn, events_df)
+
+    series = events_df.loc[events_df["recurring_event_id"] == events_df["recurring_event_id"].iloc[0]]
+    moved = series.iloc[[0]].assign(summary="Spostato")
+    cancelled = series.iloc[1]
+    upsert_events(conn, moved, deleted_keys=[(cancelled["calendar_name"], cancelled["event_id"])])
+
+    expected = events_df.astype({"summary": "object"}).set_index("event_id").drop(cancelled["event_id"])
+    expected.loc[moved["event_id"].iloc[0], "summary"] = "Spostato"
+    _assert_stored(conn, expected.reset_index())
+    # L'occorrenza modificata è salvata come evento singolo, le altre restano nella serie
+    assert conn.execute("SELECT COUNT(*) FROM single_events WHERE event_id = ?",
+                        [moved["event_id"].iloc[0]]).fetchone()[0] == 1
+    assert event_storage_stats(conn)["series"] == events_df["recurring_event_id"].nunique()
+
+    # Risincronizzazione completa del calendario: le sue serie vengono sostituite
+    calendar = series["calendar_name"].iloc[0]
+    upsert_events(conn, events_df.loc[events_df["calendar_name"] == calendar], replace_calendars=[calendar])
+    _assert_stored(conn, events_df)
+
+
+def test_full_resync_keeps_events_before_window(tmp_path):
+    events_df = process_calendar_events(generate_calendar_events(2000, recurring_ratio=0.5))
+    events_df["event_category"] = "other"
+    conn = open_event_store(tmp_path / "events.duckdb")
+    upsert_events(conn, events_df)
+    rollups = conn.execute("SELECT * FROM event_rollups ORDER BY ALL").fetchall()
+
+    # La risincronizzazione scarica solo gli eventi che finiscono dopo timeMin: uno è stato cancellato
+    calendar, time_min = "Pozz Work", "2024-06-01T00:00:00.000000Z"
+    end_time = pd.to_datetime(events_df["end_time"], utc=True)
+    resynced = events_df.loc[(events_df["calendar_name"] == calendar) & (end_time > pd.Timestamp(time_min))]
+    cancelled = resynced["event_id"].iloc[0]
+    upsert_events(conn, resynced.iloc[1:], replace_calendars=[calendar], replace_time_min=time_min)
+
+    _assert_stored(conn, events_df.loc[events_df["event_id"] != cancelled])
+    # Le serie a cavallo della finestra restano compresse
+    assert event_storage_stats(conn)["stored_rows"] < len(events_df)
+    assert conn.execute("SELECT * FROM event_rollups ORDER BY ALL").fetchall() != rollups
+    rollups = conn.execute("SELECT * FROM event_rollups ORDER BY ALL").fetchall()
+    rebuild_rollups(conn)
+    assert conn.execute("SELECT * FROM event_rollups ORDER BY ALL").fetchall() == rollups
+
+
+@pytest.mark.parametrize("filters", [dict(year=2024, calendars=["Pozz Work"]), dict(year=2025),
+                                     dict(start="2024-03-01", end="2024-04-01"), dict(calendars=["Giulia", "Pozz"])])
+def test_filtered_events_match_view(tmp_path, filters):
+    events_df = process_calendar_events(generate_calendar_events(2000, recurring_ratio=0.5))
+    events_df["event_category"] = "other"
+    conn = open_event_store(tmp_path / "events.duckdb")
+    upsert_events(conn, events_df)
+
+    where, params = event_filters(**filters)
+    expected = conn.execute(f"SELECT * FROM events WHERE {where} ORDER BY ALL", params).fetchall()
+    events, params = filtered_events_sql(conn, **filters)
+    assert conn.execute(f"SELECT * FROM {events} ORDER BY ALL", params).fetchall() == expected
+    assert expected
+
+
+def test_duplicate_key_across_series_is_rejected(tmp_path, make_events_df):
+    events_df = make_events_df(200, recurring_ratio=1.0)
+    conn = open_event_store(tmp_path / "events.duckdb")
+
+    # La stessa occorrenza due volte comparirebbe due volte nella serie
+    with pytest.raises(ValueError, match="duplicati"):
+        upsert_events(conn, pd.concat([events_df, events_df.iloc[[0]]]))
+
+    assert event_storage_stats(conn)["events"] == 0
+
+
+def test_migrates_events_table(tmp_path, make_events_df):
+    path = tmp_path / "events.duckdb"
+    legacy = duckdb.connect(str(path))
+    columns = ", ".join(f"{name} {sql_type}" for name, sql_type in EVENT_COLUMNS.items())
+    legacy.execute(f"CREATE TABLE events ({columns}, PRIMARY KEY (calendar_name, event_id))")
+    legacy.execute("CREATE INDEX events_start_time ON events (start_time)")
+    legacy.close()
+
+    conn = open_event_store(path)
+    events_df = make_events_df(200, recurring_ratio=1.0)
+    upsert_events(conn, events_df)
+
+    _assert_stored(conn, events_df)
+    assert conn.execute("SELECT table_type FROM information_schema.tables WHERE table_name = 'events'") \
+        .fetchone()[0] == "VIEW"
@@ -0,0 +1,151 @@
+import os
+import sys
+import subprocess
+
+import pytest
+
+from event_tracking.components import refresh
+from event_tracking.components.calendar import categories
+from event_tracking.components.event_store import open_event_store, query_events, store_data_version, \
+    published_store_path
+from event_tracking.components.fake_calendar import build_fake_calendar_service, calendar_id
+from event_tracking.components.fake_llm import FakeChatModel
+from event_tracking.components.refresh import refresh_lock, refresh_once, run_refresh_daemon, publish_snapshot, \
+    run_incremental_update
+from event_tracking.components.synthetic import generate_calendar_events
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return dict(store_path=tmp_path / "events.duckdb", snapshot_path=tmp_path / "events.snapshot.duckdb",
+                lock_path=tmp_path / "refresh.lock", metrics_path=tmp_path / "metrics.jsonl",
+                prometheus_path=tmp_path / "metrics.prom")
+
+
+def _refresh(service, paths):
+    return refresh_once(service=service, llm=FakeChatModel(categories), cache_path=None, **paths)
+
+
+def test_refresh_publishes_snapshot_incrementally(paths):
+    service = build_fake_calendar_service(generate_calendar_events(300))
+    assert published_store_path(paths["store_path"], paths["snapshot_path"]) == paths["store_path"]
+
+    assert _refresh(service, paths) == {"changed_events": 300, "cancelled_events": 0}
+    assert published_store_path(paths["store_path"], paths["snapshot_path"]) == paths["snapshot_path"]
+
+    # Un lettore aperto sullo snapshot continua a vedere la versione precedente durante l'aggiornamento
+    reader = open_event_store(paths["snapshot_path"], read_only=True)
+    version = store_data_version(reader)
+
+    work = calendar_id("Pozz Work")
+    service.cancel(work, next(iter(service.calendar_events[work])))
+    assert _refresh(service, paths) == {"changed_events": 0, "cancelled_events": 1}
+    assert "syncToken" in service.calls[-1]
+
+    assert len(query_events(reader)) == 300
+    reader.close()
+    with open_event_store(paths["snapshot_path"], read_only=True) as conn:
+        assert store_data_version(conn) == version + 1
+        assert len(query_events(conn)) == 299
+
+
+def test_incremental_update_on_open_store(tmp_path):
+    # La pipeline di create_calendar_db.py: il database resta aperto, export IPC incluso
+    service = build_fake_calendar_service(generate_calendar_events(200))
+    kwargs = dict(service=service, llm=FakeChatModel(categories), cache_path=None, export_ipc=True,
+                  ipc_path=tmp_path / "events.arrow")
+
+    with open_event_store(tmp_path / "events.duckdb") as conn:
+        assert run_incremental_update(conn, **kwargs) == {"changed_events": 200, "cancelled_events": 0}
+        assert run_incremental_update(conn, **kwargs) == {"changed_events": 0, "cancelled_events": 0}
+        # Senza sync token i calendari vengono riscaricati da zero
+        assert run_incremental_update(conn, incremental=False, **kwargs)["changed_events"] == 200
+        assert len(query_events(conn)) == 200
+
+    assert (tmp_path / "events.arrow").exists()
+
+
+def test_refresh_skipped_while_locked(paths):
+    service = build_fake_calendar_service(generate_calendar_events(10))
+
+    with refresh_lock(paths["lock_path"]) as acquired:
+        assert acquired
+        assert _refresh(service, paths) is None
+        assert service.calls == []
+
+    assert _refresh(service, paths) is not None
+
+
+def test_daemon_survives_failed_refresh(paths, capsys):
+    service = build_fake_calendar_service(generate_calendar_events(10))
+    service.fail_next(404)
+
+    run_refresh_daemon(interval_minutes=0, max_runs=2, service=service, llm=FakeChatModel(categories),
+                       cache_path=None, **paths)
+
+    assert "Aggiornamento non riuscito" in capsys.readouterr().out
+    with open_event_store(paths["snapshot_path"], read_only=True) as conn:
+        assert len(query_events(conn)) == 10
+
+
+class FakeMsvcrt:
+    """
+    msvcrt.locking per i test su sistemi senza msvcrt: un solo lock per file, chiesto senza attesa
+    """
+    LK_UNLCK, LK_NBLCK = 0, 2
+
+    def __init__(self):
+        self.owners = {}
+
+    def locking(self, fd, mode, nbytes):
+        key = os.fstat(fd).st_ino
+        if mode == self.LK_UNLCK:
+            del self.owners[key]
+        elif self.owners.setdefault(key, fd) != fd:
+            raise PermissionError(13, "Permission denied")
+
+
+def test_refresh_lock_without_fcntl(paths, monkeypatch):
+    # Su Windows (senza fcntl) il lock usa msvcrt.locking
+    monkeypatch.setattr(refresh, "fcntl", None)
+    monkeypatch.setattr(refresh, "msvcrt", FakeMsvcrt())
+
+    with refresh_lock(paths["lock_path"]) as acquired:
+        assert acquired
+        with refresh_lock(paths["lock_path"]) as acquired_again:
+            assert not acquired_again
+
+    with refresh_lock(paths["lock_path"]) as acquired:
+        assert acquired
+
+
+def test_modules_import_without_fcntl():
+    # Sorgenti della dashboard e degli script: si importano anche senza i moduli solo Unix
+    # subprocess è importato prima: con msvcrt disponibile cercherebbe i moduli di Windows
+    code = ("import sys, types, subprocess; sys.modules['fcntl'] = None; sys.modules['resource'] = None\n"
+            "sys.modules['msvcrt'] = types.ModuleType('msvcrt')\n"
+            "import event_tracking.components.refresh, event_tracking.components.event_store\n")
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+
+def test_publish_retries_while_snapshot_is_open(paths, monkeypatch):
+    # Su Windows la rinomina fallisce finché la dashboard tiene aperto lo snapshot
+    with open_event_store(paths["store_path"]):
+        pass
+    replace = os.replace
+    failures = iter([PermissionError(13, "Permission denied")] * 2)
+
+    def replace_when_closed(src, dst):
+        error = next(failures, None)
+        if error is not None:
+            raise error
+        replace(src, dst)
+
+    monkeypatch.setattr(refresh.os, "replace", replace_when_closed)
+    publish_snapshot(paths["store_path"], paths["snapshot_path"], backoff_seconds=0)
+    assert paths["snapshot_path"].exists()
+
+    failures = iter([PermissionError(13, "Permission denied")] * 3)
+    with pytest.raises(PermissionError):
+        publish_snapshot(paths["store_path"], paths["snapshot_path"], max_retries=2, backoff_seconds=0)
+    assert list(paths["snapshot_path"].parent.glob(".*.tmp")) == []
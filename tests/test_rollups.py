@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from event_tracking.components.event_analyzer import analyze_event_categories, analyze_event_categories_from_store, \
+    build_time_context
+from event_tracking.components.event_store import open_event_store, upsert_events, rebuild_rollups, query_events
+from event_tracking.components.parquet_dataset import export_store_partitions, open_events_dataset_view
+from event_tracking.components.queries import contribution_matrix
+
+
+def _category(events_df):
+    return np.where(events_df["summary"].str.endswith("1"), "avm-meetings", "other")
+
+
+def _rollups(conn):
+    return (conn.execute("SELECT * FROM event_rollups").df()
+            .sort_values(["grain", "period", "calendar_name", "event_category"], ignore_index=True))
+
+
+@pytest.fixture
+def conn(tmp_path, make_events_df):
+    conn = open_event_store(tmp_path / "events.duckdb")
+    upsert_events(conn, make_events_df(1500, offsets=("+01:00", "+02:00"), category=_category))
+    return conn
+
+
+def test_rollups_maintained_incrementally(conn):
+    events_df = query_events(conn)
+    changed = events_df[events_df["calendar_name"] != "Giulia"].sample(50, random_state=0).copy()
+    changed["duration_minutes"] = 5.0
+    changed["start_time"] = changed["start_time"] + pd.Timedelta(days=40)
+    deleted = events_df.sample(20, random_state=1)
+
+    upsert_events(conn, changed, deleted_keys=list(zip(deleted["calendar_name"], deleted["event_id"])),
+                  replace_calendars=["Giulia"])
+    incremental = _rollups(conn)
+
+    rebuild_rollups(conn)
+    pd.testing.assert_frame_equal(incremental, _rollups(conn))
+    assert set(incremental["grain"]) == {"daily", "weekly", "monthly", "yearly"}
+    assert "Giulia" not in set(incremental["calendar_name"])
+
+
+@pytest.mark.parametrize("time_scale", ["yearly", "monthly", "weekly"])
+@pytest.mark.parametrize("value", ["count", "minutes"])
+def test_rollup_matrix_matches_events(conn, tmp_path, time_scale, value):
+    export_store_partitions(conn, root=tmp_path / "dataset")
+    view = open_events_dataset_view(tmp_path / "dataset")
+
+    pd.testing.assert_frame_equal(
+        contribution_matrix(conn, time_scale, year=2024, value=value),
+        contribution_matrix(view, time_scale, year=2024, value=value),
+        check_dtype=False
+    )
+
+
+def test_analyze_event_categories_from_store(conn):
+    df = query_events(conn, year=2025, calendars=["Pozz Work", "Pozz"])
+
+    expected = analyze_event_categories(df)
+    result = analyze_event_categories_from_store(conn, year=2025, calendars=["Pozz Work", "Pozz"])
+
+    assert result["counts"] == expected["counts"]
+    assert result["total_duration"] == pytest.approx(expected["total_duration"])
+    assert result["percentage"] == pytest.approx(expected["percentage"])
+
+
+def test_time_context_categories_from_store(conn):
+    # Il contesto della chat della dashboard legge il tempo per categoria dalle tabelle di rollup
+    df = query_events(conn, year=2025, calendars=["Pozz Work", "Pozz"])
+    categories = analyze_event_categories_from_store(conn, year=2025, calendars=["Pozz Work", "Pozz"],
+                                                     timed_only=True)
+
+    assert categories["counts"] == analyze_event_categories(df[~df["all_day"]])["counts"]
+    assert build_time_context(df, categories=categories) == build_time_context(df)
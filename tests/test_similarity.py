@@ -0,0 +1,60 @@
+import pandas as pd
+
+from event_tracking.components.calendar import categorize_calendar_events, categories
+from event_tracking.components.fake_llm import FakeChatModel
+from event_tracking.components.similarity import build_similarity_index, predict_from_index, similarity_text, \
+    cached_similarity_index
+
+
+LABELLED = {
+    "Weekly sync AVM 05/05": "avm-meetings",
+    "Finbox gara MCC call": "finbox-gara-mcc",
+    "Review best practices DSS": "dss-best-practices",
+    "Pranzo": "other",
+}
+
+
+def test_similarity_text_ignores_numbers_and_case():
+    assert similarity_text("Weekly  Sync 12/05") == similarity_text("weekly sync 3/11")
+
+
+def test_predict_assigns_only_confident_matches():
+    index = build_similarity_index(LABELLED)
+
+    predictions = predict_from_index(index, ["Weekly sync AVM 12/05", "Finbox gara MCC call #3",
+                                             "Finbox privati", "Pranzo con Marco"])
+
+    assert {summary: category for summary, (category, _) in predictions.items()} == {
+        "Weekly sync AVM 12/05": "avm-meetings",
+        "Finbox gara MCC call #3": "finbox-gara-mcc",
+    }
+    assert predictions["Weekly sync AVM 12/05"][1] > 0.99
+
+
+def test_cached_index_is_rebuilt_when_labels_change():
+    index = cached_similarity_index("test", LABELLED)
+    assert cached_similarity_index("test", dict(LABELLED)) is index
+
+    updated = cached_similarity_index("test", {**LABELLED, "Finbox privati": "finbox-privati"})
+    assert updated is not index and len(updated["labels"]) == len(LABELLED) + 1
+
+
+def test_predict_with_empty_index():
+    assert predict_from_index(build_similarity_index({}), ["Pranzo"]) == {}
+
+
+def test_categorize_skips_llm_for_near_duplicates(tmp_path):
+    cache_path = tmp_path / "cache.sqlite"
+
+    def events_df(summaries):
+        return pd.DataFrame({"summary": summaries, "calendar_name": "Pozz Work"})
+
+    categorize_calendar_events(events_df(["avm-meetings weekly 05/05", "Pranzo"]),
+                               llm=FakeChatModel(categories), cache_path=cache_path)
+
+    llm = FakeChatModel(categories)
+    result = categorize_calendar_events(events_df(["avm-meetings weekly 12/05", "finbox-privati kickoff"]),
+                                        llm=llm, cache_path=cache_path)
+
+    assert llm.classified_texts == ["finbox-privati kickoff"]
+    assert result["event_category"].tolist() == ["avm-meetings", "finbox-privati"]
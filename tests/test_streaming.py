@@ -0,0 +1,93 @@
+import tracemalloc
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from event_tracking.components.calendar import fetch_calendar_events_incremental, process_calendar_events, \
+    categorize_calendar_events, iter_calendar_event_pages, categories
+from event_tracking.components.event_schema import EVENT_ARROW_SCHEMA
+from event_tracking.components.event_store import open_event_store, upsert_events, query_events, \
+    load_store_sync_tokens
+from event_tracking.components.fake_calendar import build_fake_calendar_service, calendar_id
+from event_tracking.components.fake_llm import FakeChatModel
+from event_tracking.components.streaming import ingest_calendar_events, stream_event_chunks, \
+    write_chunks_to_parquet
+from event_tracking.components.synthetic import generate_calendar_events
+
+
+def _service(n=3000):
+    return build_fake_calendar_service(generate_calendar_events(n, recurring_ratio=0.2), page_size=100)
+
+
+def _stored(conn):
+    return query_events(conn).sort_values(["calendar_name", "event_id"], ignore_index=True)
+
+
+def test_streaming_matches_batch_pipeline(tmp_path):
+    service = _service()
+
+    batch_conn = open_event_store(tmp_path / "batch.duckdb")
+    sync = fetch_calendar_events_incremental({}, service=service)
+    events_df = categorize_calendar_events(process_calendar_events(sync["events"]), llm=FakeChatModel(categories),
+                                           cache_path=tmp_path / "batch_cache.sqlite")
+    upsert_events(batch_conn, events_df, replace_calendars=sync["full_sync_calendars"],
+                  replace_time_min=sync["full_sync_time_min"],
+                  sync_tokens=sync["sync_tokens"])
+
+    stream_conn = open_event_store(tmp_path / "stream.duckdb")
+    llm = FakeChatModel(categories)
+    n_events = ingest_calendar_events(stream_conn, service=service, chunk_size=500, llm=llm,
+                                      cache_path=tmp_path / "stream_cache.sqlite")
+
+    assert n_events == 3000
+    pd.testing.assert_frame_equal(_stored(stream_conn), _stored(batch_conn))
+    assert load_store_sync_tokens(stream_conn) == load_store_sync_tokens(batch_conn)
+    # Ogni titolo è inviato all'LLM una sola volta, anche se compare in più blocchi
+    assert len(llm.classified_texts) == len(set(llm.classified_texts))
+
+
+def test_streaming_incremental_sync(tmp_path):
+    service = _service(500)
+    conn = open_event_store(tmp_path / "events.duckdb")
+    kwargs = dict(service=service, chunk_size=100, llm=FakeChatModel(categories), cache_path=None)
+    ingest_calendar_events(conn, **kwargs)
+
+    work = calendar_id("Pozz Work")
+    changed_id, cancelled_id = list(service.calendar_events[work])[:2]
+    changed = dict(service.calendar_events[work][changed_id], summary="Modificato")
+    service.upsert(work, changed)
+    service.cancel(work, cancelled_id)
+
+    n_events = ingest_calendar_events(conn, sync_tokens=load_store_sync_tokens(conn), **kwargs)
+
+    stored = _stored(conn).set_index("event_id")
+    assert n_events == 1
+    assert len(stored) == 499
+    assert cancelled_id not in stored.index
+    assert stored.loc[changed_id, "summary"] == "Modificato"
+
+
+def test_streaming_parquet_memory_is_bounded(tmp_path):
+    # Senza classificazione: la sua memoria dipende dal numero di titoli distinti, non dallo storico
+    service = _service(10000)
+
+    def batch():
+        sync = fetch_calendar_events_incremental({}, service=service)
+        process_calendar_events(sync["events"]).to_parquet(tmp_path / "batch.parquet")
+
+    def streaming():
+        chunks = stream_event_chunks(iter_calendar_event_pages(service=service), chunk_size=500, categorize=False)
+        return write_chunks_to_parquet(chunks, tmp_path / "stream.parquet")
+
+    peaks = {}
+    for name, run in [("batch", batch), ("streaming", streaming)]:
+        tracemalloc.start()
+        run()
+        peaks[name] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    written = pq.read_table(tmp_path / "stream.parquet")
+    assert written.num_rows == 10000
+    assert written.schema.equals(EVENT_ARROW_SCHEMA)
+    assert pq.ParquetFile(tmp_path / "stream.parquet").num_row_groups == 20
+    assert peaks["streaming"] < peaks["batch"] / 4
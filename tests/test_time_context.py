@@ -0,0 +1,71 @@
+import pandas as pd
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+from event_tracking.components.calendar import process_calendar_events
+from event_tracking.components.classification import estimate_tokens
+from event_tracking.components.event_analyzer import build_time_context, stream_time_analysis
+from event_tracking.components.synthetic import generate_calendar_events
+
+
+def _events_df(n):
+    events_df = process_calendar_events(generate_calendar_events(n, recurring_ratio=0.2))
+    events_df["event_category"] = pd.Series(["meeting", "coding", "email"] * n)[:n]
+    return events_df
+
+
+def _context_tokens(context):
+    return sum(estimate_tokens(line) for line in context.splitlines())
+
+
+def test_context_fits_token_budget():
+    small = build_time_context(_events_df(200))
+    large = build_time_context(_events_df(20000))
+
+    for context in [small, large]:
+        assert context.startswith("Panoramica:")
+        assert "Tempo per categoria:" in context
+        assert _context_tokens(context) <= 1500
+
+    tight = build_time_context(_events_df(2000), max_tokens=150)
+    assert _context_tokens(tight) <= 150
+    assert tight.startswith("Panoramica:") and "Eventi che occupano più tempo" not in tight
+
+
+def test_context_reports_true_busy_time():
+    start = pd.Timestamp("2024-04-01 09:00", tz="UTC")
+    events_df = pd.DataFrame({
+        "summary": ["Riunione", "Codice"],
+        "calendar_name": ["Pozz Work", "Pozz Work"],
+        "event_category": ["meeting", "coding"],
+        "start_time": [start, start],
+        "end_time": [start + pd.Timedelta(hours=2)] * 2,
+        "duration_minutes": [120, 120],
+        "all_day": [False, False],
+    })
+
+    context = build_time_context(events_df)
+
+    assert "Tempo pianificato: 4.0 ore" in context
+    assert "tempo realmente occupato (sovrapposizioni contate una volta): 2.0 ore" in context
+    assert build_time_context(events_df.iloc[:0]) == "Nessun evento nel periodo selezionato."
+
+
+def test_context_with_only_all_day_events():
+    events_df = _events_df(200)
+    events_df["all_day"] = True
+    events_df["duration_minutes"] = pd.NA
+
+    context = build_time_context(events_df)
+
+    assert "nan" not in context
+    assert "Eventi: 200 (200 di tutto il giorno)" in context
+    assert "Media settimanale" not in context
+
+
+def test_stream_time_analysis():
+    llm = GenericFakeChatModel(messages=iter([AIMessage(content="Hai passato molto tempo in riunione.")]))
+    chunks = list(stream_time_analysis(llm, build_time_context(_events_df(100)), "Come ho usato il tempo?"))
+
+    assert len(chunks) > 1
+    assert "".join(chunks) == "Hai passato molto tempo in riunione."